@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+
+import argparse
+
+from classifier.learn.learner import Learner
+
+"""
+Write an error report of a trained model, without a display: the split is
+streamed through model.pth in batches, keeping the highest-loss crops per
+class and per source (archive or database layout) and a confusion matrix
+per source. The report is a single HTML file in the model directory,
+e.g. models/resnet18/errors_valid.html:
+
+    bin/analyze_errors.py resnet18 --split valid --top-k 24
+
+Settings from config.json "error_analysis", e.g. {"top_k": 12, "thumbnail": 96}.
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Error report of a trained model")
+    parser.add_argument("model", help="Name of the trained model")
+    parser.add_argument(
+        "--split",
+        choices=["train", "valid"],
+        default="valid",
+        help="Split to analyze (default: valid)",
+    )
+    parser.add_argument(
+        "--top-k",
+        type=int,
+        default=None,
+        help="Highest-loss crops kept per class and per source (default: config.json)",
+    )
+    args = parser.parse_args()
+
+    learner = Learner(args.model)
+    learner.analyze_errors(ds_idx=1 if args.split == "valid" else 0, top_k=args.top_k)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import sys
+import time
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from classifier import Manifest
+from classifier.data.b49_db import STORE_DB
+
+"""
+Convert a tree of legacy V2 .r49 archives to a packed V3 store, in parallel.
+
+    <out>/store.db     layouts and images tables of the server schema
+                       (server/drizzle), `blobs` (image key -> blob) and
+                       `sources` (converted archives)
+    <out>/blobs/       images named by the SHA-256 of their content
+
+The conversion follows ui/src/api/load_r49_v2.ts: rect-0 and rect-3 become
+the 2-point calibration line, its length the diagonal of the layout size,
+`train-end` markers are dropped. Unlike the browser import, images are
+flagged `use_for_training`. Identical images are stored once.
+
+Archives are converted by worker processes and committed one by one, so an
+interrupted run resumes where it stopped; archives whose size and mtime did
+not change are skipped, changed ones are replaced. Train on the store with
+"db": {"path": "<out>", "blobs": "<out>"} in config.json.
+"""
+
+MIGRATIONS_DIR = Path(__file__).resolve().parents[1] / "server" / "drizzle"
+
+STORE_TABLES = """
+CREATE TABLE IF NOT EXISTS blobs (
+    key TEXT PRIMARY KEY,
+    blob_id TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sources (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    layout_id TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS images_layout_id ON images (layout_id);
+"""
+
+
+def open_store(out: Path) -> sqlite3.Connection:
+    (out / "blobs").mkdir(parents=True, exist_ok=True)
+    con = sqlite3.connect(out / STORE_DB)
+    con.execute("PRAGMA journal_mode = WAL")
+    if not con.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'layouts'"
+    ).fetchone():
+        for migration in sorted(MIGRATIONS_DIR.glob("*.sql")):
+            for statement in migration.read_text().split("--> statement-breakpoint"):
+                con.executescript(statement)
+    con.executescript(STORE_TABLES)
+    return con
+
+
+def convert(r49_file: Path, rel_path: str, blob_dir: Path) -> dict:
+    """
+    Convert one archive: write its images to `blob_dir` and return the rows
+    of the layout, its images and their blobs. Runs in a worker process.
+    """
+    with zipfile.ZipFile(r49_file, "r") as zf:
+        with zf.open("manifest.json") as f:
+            manifest = Manifest(**json.load(f))
+        if manifest.version != 2:
+            raise ValueError(f"Unsupported legacy version: {manifest.version}")
+
+        rect0 = manifest.calibration.get("rect-0")
+        rect3 = manifest.calibration.get("rect-3")
+        if rect0 is None or rect3 is None:
+            missing = [k for k in ("rect-0", "rect-3") if k not in manifest.calibration]
+            raise ValueError(f"Missing calibration markers: {', '.join(missing)}")
+
+        size = manifest.layout.size
+        created_at = int(r49_file.stat().st_mtime)
+        layout_id = str(uuid.uuid5(uuid.NAMESPACE_URL, rel_path))
+        layout = (
+            layout_id,
+            manifest.layout.name or r49_file.stem,
+            manifest.layout.description,
+            manifest.layout.scale.value,
+            rect0.x,
+            rect0.y,
+            rect3.x,
+            rect3.y,
+            round(math.hypot(size.width or 0, size.height or 0)),
+            created_at,
+            created_at,
+        )
+
+        images, blobs = [], []
+        for i, image in enumerate(manifest.images):
+            data = zf.read(image.filename)
+            blob_id = hashlib.sha256(data).hexdigest()
+            blob = blob_dir / blob_id
+            if not blob.exists():
+                # Content-addressed, concurrent writers produce the same file
+                tmp = blob.with_name(f"{blob_id}.{os.getpid()}.tmp")
+                tmp.write_bytes(data)
+                tmp.replace(blob)
+            image_id = str(uuid.uuid5(uuid.NAMESPACE_URL, f"{rel_path}#{i}"))
+            markers = {
+                marker_id: {"id": marker_id, "x": m.x, "y": m.y, "type": m.type or "track"}
+                for marker_id, m in image.labels.items()
+                if m.type != "train-end"
+            }
+            # created_at keeps the manifest order of the images
+            images.append((image_id, layout_id, json.dumps(markers), 1, created_at + i))
+            blobs.append((f"{image_id}.jpg", blob_id))
+
+    return {"layout": layout, "images": images, "blobs": blobs}
+
+
+def remove_layout(con: sqlite3.Connection, layout_id: str):
+    con.execute(
+        "DELETE FROM blobs WHERE key IN "
+        "(SELECT id || '.jpg' FROM images WHERE layout_id = ?)",
+        (layout_id,),
+    )
+    con.execute("DELETE FROM images WHERE layout_id = ?", (layout_id,))
+    con.execute("DELETE FROM layouts WHERE id = ?", (layout_id,))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert V2 .r49 archives to a V3 store")
+    parser.add_argument("data_dir", type=Path, help="Directory tree of .r49 archives")
+    parser.add_argument("out", type=Path, help="Store directory")
+    parser.add_argument(
+        "--workers", type=int, default=os.cpu_count(), help="Worker processes"
+    )
+    parser.add_argument(
+        "--retry-failed", action="store_true", help="Retry archives that failed before"
+    )
+    args = parser.parse_args()
+
+    con = open_store(args.out)
+    done = {
+        path: (size, mtime_ns, layout_id, error)
+        for path, size, mtime_ns, layout_id, error in con.execute("SELECT * FROM sources")
+    }
+
+    todo = []
+    for f in sorted(args.data_dir.rglob("**/*.r49")):
+        rel_path = f.relative_to(args.data_dir).as_posix()
+        st = f.stat()
+        prev = done.get(rel_path)
+        if prev is not None and prev[:2] == (st.st_size, st.st_mtime_ns):
+            if prev[3] is None or not args.retry_failed:
+                continue
+        todo.append((f, rel_path, st))
+    print(f"{len(todo)} archives to convert, {len(done)} converted before")
+
+    t0 = time.perf_counter()
+    converted = failed = 0
+    with ProcessPoolExecutor(args.workers) as pool:
+        futures = {
+            pool.submit(convert, f, rel_path, args.out / "blobs"): (rel_path, st)
+            for f, rel_path, st in todo
+        }
+        for n, future in enumerate(as_completed(futures), 1):
+            rel_path, st = futures[future]
+            try:
+                rows, error = future.result(), None
+            except Exception as e:
+                rows, error = None, str(e)
+                print(f"Failed {rel_path}: {e}")
+
+            # One transaction per archive, the resume point
+            with con:
+                prev = done.get(rel_path)
+                if prev is not None and prev[2] is not None:
+                    remove_layout(con, prev[2])
+                if rows is not None:
+                    con.execute(
+                        "INSERT INTO layouts (id, name, description, scale, p1_x, "
+                        "p1_y, p2_x, p2_y, ref_dist_mm, updated_at, created_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        rows["layout"],
+                    )
+                    con.executemany(
+                        "INSERT INTO images (id, layout_id, markers, "
+                        "use_for_training, created_at) VALUES (?, ?, ?, ?, ?)",
+                        rows["images"],
+                    )
+                    con.executemany("INSERT INTO blobs VALUES (?, ?)", rows["blobs"])
+                con.execute(
+                    "INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?, ?)",
+                    (
+                        rel_path,
+                        st.st_size,
+                        st.st_mtime_ns,
+                        rows["layout"][0] if rows else None,
+                        error,
+                    ),
+                )
+            converted += rows is not None
+            failed += rows is None
+            if n % 100 == 0 or n == len(todo):
+                rate = n / (time.perf_counter() - t0)
+                print(f"[{n}/{len(todo)}] {rate:.1f} archives/s")
+
+    (layouts,) = con.execute("SELECT COUNT(*) FROM layouts").fetchone()
+    (images, blobs) = con.execute(
+        "SELECT COUNT(*), COUNT(DISTINCT blob_id) FROM blobs"
+    ).fetchone()
+    con.close()
+    print(
+        f"Converted {converted}, failed {failed}. Store: {layouts} layouts, "
+        f"{images} images, {blobs} distinct blobs"
+    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
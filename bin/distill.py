@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+
+import argparse
+
+from classifier.learn.distiller import Distiller
+
+"""
+Train a small student model on the soft targets of a trained teacher.
+
+The student is a model directory like any other, e.g. models/tiny/config.json
+
+    {"model": "tiny_cnn", "size": 32, "dpt": 20,
+     "distill": {"teacher": "resnet18", "temperature": 4.0, "alpha": 0.7}}
+
+and is exported with bin/export.py. Teacher logits are cached in the student's
+teacher_logits.npz.
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Distill a teacher into a student model")
+    parser.add_argument("model", help="Student model name")
+    parser.add_argument(
+        "--teacher", default=None, help="Teacher model name (default: config.json)"
+    )
+    parser.add_argument("--epochs", type=int, default=20, help="Number of epochs")
+    args = parser.parse_args()
+
+    distiller = Distiller(args.model, teacher=args.teacher)
+    distiller.learn(epochs=args.epochs)
+    teacher_error, student_error = distiller.compare()
+    print(
+        f"Validation error: teacher {teacher_error:.4f}, student {student_error:.4f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
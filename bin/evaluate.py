@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+from pathlib import Path
+
+from classifier.inference.evaluation import evaluate, format_evaluation
+
+"""
+Compare exported models and precisions on held-out layouts, i.e. .r49
+archives none of the models was trained on:
+
+    bin/evaluate.py resnet18 resnet18-p50 tiny --data heldout/ --output eval.json
+
+Models are export directories, or names in ui/public/models. Crops are cut
+once per distinct (dpt, size), all model/precision combinations run
+concurrently, then latency is measured per model alone. Prints the error,
+latency, error per layout and confusion matrices as markdown; --output
+writes everything, including the confusion matrix of every layout, as JSON.
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate models on held-out layouts")
+    parser.add_argument(
+        "models", nargs="+", help="Export directories or model names (ui/public/models/<name>)"
+    )
+    parser.add_argument(
+        "--data",
+        type=Path,
+        nargs="+",
+        required=True,
+        help="Held-out .r49 archives or directories containing them",
+    )
+    parser.add_argument(
+        "--precisions",
+        nargs="+",
+        default=None,
+        help="e.g. fp32 int8 (default: every exported precision)",
+    )
+    parser.add_argument(
+        "--latency-runs", type=int, default=100, help="Single-crop runs for the bs=1 latency"
+    )
+    parser.add_argument(
+        "--batch", type=int, default=64, help="Batch size of the throughput measurement"
+    )
+    parser.add_argument("--output", type=Path, default=None, help="Write the results as JSON")
+    args = parser.parse_args()
+
+    model_dirs = []
+    for model in args.models:
+        path = Path(model)
+        model_dirs.append(path if path.is_dir() else Path("ui/public/models") / model)
+    # Layouts are named by their path below the --data directory (as given if
+    # there are several), so archives with the same name stay apart
+    r49_files = {}
+    for path in args.data:
+        root = path.parent if path.is_file() else path
+        for f in [path] if path.is_file() else sorted(path.rglob("*.r49")):
+            r49_files[str(f if len(args.data) > 1 else f.relative_to(root))] = f
+    print(f"{len(r49_files)} held-out archives")
+
+    results = evaluate(
+        model_dirs,
+        r49_files,
+        precisions=args.precisions,
+        latency_runs=args.latency_runs,
+        batch=args.batch,
+    )
+    print()
+    print("\n".join(format_evaluation(results)))
+    if args.output:
+        print(f"\nWriting {args.output}")
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
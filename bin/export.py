@@ -16,6 +16,38 @@ def main():
         help="Name of the model to train (e.g. resnet18)",
     )
 
+    parser.add_argument(
+        "--skip-validation",
+        action="store_true",
+        help="Export without loading the dataset or validating the models",
+    )
+    parser.add_argument(
+        "--static-int8",
+        action="store_true",
+        default=None,
+        help="Also export a static QDQ Int8 model calibrated on validation crops",
+    )
+    parser.add_argument(
+        "--fused-preprocessing",
+        action="store_true",
+        default=None,
+        help="Export models taking raw uint8 NHWC patches (normalization in graph)",
+    )
+
+    parser.add_argument(
+        "--frame-model",
+        action="store_true",
+        default=None,
+        help="Also export a whole-frame model classifying all markers in one run",
+    )
+
+    parser.add_argument(
+        "--optimized-model",
+        action="store_true",
+        default=None,
+        help="Also ship offline-optimized ONNX models for fast session startup",
+    )
+
     args = parser.parse_args()
 
     print(f"Exporting model {args.model}...")
@@ -26,7 +58,14 @@ def main():
         print(f"Target directory: {output_dir}")
 
         exporter = Exporter(args.model)
-        exporter.export(output_dir=output_dir)
+        exporter.export(
+            output_dir=output_dir,
+            validate=not args.skip_validation,
+            static_int8=args.static_int8,
+            fused_preprocessing=args.fused_preprocessing,
+            frame_model=args.frame_model,
+            optimized_model=args.optimized_model,
+        )
     except Exception as e:
         print(f"Export failed: {e}")
 
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+
+import argparse
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import cv2
+import numpy as np
+import torch
+
+from classifier import B49File, Exporter, apply_scaling_transform
+
+"""
+Parity check of the whole-frame model against the per-patch B49File crops.
+
+1. Frames at the model dpt with integer centers: the in-graph patches must be
+   pixel-identical to the B49File crops and the logits must match.
+2. Raw frames downscaled by `--downscale` (what the live view sends): patches
+   are resampled in-graph, so only the predictions are compared.
+3. If frame_fp32.ort was exported: ORT frame model vs PyTorch, and the time of
+   one frame run vs one per-patch run per marker.
+"""
+
+
+def torch_frame(image_bgr):
+    return torch.from_numpy(cv2.cvtColor(image_bgr, cv2.COLOR_BGR2RGB))[None]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Whole-frame model parity check")
+    parser.add_argument(
+        "model", nargs="?", default="resnet18", help="Model name (to load config)"
+    )
+    parser.add_argument(
+        "--export-dir",
+        type=Path,
+        default=None,
+        help="Directory with frame_fp32.ort (default: ui/public/models/<model>)",
+    )
+    parser.add_argument(
+        "--max-files", type=int, default=4, help="Number of .r49 files to check"
+    )
+    parser.add_argument(
+        "--downscale",
+        type=float,
+        default=1.5,
+        help="Downscale factor of the raw frames in the second check",
+    )
+    args = parser.parse_args()
+
+    exporter = Exporter(args.model)
+    frame_model = exporter.frame_classifier()
+    size, dpt = exporter.size, exporter.dpt
+
+    files = sorted(exporter.data_dir.rglob("**/*.r49"))[: args.max_files]
+    if not files:
+        print("No .r49 files found.")
+        return 1
+
+    max_pixel_diff = max_logit_diff = 0.0
+    raw_pixel_diffs = []
+    n_markers = n_agree = n_raw_agree = 0
+    frames = []  # (frame, centers) for the ORT check
+    for f in files:
+        ds = B49File(
+            f,
+            dpt=dpt,
+            size=size,
+            labels=exporter.labels,
+            image_transform=apply_scaling_transform,
+        )
+        by_image = defaultdict(list)
+        for idx in range(len(ds)):
+            by_image[ds.get_info(idx)[1]].append(idx)
+
+        for image_index, idxs in by_image.items():
+            crops = np.stack([np.asarray(ds[idx][0]) for idx in idxs])
+            crops_t = torch.from_numpy(crops).permute(0, 3, 1, 2).float()
+
+            # 1. Transformed frame, integer centers
+            frame = torch_frame(ds.load_image(image_index))
+            centers = torch.tensor([ds.get_center(idx) for idx in idxs]).float()
+            img_dpt = torch.tensor([float(dpt)])
+            with torch.no_grad():
+                patches = frame_model.patches(frame, centers, img_dpt)
+                logits = frame_model(frame, centers, img_dpt)
+                ref = frame_model.model(
+                    crops_t * frame_model.scale + frame_model.bias
+                )
+            max_pixel_diff = max(max_pixel_diff, (patches - crops_t).abs().max().item())
+            max_logit_diff = max(max_logit_diff, (logits - ref).abs().max().item())
+            n_agree += (logits.argmax(1) == ref.argmax(1)).sum().item()
+            n_markers += len(idxs)
+            frames.append((frame.numpy(), centers.numpy()))
+
+            # 2. Downscaled raw frame, as sent by the live view
+            labels = ds.manifest.get_image(image_index).labels
+            raw_centers = torch.tensor(
+                [
+                    [labels[ds.get_info(idx)[2]].x, labels[ds.get_info(idx)[2]].y]
+                    for idx in idxs
+                ]
+            ).float() / args.downscale
+            raw_image = ds.load_image(image_index, transform=False)
+            h, w = raw_image.shape[:2]
+            raw_frame = torch_frame(
+                cv2.resize(
+                    raw_image,
+                    (round(w / args.downscale), round(h / args.downscale)),
+                    interpolation=cv2.INTER_AREA,
+                )
+            )
+            raw_dpt = torch.tensor([ds.manifest.dots_per_track / args.downscale])
+            with torch.no_grad():
+                raw_patches = frame_model.patches(raw_frame, raw_centers, raw_dpt)
+                raw_logits = frame_model(raw_frame, raw_centers, raw_dpt)
+            raw_pixel_diffs.append((raw_patches - crops_t).abs().mean().item())
+            n_raw_agree += (raw_logits.argmax(1) == ref.argmax(1)).sum().item()
+
+    print(f"Checked {n_markers} markers in {len(frames)} frames of {len(files)} files")
+    print(f"Model-dpt frames: max pixel diff {max_pixel_diff:.3f}, "
+          f"max logit diff {max_logit_diff:.2e}, "
+          f"prediction agreement {n_agree / n_markers:.2%}")
+    print(f"Raw frames /{args.downscale:g}: mean pixel diff {np.mean(raw_pixel_diffs):.2f}, "
+          f"prediction agreement {n_raw_agree / n_markers:.2%}")
+    ok = max_pixel_diff < 0.5 and n_agree == n_markers
+
+    # 3. Exported ORT models
+    export_dir = args.export_dir or Path("ui/public/models") / args.model
+    frame_ort = export_dir / "frame_fp32.ort"
+    if frame_ort.exists():
+        import onnxruntime as ort
+
+        frame_sess = ort.InferenceSession(str(frame_ort), providers=["CPUExecutionProvider"])
+        ort_diff, frame_s = 0.0, 0.0
+        for frame, centers in frames:
+            feeds = {
+                "frame": frame,
+                "centers": centers,
+                "img_dpt": np.array([dpt], dtype=np.float32),
+            }
+            t0 = time.perf_counter()
+            (out,) = frame_sess.run(None, feeds)
+            frame_s += time.perf_counter() - t0
+            with torch.no_grad():
+                ref = frame_model(*(torch.from_numpy(v) for v in feeds.values()))
+            ort_diff = max(ort_diff, np.abs(out - ref.numpy()).max())
+        print(f"ORT frame model:  max logit diff vs PyTorch {ort_diff:.2e}, "
+              f"{1000 * frame_s / len(frames):.2f} ms/frame")
+        ok = ok and ort_diff < 1e-3
+
+        patch_ort = export_dir / "model_fp32.ort"
+        if patch_ort.exists():
+            patch_sess = ort.InferenceSession(str(patch_ort), providers=["CPUExecutionProvider"])
+            input_info = patch_sess.get_inputs()[0]
+            patch_s = 0.0
+            for frame, centers in frames:
+                with torch.no_grad():
+                    patches = frame_model.patches(
+                        torch.from_numpy(frame),
+                        torch.from_numpy(centers),
+                        torch.tensor([float(dpt)]),
+                    )
+                if "uint8" in input_info.type:
+                    xs = patches.permute(0, 2, 3, 1).round().byte().numpy()
+                else:
+                    xs = (patches * frame_model.scale + frame_model.bias).numpy()
+                t0 = time.perf_counter()
+                for x in xs:
+                    patch_sess.run(None, {input_info.name: x[None]})
+                patch_s += time.perf_counter() - t0
+            print(f"ORT per patch:    {1000 * patch_s / len(frames):.2f} ms/frame "
+                  f"({n_markers / len(frames):.1f} markers/frame)")
+    else:
+        print(f"{frame_ort} not found, export with --frame-model to check ORT")
+
+    print("PASS" if ok else "FAIL")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
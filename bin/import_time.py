@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import subprocess
+import sys
+
+"""
+Import-time benchmark for the classifier package.
+
+Each import runs in a fresh interpreter. Fails (exit 1) if an import pulls
+in a forbidden heavy dependency or exceeds its time budget.
+"""
+
+HEAVY = ["fastai", "onnx", "onnxruntime", "matplotlib"]
+
+# (import statement, forbidden modules, budget [ms])
+CHECKS = [
+    ("import classifier", HEAVY + ["torch", "cv2", "pydantic"], 100),
+    ("from classifier import Manifest", HEAVY + ["torch", "cv2"], 500),
+    ("from classifier import LearnerConfig", HEAVY + ["torch"], 100),
+    ("from classifier import B49File, B49Dataset", HEAVY, 5000),
+    ("from classifier import Predictor", ["fastai", "onnx", "torch", "matplotlib"], 1000),
+]
+
+PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+{stmt}
+dt = 1000 * (time.perf_counter() - t0)
+print(json.dumps({{"ms": dt, "modules": sorted({{m.split('.')[0] for m in sys.modules}})}}))
+"""
+
+
+def measure(stmt: str, repeat: int) -> tuple[float, set[str]]:
+    """Best-of-`repeat` import time [ms] and the top-level modules loaded."""
+    best, modules = float("inf"), set()
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, "-c", PROBE.format(stmt=stmt)],
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+        res = json.loads(out.stdout.strip().splitlines()[-1])
+        best = min(best, res["ms"])
+        modules = set(res["modules"])
+    return best, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Guard classifier import times")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per import")
+    parser.add_argument(
+        "--scale",
+        type=float,
+        default=1.0,
+        help="Multiply all time budgets (e.g. on slow CI machines)",
+    )
+    args = parser.parse_args()
+
+    failed = False
+    for stmt, forbidden, budget in CHECKS:
+        ms, modules = measure(stmt, args.repeat)
+        leaked = sorted(set(forbidden) & modules)
+        ok = not leaked and ms <= budget * args.scale
+        failed |= not ok
+        status = "ok  " if ok else "FAIL"
+        print(f"{status} {ms:8.1f} ms (budget {budget * args.scale:.0f})  {stmt}")
+        if leaked:
+            print(f"       imports {', '.join(leaked)}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
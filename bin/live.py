@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+
+import argparse
+import asyncio
+import json
+from pathlib import Path
+
+from classifier import Predictor
+from classifier.inference.change_gate import ChangeGate
+from classifier.inference.live import FrameSource, LiveLayout, LivePipeline
+
+"""
+Headless live classification service.
+
+Reads frames from a directory of images, a video file, a stream URL or a
+camera index, classifies the layout's markers in every frame and publishes
+the results to MQTT in the `rails49/live/predictions` format (mqtt/README.md).
+Publishing requires paho-mqtt (`pip install paho-mqtt`); without --broker the
+payloads are printed instead.
+"""
+
+
+def mqtt_publisher(broker: str, topic: str):
+    try:
+        import paho.mqtt.client as mqtt
+    except ImportError as e:
+        raise ImportError(f"Publishing to MQTT requires paho-mqtt: {e}") from e
+
+    host, _, port = broker.removeprefix("mqtt://").partition(":")
+    client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+    client.connect(host, int(port or 1883))
+    client.loop_start()
+    print(f"[MQTT] Connected to {host}:{port or 1883}, publishing to {topic}")
+
+    def publish(payload: dict):
+        client.publish(topic, json.dumps(payload), qos=0)
+
+    return publish
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless live classification")
+    parser.add_argument(
+        "source", help="Image directory, video file, stream URL or camera index"
+    )
+    parser.add_argument(
+        "--layout",
+        type=Path,
+        required=True,
+        help="Layout markers: .r49 archive or layout JSON",
+    )
+    parser.add_argument(
+        "--image-index",
+        type=int,
+        default=0,
+        help="Image of the .r49 archive whose markers are classified",
+    )
+    parser.add_argument(
+        "--model-dir",
+        type=Path,
+        default=Path("ui/public/models/resnet18"),
+        help="Exported model directory",
+    )
+    parser.add_argument(
+        "--precision", default=None, help="fp32, fp16, int8 (default: recommended)"
+    )
+    parser.add_argument(
+        "--broker", default=None, help="MQTT broker, e.g. localhost:1883"
+    )
+    parser.add_argument(
+        "--topic", default="rails49/live/predictions", help="MQTT topic"
+    )
+    parser.add_argument(
+        "--fps", type=float, default=None, help="Pace image directories/videos"
+    )
+    parser.add_argument("--loop", action="store_true", help="Loop the source")
+    parser.add_argument(
+        "--queue-size", type=int, default=2, help="Frames buffered between stages"
+    )
+    parser.add_argument(
+        "--gate-threshold",
+        type=float,
+        default=4.0,
+        help="Mean gray level change that triggers reclassification (0: always)",
+    )
+    parser.add_argument(
+        "--refresh-every",
+        type=int,
+        default=30,
+        help="Reclassify unchanged markers at least every N frames",
+    )
+    args = parser.parse_args()
+
+    layout = LiveLayout.from_file(args.layout, args.image_index)
+    predictor = Predictor(
+        args.model_dir,
+        precision=args.precision,
+        max_batch=max(1, len(layout.markers)),
+    )
+    print(
+        f"Layout {layout.id}: {len(layout.markers)} markers, "
+        f"model {args.model_dir.name} ({predictor.precision})"
+    )
+
+    if args.broker:
+        publish = mqtt_publisher(args.broker, args.topic)
+    else:
+        def publish(payload: dict):
+            print(json.dumps(payload))
+
+    pipeline = LivePipeline(
+        FrameSource(args.source, fps=args.fps, loop=args.loop),
+        layout,
+        predictor,
+        publish,
+        queue_size=args.queue_size,
+        gate=(
+            ChangeGate(args.gate_threshold, args.refresh_every)
+            if args.gate_threshold > 0
+            else None
+        ),
+    )
+    try:
+        asyncio.run(pipeline.run())
+    except KeyboardInterrupt:
+        pass
+    print(f"[live] {pipeline.stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+
+import argparse
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from classifier.data.marker_index import MarkerIndex
+from classifier.learn.config import DATA_DIR, MARKER_INDEX
+
+"""
+Build or update the manifest-only marker index of the .r49 archives and
+summarize it: markers per scale and type, per layout, and archives that
+failed to load or have no calibration (dots_per_track == -1).
+
+    bin/marker_index.py --query "type == 'train' and scale == 'N'"
+    bin/marker_index.py --group-by layout type
+
+Set "data_filter" in a model's config.json to a query to train on the
+archives with matching markers.
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manifest-only marker index")
+    parser.add_argument(
+        "--data-dir", type=Path, default=DATA_DIR, help="Directory tree of .r49 archives"
+    )
+    parser.add_argument("--index", type=Path, default=MARKER_INDEX, help="Index file")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes")
+    parser.add_argument("--query", default=None, help="pandas query on the markers")
+    parser.add_argument(
+        "--group-by",
+        nargs="+",
+        default=["scale", "type"],
+        help="Columns to count markers by",
+    )
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    index = MarkerIndex.update(args.data_dir, args.index, args.workers)
+    archives = index.archives_frame()
+    print(
+        f"Indexed {len(archives)} archives, {len(index)} markers "
+        f"in {time.perf_counter() - t0:.2f} s ({args.index})"
+    )
+
+    t0 = time.perf_counter()
+    markers = index.to_pandas()
+    if args.query:
+        markers = markers.query(args.query)
+    counts = markers.groupby(args.group_by, observed=True).size().unstack(fill_value=0)
+    t_query = time.perf_counter() - t0
+
+    with pd.option_context("display.max_rows", 200, "display.width", 160):
+        if args.query:
+            print(f"\n{len(markers)} markers in {markers['archive'].nunique()} archives match {args.query!r}")
+        print(f"\n{counts}")
+
+        failed = archives[archives["error"] != ""]
+        if len(failed):
+            print(f"\nFailed to load ({len(failed)}):")
+            print(failed[["path", "error"]].to_string(index=False))
+        uncalibrated = archives[(archives["error"] == "") & (archives["dpt"] <= 0)]
+        if len(uncalibrated):
+            print(f"\nNo calibration ({len(uncalibrated)}):")
+            print(uncalibrated[["path", "layout", "scale"]].to_string(index=False))
+    print(f"\nQuery {1000 * t_query:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
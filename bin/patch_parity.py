@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+
+import argparse
+import base64
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from classifier import B49File, LearnerConfig, apply_scaling_transform
+from classifier.data.patches import extract_patches, reference_patch
+
+"""
+Parity checks of the vectorized patch extractor (classifier/data/patches.py).
+
+1. At the model dpt with integer centers, patches equal the B49File crops.
+2. Random subpixel centers (also partly outside the frame) and scales agree
+   with the per-pixel float reference implementation.
+3. With --chrome, the same cases are drawn with canvas drawImage in headless
+   Chrome exactly like Classifier.patch and compared.
+4. Timing of one frame's patches against the whole-frame resize + crop.
+"""
+
+BROWSER_PAGE = """<!DOCTYPE html><html><body><script>
+const cases = %(cases)s;
+const raw = Uint8ClampedArray.from(atob("%(rgba)s"), c => c.charCodeAt(0));
+const image = new ImageData(raw, %(width)d, %(height)d);
+const src = new OffscreenCanvas(%(width)d, %(height)d);
+src.getContext('2d').putImageData(image, 0, 0);
+const size = %(size)d;
+const out = [];
+for (const [cx, cy, scale] of cases) {
+  // Same steps as Classifier.patch
+  const srcSize = size * scale;
+  const canvas = new OffscreenCanvas(size, size);
+  const ctx = canvas.getContext('2d');
+  ctx.fillStyle = 'black';
+  ctx.fillRect(0, 0, size, size);
+  ctx.drawImage(src, cx - srcSize / 2, cy - srcSize / 2, srcSize, srcSize, 0, 0, size, size);
+  const data = ctx.getImageData(0, 0, size, size).data;
+  let s = '';
+  for (let i = 0; i < data.length; i++) s += String.fromCharCode(data[i]);
+  out.push(btoa(s));
+}
+document.body.textContent = JSON.stringify(out);
+</script></body></html>"""
+
+
+def browser_patches(chrome: str, frame_rgb: np.ndarray, cases, size: int) -> np.ndarray:
+    """RGB patches drawn by Chrome's canvas for `cases` of (cx, cy, scale)."""
+    h, w = frame_rgb.shape[:2]
+    rgba = np.dstack([frame_rgb, np.full((h, w), 255, np.uint8)])
+    page = BROWSER_PAGE % {
+        "cases": json.dumps([list(map(float, c)) for c in cases]),
+        "rgba": base64.b64encode(rgba.tobytes()).decode(),
+        "width": w,
+        "height": h,
+        "size": size,
+    }
+    with tempfile.NamedTemporaryFile("w", suffix=".html", delete=False) as f:
+        f.write(page)
+    try:
+        out = subprocess.run(
+            [
+                chrome,
+                "--headless",
+                "--no-sandbox",
+                "--disable-gpu",
+                "--dump-dom",
+                f"file://{f.name}",
+            ],
+            check=True,
+            capture_output=True,
+            text=True,
+            timeout=120,
+        ).stdout
+    finally:
+        Path(f.name).unlink()
+    # Setting textContent replaced the script, the body is just the JSON
+    body = out[out.index("<body>") + 6 : out.index("</body>")]
+    return np.stack(
+        [
+            np.frombuffer(base64.b64decode(p), np.uint8).reshape(size, size, 4)[..., :3]
+            for p in json.loads(body)
+        ]
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Patch extractor parity checks")
+    parser.add_argument(
+        "model", nargs="?", default="resnet18", help="Model name (to load config)"
+    )
+    parser.add_argument("--cases", type=int, default=64, help="Random cases")
+    parser.add_argument(
+        "--chrome", default=None, help="Chrome binary for the drawImage comparison"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    config = LearnerConfig(args.model)
+    size, dpt = config.size, config.dpt
+    rng = np.random.default_rng(args.seed)
+    ok = True
+
+    # 1. B49File crops
+    files = sorted(config.data_dir.rglob("**/*.r49"))
+    frame = None
+    if files:
+        ds = B49File(
+            files[0],
+            dpt=dpt,
+            size=size,
+            labels=config.labels,
+            image_transform=apply_scaling_transform,
+        )
+        idxs = [i for i in range(len(ds)) if ds.get_info(i)[1] == 0]
+        frame = cv2.cvtColor(ds.load_image(0), cv2.COLOR_BGR2RGB)
+        centers = np.array([ds.get_center(i) for i in idxs], dtype=np.float64)
+        patches = extract_patches(frame, centers, dpt, dpt, size)
+        crops = np.stack([np.asarray(ds[i][0]) for i in idxs])
+        diff = np.abs(patches.astype(int) - crops).max()
+        print(f"B49File crops ({len(idxs)}): max diff {diff}")
+        ok = ok and diff == 0
+        frame = cv2.cvtColor(ds.load_image(0, transform=False), cv2.COLOR_BGR2RGB)
+    if frame is None:
+        frame = rng.integers(0, 256, (240, 320, 3), dtype=np.uint8)
+
+    # 2. Float reference, subpixel centers, partly outside the frame
+    h, w = frame.shape[:2]
+    cases = [
+        (
+            rng.uniform(-0.3 * size, w + 0.3 * size),
+            rng.uniform(-0.3 * size, h + 0.3 * size),
+            rng.uniform(0.5, 3.0),
+        )
+        for _ in range(args.cases)
+    ]
+    ref = np.stack(
+        [reference_patch(frame, (cx, cy), s * dpt, dpt, size) for cx, cy, s in cases]
+    )
+    fast = np.stack(
+        [extract_patches(frame, [(cx, cy)], s * dpt, dpt, size)[0] for cx, cy, s in cases]
+    )
+    diff = np.abs(fast.astype(int) - ref)
+    print(
+        f"Reference ({len(cases)} cases): max diff {diff.max()}, "
+        f"mean {diff.mean():.3f}"
+    )
+    ok = ok and diff.max() <= 2
+
+    # 3. Browser canvas
+    if args.chrome:
+        browser = browser_patches(args.chrome, frame, cases, size)
+        diff = np.abs(fast.astype(int) - browser)
+        print(
+            f"Chrome drawImage ({len(cases)} cases): max diff {diff.max()}, "
+            f"mean {diff.mean():.3f}, within 2 levels {np.mean(diff <= 2):.2%}"
+        )
+        for lo, hi in [(0.5, 1.0), (1.0, 2.0), (2.0, 3.0)]:
+            sel = np.array([lo <= scale < hi for _, _, scale in cases])
+            if sel.any():
+                print(f"  scale {lo}-{hi}: mean diff {diff[sel].mean():.3f}")
+
+    # 4. Timing, one layout's worth of markers
+    n = config.markers_per_layout
+    centers = np.stack([rng.uniform(0, w, n), rng.uniform(0, h, n)], axis=1)
+    img_dpt = 1.5 * dpt
+    t0 = time.perf_counter()
+    for _ in range(20):
+        extract_patches(frame, centers, img_dpt, dpt, size)
+    t_fast = (time.perf_counter() - t0) / 20
+    t0 = time.perf_counter()
+    for _ in range(20):
+        scale = dpt / img_dpt
+        scaled = cv2.resize(
+            frame, (round(w * scale), round(h * scale)), interpolation=cv2.INTER_AREA
+        )
+        r = size // 2
+        padded = cv2.copyMakeBorder(scaled, r, r, r, r, cv2.BORDER_CONSTANT, value=0)
+        for cx, cy in centers:
+            x, y = int(cx * scale), int(cy * scale)
+            padded[y : y + size, x : x + size].copy()
+    t_resize = (time.perf_counter() - t0) / 20
+    print(
+        f"{n} markers on {w}x{h}: remap {1000 * t_fast:.2f} ms, "
+        f"resize + crop {1000 * t_resize:.2f} ms"
+    )
+
+    print("PASS" if ok else "FAIL")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+
+import argparse
+import asyncio
+import random
+import time
+from pathlib import Path
+
+import numpy as np
+
+from classifier import B49File, LearnerConfig, MicroBatcher, Predictor
+from classifier import apply_scaling_transform
+from classifier.inference.predictor import format_stats
+
+"""
+Classify the B49File crops of the dataset with an exported model and report
+latency and throughput per batch size, both for direct batched calls and
+for concurrent single-patch requests through the asyncio MicroBatcher.
+"""
+
+
+def load_patches(config: LearnerConfig, max_files: int) -> tuple[np.ndarray, list[str]]:
+    patches, labels = [], []
+    for f in sorted(config.data_dir.rglob("**/*.r49"))[:max_files]:
+        ds = B49File(
+            f,
+            dpt=config.dpt,
+            size=config.size,
+            labels=config.labels,
+            image_transform=apply_scaling_transform,
+        )
+        for idx in range(len(ds)):
+            img, label = ds[idx]
+            patches.append(np.asarray(img))
+            labels.append(label)
+    return np.stack(patches), labels
+
+
+async def run_clients(
+    batcher: MicroBatcher, patches: np.ndarray, clients: int, rate: float
+) -> list[str]:
+    """`clients` concurrent callers, each sending single patches at ~`rate`/s."""
+    results: list[str | None] = [None] * len(patches)
+
+    async def client(c: int):
+        for i in range(c, len(patches), clients):
+            results[i] = await batcher.classify(patches[i])
+            if rate:
+                await asyncio.sleep(random.expovariate(rate))
+
+    async with batcher:
+        await asyncio.gather(*(client(c) for c in range(clients)))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batched inference with Predictor")
+    parser.add_argument(
+        "model", nargs="?", default="resnet18", help="Model name (to load config)"
+    )
+    parser.add_argument(
+        "--export-dir",
+        type=Path,
+        default=None,
+        help="Exported model directory (default: ui/public/models/<model>)",
+    )
+    parser.add_argument(
+        "--precision", default=None, help="fp32, fp16, int8 (default: recommended)"
+    )
+    parser.add_argument("--max-files", type=int, default=4, help=".r49 files to load")
+    parser.add_argument(
+        "--batch-sizes",
+        type=int,
+        nargs="+",
+        default=[1, 8, 32],
+        help="Batch sizes for direct calls",
+    )
+    parser.add_argument(
+        "--clients", type=int, default=16, help="Concurrent MicroBatcher callers"
+    )
+    parser.add_argument(
+        "--rate", type=float, default=200.0, help="Requests/s per caller (0: no pause)"
+    )
+    parser.add_argument(
+        "--max-delay-ms", type=float, default=5.0, help="MicroBatcher deadline"
+    )
+    args = parser.parse_args()
+
+    config = LearnerConfig(args.model)
+    export_dir = args.export_dir or Path("ui/public/models") / args.model
+    patches, labels = load_patches(config, args.max_files)
+    print(f"Loaded {len(patches)} patches")
+
+    for bs in args.batch_sizes:
+        predictor = Predictor(export_dir, precision=args.precision, max_batch=bs)
+        t0 = time.perf_counter()
+        preds = predictor.predict(patches)
+        dt = time.perf_counter() - t0
+        err = np.mean([p != y for p, y in zip(preds, labels)])
+        print(
+            f"\n[{predictor.precision}, max_batch={bs}] error {err:.2%}, "
+            f"{len(patches) / dt:.0f} patches/s end to end"
+        )
+        print("\n".join(format_stats(predictor.stats())))
+
+    predictor = Predictor(export_dir, precision=args.precision)
+    batcher = MicroBatcher(predictor, max_delay_ms=args.max_delay_ms)
+    t0 = time.perf_counter()
+    preds = asyncio.run(run_clients(batcher, patches, args.clients, args.rate))
+    dt = time.perf_counter() - t0
+    err = np.mean([p != y for p, y in zip(preds, labels)])
+    print(
+        f"\n[MicroBatcher, {args.clients} clients, max_delay {args.max_delay_ms} ms] "
+        f"error {err:.2%}, {len(patches) / dt:.0f} patches/s end to end"
+    )
+    print("\n".join(format_stats(predictor.stats(), batcher.stats())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+from pathlib import Path
+
+from classifier.learn.exporter import PRUNING_FILE, Exporter
+from classifier.learn.pruner import Pruner
+
+"""
+Structured pruning sweep of a trained model (needs torch-pruning).
+
+For every ratio the trained model.pth is pruned (whole conv channels
+removed), fine-tuned and saved as model <model>-p<percent>, e.g.
+resnet18-p50, and exported to ui/public/models. The error, size and
+latency of all ratios are written to the model's pruning.json, and the
+model is exported again so its README compares them:
+
+    bin/prune.py resnet18 --ratios 0.25 0.5 0.75
+
+Settings from config.json "pruning", e.g.
+{"ratios": [0.25, 0.5, 0.75], "importance": "magnitude", "epochs": 3}.
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Structured pruning sweep")
+    parser.add_argument("model", help="Name of the trained model")
+    parser.add_argument(
+        "--ratios",
+        type=float,
+        nargs="+",
+        default=None,
+        help="Fractions of channels to remove (default: config.json)",
+    )
+    parser.add_argument(
+        "--epochs", type=int, default=None, help="Fine-tuning epochs (default: config.json)"
+    )
+    parser.add_argument(
+        "--skip-export",
+        action="store_true",
+        help="Only prune and fine-tune, do not export or benchmark",
+    )
+    args = parser.parse_args()
+
+    pruner = Pruner(args.model)
+    ratios = args.ratios or pruner.pruning["ratios"]
+    source = pruner.baseline()
+    print(
+        f"{args.model}: {source['macs'] / 1e6:.1f} MMACs, "
+        f"{source['params'] / 1e6:.2f} M params, valid error {source['valid_err']:.4f}"
+    )
+
+    pruned = []
+    for ratio in ratios:
+        name = f"{args.model}-p{round(100 * ratio)}"
+        result = pruner.prune(ratio, epochs=args.epochs)
+        print(
+            f"{name}: {result['macs'] / 1e6:.1f} MMACs, "
+            f"{result['params'] / 1e6:.2f} M params, valid error {result['valid_err']:.4f}"
+        )
+        pruner.save(name, result)
+        row = {"model": name, **result}
+        if not args.skip_export:
+            exporter = Exporter(name)
+            metrics = exporter.export(output_dir=Path("ui/public/models") / name)
+            row |= exporter.summary(metrics)
+        pruned.append(row)
+
+    pruning_path = pruner.model_dir / PRUNING_FILE
+    print(f"Writing {pruning_path}")
+    with open(pruning_path, "w") as f:
+        json.dump({"source": source, "pruned": pruned}, f, indent=2)
+
+    if not args.skip_export:
+        # Re-export the source for its README with the comparison
+        Exporter(args.model).export(output_dir=Path("ui/public/models") / args.model)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,8 +2,9 @@
 
 
 import argparse
+from pathlib import Path
 
-from classifier import Learner
+from classifier import Exporter, Learner
 
 
 def parse_args():
@@ -16,23 +17,89 @@ def parse_args():
         help="Name of the model to train (e.g. resnet18)",
     )
     parser.add_argument(
-        "--epochs", type=int, default=20, help="Number of epochs to train (default: 20)"
+        "--epochs",
+        type=int,
+        default=None,
+        help="Number of epochs to train (default: 20, incremental: config.json)",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Fine-tune model.pth on new data and a replay sample, export if not worse",
+    )
+    parser.add_argument(
+        "--skip-export",
+        action="store_true",
+        help="Do not export after an accepted incremental fine-tune",
     )
     parser.add_argument(
         "--skip-show-results",
         action="store_true",
         help="Skip showing classification results after training",
     )
+    parser.add_argument(
+        "--error-report",
+        action="store_true",
+        help="Write the HTML error report instead of showing results (headless)",
+    )
+    parser.add_argument(
+        "--hard-examples",
+        action="store_true",
+        help="Oversample high-loss samples (settings from config.json 'hard_examples')",
+    )
+    parser.add_argument(
+        "--qat",
+        action="store_true",
+        help="Train the last epochs with fake quantization (settings from config.json 'qat')",
+    )
+    parser.add_argument(
+        "--telemetry",
+        action="store_true",
+        help="Record throughput and data-stall statistics to telemetry.csv",
+    )
+    parser.add_argument(
+        "--profile",
+        type=str,
+        default=None,
+        metavar="START:STOP",
+        help="Write a torch.profiler trace for training steps START..STOP",
+    )
     return parser.parse_args()
 
 
 def main():
     args = parse_args()
 
-    learner = Learner(args.model)
-    learner.learn(epochs=args.epochs)
+    profile_steps = None
+    if args.profile:
+        start, stop = args.profile.split(":")
+        profile_steps = (int(start), int(stop))
+
+    learner = Learner(
+        args.model,
+        hard_examples=args.hard_examples,
+        incremental=args.incremental,
+        qat=args.qat,
+    )
+    if args.incremental:
+        accepted = learner.learn_incremental(
+            epochs=args.epochs, telemetry=args.telemetry, profile_steps=profile_steps
+        )
+        if accepted and not args.skip_export:
+            # Validated above on the new data and the replay sample
+            Exporter(args.model).export(
+                output_dir=Path("ui/public/models") / args.model, validate=False
+            )
+    else:
+        learner.learn(
+            epochs=args.epochs or 20,
+            telemetry=args.telemetry,
+            profile_steps=profile_steps,
+        )
 
-    if not args.skip_show_results:
+    if args.error_report:
+        learner.analyze_errors()
+    elif not args.skip_show_results:
         learner.show_results()
 
 
@@ -1,22 +1,56 @@
 # ruff: noqa: F401
+"""
+Heavy submodules (fastai, torch, onnx, matplotlib) are imported lazily on
+first attribute access, so `from classifier import Manifest` stays cheap.
+"""
 
-from .data.image_transform import apply_perspective_transform, apply_scaling_transform
-from .data.manifest import Manifest
-from .data.r49_dataloaders import B49DataLoaders
-from .data.r49_dataset import B49Dataset
-from .data.r49_file import B49File
-from .learn.config import LearnerConfig
-from .learn.exporter import Exporter
-from .learn.learner import Learner
-
-__all__ = [
-    "apply_perspective_transform",
-    "apply_scaling_transform",
-    "Manifest",
-    "B49DataLoaders",
-    "B49Dataset",
-    "B49File",
-    "LearnerConfig",
-    "Exporter",
-    "Learner",
-]
+import importlib
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .data.image_transform import (
+        apply_perspective_transform,
+        apply_scaling_transform,
+    )
+    from .data.manifest import Manifest
+    from .data.r49_dataloaders import B49DataLoaders
+    from .data.r49_dataset import B49Dataset
+    from .data.r49_file import B49File
+    from .inference.predictor import MicroBatcher, Predictor
+    from .learn.config import LearnerConfig
+    from .learn.distiller import Distiller
+    from .learn.exporter import Exporter
+    from .learn.learner import Learner
+    from .learn.pruner import Pruner
+
+# Public name -> submodule defining it
+_LAZY_IMPORTS = {
+    "apply_perspective_transform": ".data.image_transform",
+    "apply_scaling_transform": ".data.image_transform",
+    "Manifest": ".data.manifest",
+    "B49DataLoaders": ".data.r49_dataloaders",
+    "B49Dataset": ".data.r49_dataset",
+    "B49File": ".data.r49_file",
+    "MicroBatcher": ".inference.predictor",
+    "Predictor": ".inference.predictor",
+    "LearnerConfig": ".learn.config",
+    "Distiller": ".learn.distiller",
+    "Exporter": ".learn.exporter",
+    "Learner": ".learn.learner",
+    "Pruner": ".learn.pruner",
+}
+
+__all__ = list(_LAZY_IMPORTS)
+
+
+def __getattr__(name: str):
+    module_name = _LAZY_IMPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value  # cache, __getattr__ is only called on misses
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,349 @@
+import copy
+import hashlib
+import json
+import math
+import shutil
+import sqlite3
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing, contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterator, Optional, override
+
+import cv2
+import numpy as np
+from cv2.typing import MatLike
+
+from .manifest import (
+    Camera,
+    Image,
+    Layout,
+    Manifest,
+    Marker,
+    Resolution,
+    Size,
+    ValidScales,
+)
+from .r49_file import B49File
+
+"""
+V3 layouts read straight from the server's SQLite database (server/src/db/schema.ts)
+and image store (server/src/services/storage.ts), without exporting them to
+.r49 archives first.
+
+- Database: `local/server/data.db` of the Node server, or the local D1 state
+  of wrangler (a directory is searched for the sqlite file with a `layouts`
+  table, e.g. .wrangler/state/v3/d1).
+- Images (`<image id>.jpg`): a directory of files (LocalStorageService,
+  `local/server/data/images`) or the local R2 state of wrangler
+  (.wrangler/state/v3/r2), where the `_mf_objects` table maps keys to blobs.
+
+The packed store of bin/convert_r49.py is both: `store.db` holds the server
+tables and a `blobs` table mapping keys to content-addressed files in `blobs/`.
+"""
+
+# SQLite's default limit of host parameters is 999
+SQL_BATCH = 500
+
+# Index of the packed V3 store written by bin/convert_r49.py
+STORE_DB = "store.db"
+
+LAYOUT_COLUMNS = "id, name, scale, p1_x, p1_y, p2_x, p2_y, ref_dist_mm"
+
+
+def find_db(path: Path) -> Path:
+    """The sqlite file at `path`, or the one with a `layouts` table below it."""
+    path = Path(path)
+    if path.is_file():
+        return path
+    for candidate in sorted(path.rglob("*.sqlite")) + sorted(path.rglob("*.db")):
+        with closing(_connect(candidate)) as con:
+            tables = con.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'layouts'"
+            ).fetchone()
+        if tables:
+            return candidate
+    raise ValueError(f"No database with a layouts table found in {path}")
+
+
+def _connect(path: Path) -> sqlite3.Connection:
+    return sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+
+
+@contextmanager
+def _connect_copy(path: Path) -> Iterator[sqlite3.Connection]:
+    """
+    Connection to a temporary copy of `path` and its WAL. Even read-only
+    connections write the `-shm` file of a WAL database, and `immutable=1`
+    ignores the WAL, where Miniflare keeps all of its rows.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshot = Path(tmp) / path.name
+        for suffix in ("", "-wal"):
+            src = path.with_name(path.name + suffix)
+            if src.is_file():
+                shutil.copyfile(src, snapshot.with_name(snapshot.name + suffix))
+        with closing(sqlite3.connect(snapshot)) as con:
+            yield con
+
+
+class BlobStore:
+    """Image blobs by key, read concurrently from a directory or the local R2 state."""
+
+    def __init__(self, root: Path, workers: int = 8):
+        self._root = Path(root)
+        self._workers = workers
+        # (index database, table) mapping key -> blob_id, blobs in <dir>/blobs/
+        self._indexes: list[tuple[Path, str]] = []
+        # Miniflare's state belongs to wrangler, its indexes are read from copies
+        self._copy_indexes = False
+        self._blob_dirs: list[Path] = []
+        if (self._root / STORE_DB).is_file():
+            # Packed store of bin/convert_r49.py
+            self._indexes = [(self._root / STORE_DB, "blobs")]
+            self._blob_dirs = [self._root / "blobs"]
+        elif indexes := sorted(self._root.glob("miniflare-R2BucketObject/*.sqlite")):
+            # Miniflare R2, blobs in <bucket>/blobs/
+            self._indexes = [(index, "_mf_objects") for index in indexes]
+            self._copy_indexes = True
+            self._blob_dirs = [
+                d / "blobs" for d in self._root.iterdir() if (d / "blobs").is_dir()
+            ]
+
+    def paths(self, keys: list[str]) -> dict[str, Path]:
+        """Files of the blobs `keys`, one query per SQL_BATCH keys with an index."""
+        if not self._indexes:
+            return {key: self._root / key for key in keys if (self._root / key).is_file()}
+        paths: dict[str, Path] = {}
+        for index, table in self._indexes:
+            connect = _connect_copy if self._copy_indexes else lambda p: closing(_connect(p))
+            with connect(index) as con:
+                for start in range(0, len(keys), SQL_BATCH):
+                    batch = keys[start : start + SQL_BATCH]
+                    rows = con.execute(
+                        f"SELECT key, blob_id FROM {table} WHERE key IN "
+                        f"({', '.join('?' * len(batch))})",
+                        batch,
+                    )
+                    for key, blob_id in rows:
+                        for blob_dir in self._blob_dirs:
+                            if (blob_dir / blob_id).is_file():
+                                paths[key] = blob_dir / blob_id
+        return paths
+
+    def read_many(self, keys: list[str]) -> dict[str, bytes]:
+        """Contents of the blobs `keys`."""
+        paths = self.paths(keys)
+        missing = [key for key in keys if key not in paths]
+        if missing:
+            raise ValueError(f"Blobs {missing} not found in {self._root}")
+        with ThreadPoolExecutor(self._workers) as pool:
+            data = pool.map(lambda key: paths[key].read_bytes(), keys)
+            return dict(zip(keys, data))
+
+    @override
+    def __str__(self):
+        return f"BlobStore(Path('{self._root}'))"
+
+
+class DbManifest(Manifest):
+    """
+    Manifest of a V3 layout. The V3 calibration is a line P1-P2 of known
+    length instead of the V2 rectangle, see `Layout.dots_per_track` in
+    ui/src/api/layout.ts.
+    """
+
+    layout_id: str
+    reference_distance_mm: Optional[float] = None
+    p1: Optional[tuple[float, float]] = None
+    p2: Optional[tuple[float, float]] = None
+
+    @property
+    def dots_per_track(self) -> float:
+        if self.p1 is None or self.p2 is None or not self.reference_distance_mm:
+            return -1.0
+        dist_px = math.dist(self.p1, self.p2)
+        if dist_px == 0 or self.reference_distance_mm <= 0:
+            return -1.0
+        return dist_px / self.reference_distance_mm * self.gauge_mm
+
+    @property
+    def fingerprint(self) -> str:
+        """Hash of the calibration, images and markers, changes when the layout does."""
+        return hashlib.sha256(self.model_dump_json().encode()).hexdigest()
+
+
+@dataclass
+class DbImage:
+    id: str
+    markers: dict[str, dict]
+
+    @property
+    def key(self) -> str:
+        """Key of the image in the blob store, see server/src/routes/layouts_images.ts."""
+        return f"{self.id}.jpg"
+
+
+class B49DbLayout(B49File):
+    """
+    Crops of a V3 layout, same pipeline as B49File. Images are fetched from
+    the blob store and decoded `batch_size` at a time.
+    """
+
+    def __init__(
+        self,
+        manifest: DbManifest,
+        blobs: BlobStore,
+        *,
+        dpt: int,
+        size: int,
+        labels: list[str],
+        image_transform: Callable[[MatLike, Manifest, int], tuple[MatLike, MatLike]],
+        batch_size: int = 16,
+        verbose: bool = False,
+    ):
+        self._db_manifest = manifest
+        self._blobs = blobs
+        self._batch_size = batch_size
+        # The layout id takes the place of the archive name in get_info
+        super().__init__(
+            Path(manifest.layout_id),
+            dpt=dpt,
+            size=size,
+            labels=labels,
+            image_transform=image_transform,
+            verbose=verbose,
+        )
+
+    @override
+    def _read_r49(self):
+        self._manifest = self._db_manifest
+
+    @override
+    def _read_image(self, image_index: int) -> MatLike:
+        key = self._manifest.get_image(image_index).filename
+        return self._decode(key, self._blobs.read_many([key])[key])
+
+    @override
+    def _images(self) -> Iterator[tuple[int, MatLike]]:
+        keys = [image.filename for image in self._manifest.images]
+        with ThreadPoolExecutor(self._batch_size) as pool:
+            for start in range(0, len(keys), self._batch_size):
+                batch = keys[start : start + self._batch_size]
+                data = self._blobs.read_many(batch)
+                # cv2.imdecode releases the GIL
+                images = pool.map(lambda key: self._decode(key, data[key]), batch)
+                yield from enumerate(images, start)
+
+    def _decode(self, key: str, data: bytes) -> MatLike:
+        image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            raise ValueError(f"Failed to decode image {key} from {self._blobs}")
+        return image
+
+    @override
+    def __str__(self):
+        return f"B49DbLayout('{self._manifest.layout.name}', {self._manifest.layout_id})"
+
+
+class B49Db:
+    """Layouts and their training images in the server database."""
+
+    def __init__(self, db: Path, blobs: Path, training_only: bool = True):
+        self._db = find_db(db)
+        self._blobs = BlobStore(blobs)
+        self._training_only = training_only
+        self._select: Callable[[DbManifest], bool] | None = None
+
+    @property
+    def path(self) -> Path:
+        return self._db
+
+    def filter(self, select: Callable[[DbManifest], bool]) -> "B49Db":
+        """The same database restricted to the layouts `select` accepts."""
+        db = copy.copy(self)
+        db._select = select
+        return db
+
+    def manifests(self) -> list[DbManifest]:
+        """
+        Manifests of the calibrated layouts with images, one query for the
+        layouts and one per layout for all of its images.
+        """
+        manifests = []
+        with closing(_connect(self._db)) as con:
+            layouts = con.execute(
+                f"SELECT {LAYOUT_COLUMNS} FROM layouts ORDER BY created_at, id"
+            ).fetchall()
+            for row in layouts:
+                images = con.execute(
+                    "SELECT id, markers FROM images WHERE layout_id = ?"
+                    + (" AND use_for_training = 1" if self._training_only else "")
+                    + " ORDER BY created_at, id",
+                    (row[0],),
+                ).fetchall()
+                if not images:
+                    continue
+                images = [DbImage(id, json.loads(m or "{}")) for id, m in images]
+                manifest = self._manifest(row, images)
+                if manifest.dots_per_track <= 0:
+                    print(f"Skipping layout {manifest.layout.name}: not calibrated.")
+                    continue
+                if self._select is None or self._select(manifest):
+                    manifests.append(manifest)
+        return manifests
+
+    def datasets(
+        self,
+        *,
+        dpt: int,
+        size: int,
+        labels: list[str],
+        image_transform: Callable[[MatLike, Manifest, int], tuple[MatLike, MatLike]],
+    ) -> list[B49DbLayout]:
+        return [
+            B49DbLayout(
+                manifest,
+                self._blobs,
+                dpt=dpt,
+                size=size,
+                labels=labels,
+                image_transform=image_transform,
+            )
+            for manifest in self.manifests()
+        ]
+
+    @staticmethod
+    def _manifest(row: tuple, images: list[DbImage]) -> DbManifest:
+        layout_id, name, scale, p1x, p1y, p2x, p2y, ref_dist_mm = row
+        calibrated = None not in (p1x, p1y, p2x, p2y)
+        return DbManifest(
+            version=3,
+            layout_id=layout_id,
+            layout=Layout(
+                name=name, scale=ValidScales(scale or "HO"), size=Size()
+            ),
+            camera=Camera(resolution=Resolution(width=0, height=0)),
+            reference_distance_mm=ref_dist_mm,
+            p1=(p1x, p1y) if calibrated else None,
+            p2=(p2x, p2y) if calibrated else None,
+            images=[
+                Image(
+                    filename=image.key,
+                    labels={
+                        marker_id: Marker(
+                            x=round(m["x"]),
+                            y=round(m["y"]),
+                            type=m.get("type") or "track",
+                        )
+                        for marker_id, m in image.markers.items()
+                    },
+                )
+                for image in images
+            ],
+        )
+
+    @override
+    def __str__(self):
+        return f"B49Db(Path('{self._db}'), {self._blobs})"
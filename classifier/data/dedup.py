@@ -0,0 +1,81 @@
+from collections import Counter, defaultdict
+
+import cv2
+import numpy as np
+import torch
+
+"""
+Near-duplicate removal for B49 datasets.
+
+Labelers capture many almost identical frames of the same layout, so the
+same marker yields clusters of nearly identical crops. Crops are compared
+by a 64-bit difference hash (dHash) within each (archive, marker id, label)
+group; a crop is dropped if it is within `max_distance` bits of a crop
+already kept for that marker.
+"""
+
+
+def dhash(image: np.ndarray, hash_size: int = 8) -> int:
+    """Difference hash of an RGB or BGR image as a `hash_size**2` bit integer."""
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+    small = cv2.resize(
+        image, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA
+    )
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def deduplicate(
+    dataset: torch.utils.data.Dataset,
+    max_distance: int = 4,
+    max_per_group: int | None = None,
+    items: list[int] | None = None,
+    verbose: bool = True,
+) -> tuple[list[int], dict]:
+    """
+    Return the indices of `dataset` to keep and a summary of what was removed.
+
+    `dataset` must provide `get_info(idx) -> (r49_filename, image_index, label_id)`
+    like B49Dataset. `max_per_group` optionally caps the number of distinct
+    crops kept per marker.
+    """
+    items = items if items is not None else list(range(len(dataset)))
+    kept_hashes: dict[tuple, list[int]] = defaultdict(list)
+    keep: list[int] = []
+    total, removed = Counter(), Counter()
+
+    for idx in items:
+        img, label = dataset[idx]
+        filename, _img_idx, label_id = dataset.get_info(idx)
+        total[label] += 1
+
+        group = kept_hashes[(filename, label_id, label)]
+        if max_per_group is not None and len(group) >= max_per_group:
+            removed[label] += 1
+            continue
+        h = dhash(np.asarray(img))
+        if any((h ^ other).bit_count() <= max_distance for other in group):
+            removed[label] += 1
+            continue
+        group.append(h)
+        keep.append(idx)
+
+    summary = {
+        "total": sum(total.values()),
+        "kept": len(keep),
+        "removed": sum(removed.values()),
+        "groups": len(kept_hashes),
+        "per_label": {
+            label: {"total": n, "removed": removed[label]}
+            for label, n in sorted(total.items())
+        },
+    }
+    if verbose:
+        print(
+            f"Deduplication: kept {summary['kept']} of {summary['total']} samples "
+            f"({summary['removed']} near-duplicates in {summary['groups']} markers)"
+        )
+        for label, counts in summary["per_label"].items():
+            print(f"  {label}: removed {counts['removed']} of {counts['total']}")
+    return keep, summary
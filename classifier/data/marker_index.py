@@ -0,0 +1,214 @@
+import json
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from .manifest import Manifest
+
+"""
+Marker-level index of a tree of .r49 archives, built from the manifests
+alone (no image is decoded) and stored as columns in an .npz file:
+
+    archives  path, size, mtime_ns, layout, scale, dpt, images, error
+    markers   archive (row in archives), image, marker, type, x, y
+
+`to_pandas()` joins them into one marker table for queries, e.g.
+
+    index.to_pandas().groupby(["scale", "type"]).size()
+    index.select("scale == 'HO' and dpt > 0")  # archives with matching markers
+"""
+
+ARCHIVE_COLUMNS = ("path", "size", "mtime_ns", "layout", "scale", "dpt", "images", "error")
+MARKER_COLUMNS = ("archive", "image", "marker", "type", "x", "y")
+DTYPES = {
+    "size": np.int64,
+    "mtime_ns": np.int64,
+    "dpt": np.float32,
+    "images": np.int32,
+    "archive": np.int32,
+    "image": np.int32,
+    "x": np.float32,
+    "y": np.float32,
+}
+
+
+def read_manifest(r49_file: Path) -> tuple[dict, list[tuple]]:
+    """Archive row (without path/size/mtime) and marker rows of one archive."""
+    try:
+        with zipfile.ZipFile(r49_file, "r") as zf:
+            with zf.open("manifest.json") as f:
+                manifest = Manifest(**json.load(f))
+    except Exception as e:
+        return {"error": str(e)}, []
+    archive = {
+        "layout": manifest.layout.name or r49_file.stem,
+        "scale": manifest.layout.scale.value,
+        "dpt": manifest.dots_per_track,
+        "images": manifest.number_of_images,
+    }
+    markers = [
+        (i, marker_id, m.type, m.x, m.y)
+        for i, image in enumerate(manifest.images)
+        for marker_id, m in image.labels.items()
+    ]
+    return archive, markers
+
+
+class MarkerIndex:
+    def __init__(self, archives: dict[str, np.ndarray], markers: dict[str, np.ndarray]):
+        self.archives = archives
+        self.markers = markers
+
+    def __len__(self):
+        return len(self.markers["archive"])
+
+    @classmethod
+    def build(
+        cls,
+        data_dir: Path,
+        previous: "MarkerIndex | None" = None,
+        workers: int | None = None,
+    ) -> "MarkerIndex":
+        """
+        Index all .r49 archives below `data_dir`, reading the manifests in
+        `workers` processes. Archives of `previous` whose size and mtime did
+        not change are not read again.
+        """
+        files = sorted(data_dir.rglob("**/*.r49"))
+        stats = [f.stat() for f in files]
+        paths = [f.relative_to(data_dir).as_posix() for f in files]
+
+        # Unchanged archives of `previous`: path -> row
+        reuse: dict[str, int] = {}
+        if previous is not None:
+            pa = previous.archives
+            for i, path in enumerate(pa["path"].tolist()):
+                reuse[path] = i
+            # Markers are stored grouped by archive
+            bounds = np.searchsorted(
+                previous.markers["archive"], np.arange(len(pa["path"]) + 1)
+            )
+        todo = [
+            f
+            for f, path, st in zip(files, paths, stats)
+            if not (
+                path in reuse
+                and pa["size"][reuse[path]] == st.st_size
+                and pa["mtime_ns"][reuse[path]] == st.st_mtime_ns
+            )
+        ]
+        read = {}
+        if todo:
+            workers = workers or os.cpu_count() or 1
+            with ProcessPoolExecutor(workers) as pool:
+                chunksize = max(1, len(todo) // (4 * workers))
+                read = dict(zip(todo, pool.map(read_manifest, todo, chunksize=chunksize)))
+
+        archives: dict[str, list] = {c: [] for c in ARCHIVE_COLUMNS}
+        chunks: dict[str, list[np.ndarray]] = {c: [] for c in MARKER_COLUMNS}
+        for idx, (f, path, st) in enumerate(zip(files, paths, stats)):
+            if f in read:
+                archive, rows = read[f]
+                marker_columns = dict(zip(MARKER_COLUMNS[1:], map(np.asarray, zip(*rows))))
+            else:
+                i = reuse[path]
+                archive = {c: pa[c][i].item() for c in ARCHIVE_COLUMNS}
+                s, e = bounds[i], bounds[i + 1]
+                marker_columns = {
+                    c: previous.markers[c][s:e] for c in MARKER_COLUMNS[1:]
+                }
+            archive = {
+                "layout": "",
+                "scale": "",
+                "dpt": -1.0,
+                "images": 0,
+                "error": "",
+                **archive,
+                "path": path,
+                "size": st.st_size,
+                "mtime_ns": st.st_mtime_ns,
+            }
+            for c in ARCHIVE_COLUMNS:
+                archives[c].append(archive[c])
+            if marker_columns:
+                chunks["archive"].append(np.full(len(marker_columns["image"]), idx))
+                for c, v in marker_columns.items():
+                    chunks[c].append(v)
+
+        # Fixed-width unicode for the strings, loadable without pickle
+        return cls(
+            {c: np.array(v, dtype=DTYPES.get(c, np.str_)) for c, v in archives.items()},
+            {
+                c: np.concatenate(v).astype(DTYPES.get(c, np.str_))
+                if v
+                else np.array([], dtype=DTYPES.get(c, np.str_))
+                for c, v in chunks.items()
+            },
+        )
+
+    def save(self, path: Path):
+        np.savez(
+            path,
+            **{f"archives.{c}": v for c, v in self.archives.items()},
+            **{f"markers.{c}": v for c, v in self.markers.items()},
+        )
+
+    @classmethod
+    def load(cls, path: Path) -> "MarkerIndex":
+        with np.load(path) as data:
+            return cls(
+                {c: data[f"archives.{c}"] for c in ARCHIVE_COLUMNS},
+                {c: data[f"markers.{c}"] for c in MARKER_COLUMNS},
+            )
+
+    @classmethod
+    def update(cls, data_dir: Path, path: Path, workers: int | None = None) -> "MarkerIndex":
+        """Load the index at `path`, bring it up to date with `data_dir` and save it."""
+        previous = cls.load(path) if path.exists() else None
+        index = cls.build(data_dir, previous, workers)
+        if previous is None or not all(
+            np.array_equal(index.archives[c], previous.archives[c])
+            for c in ("path", "size", "mtime_ns")
+        ):
+            index.save(path)
+        return index
+
+    def archives_frame(self):
+        """Archives as a pandas DataFrame."""
+        import pandas as pd
+
+        df = pd.DataFrame(self.archives)
+        for c in ("scale", "error"):
+            df[c] = df[c].astype("category")
+        return df
+
+    def to_pandas(self):
+        """Markers as a pandas DataFrame with the columns of their archive."""
+        import pandas as pd
+
+        a = self.archives
+        idx = self.markers["archive"]
+        df = pd.DataFrame(
+            {
+                "archive": pd.Categorical.from_codes(idx, a["path"]),
+                "layout": a["layout"][idx],
+                "scale": a["scale"][idx],
+                "dpt": a["dpt"][idx],
+                "image": self.markers["image"],
+                "marker": self.markers["marker"],
+                "type": self.markers["type"],
+                "x": self.markers["x"],
+                "y": self.markers["y"],
+            }
+        )
+        for c in ("layout", "scale", "type"):
+            df[c] = df[c].astype("category")
+        return df
+
+    def select(self, query: str) -> list[str]:
+        """Paths (relative to the data dir) of archives with markers matching `query`."""
+        df = self.to_pandas()
+        return sorted(df.query(query)["archive"].unique().astype(str))
@@ -0,0 +1,129 @@
+import cv2
+import numpy as np
+
+"""
+Marker patch extraction with the semantics of the browser's
+`Classifier.patch` (ui/src/app/classifier.ts):
+
+    ctx.fillRect(0, 0, size, size)  // black
+    ctx.drawImage(image, sx, sy, srcSize, srcSize, 0, 0, size, size)
+
+with srcSize = size * img_dpt / dpt and (sx, sy) = center - srcSize / 2.
+Output pixel (i, j) samples the frame bilinearly at the continuous source
+position (sx + (j + 0.5) * s, sy + (i + 0.5) * s), s = img_dpt / dpt, with
+pixel centers at +0.5 and edge pixels repeated. As in canvas, the source
+rectangle is clipped to the frame: the destination area it maps to is
+drawn with partial coverage at its (subpixel) border, the rest stays black.
+Centers are subpixel. Canvas smoothing for strong downscaling is not
+modeled (plain bilinear, i.e. imageSmoothingQuality 'low').
+
+All patches of a frame are sampled with a single cv2.remap.
+"""
+
+# cv2.remap is limited to 32767 rows, patches are stacked vertically
+MAX_REMAP_ROWS = 32767
+
+
+def patch_maps(
+    centers: np.ndarray, scale: float, size: int, width: int, height: int
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Sampling maps (N * size, size) for cv2.remap and the coverage weights
+    (N, size, size) of `size` patches at `centers` (N, 2) covering `size *
+    scale` frame pixels each (`scale` = frame pixels per patch pixel).
+    """
+    centers = np.asarray(centers, dtype=np.float64).reshape(-1, 2)
+    n = len(centers)
+    src_size = size * scale
+    origin = centers - src_size / 2  # (sx, sy)
+    steps = (np.arange(size) + 0.5) * scale
+
+    # Continuous source coordinates of the output pixel centers
+    u = origin[:, 0:1] + steps  # (N, size) along x
+    v = origin[:, 1:2] + steps  # (N, size) along y
+    map_x = np.broadcast_to(u[:, None, :], (n, size, size)) - 0.5
+    map_y = np.broadcast_to(v[:, :, None], (n, size, size)) - 0.5
+
+    # Coverage of each output pixel by the clipped destination rectangle
+    j = np.arange(size)
+    coverage = []
+    for axis, extent in ((0, width), (1, height)):
+        d0 = (0 - origin[:, axis : axis + 1]) / scale
+        d1 = (extent - origin[:, axis : axis + 1]) / scale
+        coverage.append(
+            np.clip(np.minimum(j + 1, d1) - np.maximum(j, d0), 0.0, 1.0)
+        )
+    cov_x, cov_y = coverage
+    weights = cov_y[:, :, None] * cov_x[:, None, :]
+
+    return (
+        map_x.reshape(n * size, size).astype(np.float32),
+        map_y.reshape(n * size, size).astype(np.float32),
+        weights.astype(np.float32),
+    )
+
+
+def extract_patches(
+    frame: np.ndarray,
+    centers: np.ndarray,
+    img_dpt: float,
+    dpt: float,
+    size: int,
+) -> np.ndarray:
+    """
+    `size` x `size` patches of `frame` (H, W, C uint8) around `centers`
+    (N, 2; x, y in frame pixels, subpixel), resampled from a frame with
+    `img_dpt` dots per track to the model's `dpt`. Returns (N, size, size, C)
+    uint8, black where the patch leaves the frame.
+    """
+    height, width = frame.shape[:2]
+    channels = frame.shape[2] if frame.ndim == 3 else 1
+    centers = np.asarray(centers, dtype=np.float64).reshape(-1, 2)
+    out = np.empty((len(centers), size, size, channels), dtype=np.uint8)
+    chunk = max(1, MAX_REMAP_ROWS // size)
+    for start in range(0, len(centers), chunk):
+        c = centers[start : start + chunk]
+        map_x, map_y, weights = patch_maps(c, img_dpt / dpt, size, width, height)
+        sampled = cv2.remap(
+            frame,
+            map_x,
+            map_y,
+            interpolation=cv2.INTER_LINEAR,
+            borderMode=cv2.BORDER_REPLICATE,
+        ).reshape(len(c), size, size, channels)
+        out[start : start + chunk] = np.rint(sampled * weights[..., None]).astype(
+            np.uint8
+        )
+    return out
+
+
+def reference_patch(
+    frame: np.ndarray, center: tuple[float, float], img_dpt: float, dpt: float, size: int
+) -> np.ndarray:
+    """
+    Straightforward per-pixel implementation of the same semantics, in float
+    without cv2's fixed-point interpolation. Slow, for parity checks only.
+    """
+    height, width = frame.shape[:2]
+    img = frame.reshape(height, width, -1).astype(np.float64)
+    scale = img_dpt / dpt
+    sx = center[0] - size * scale / 2
+    sy = center[1] - size * scale / 2
+    out = np.zeros((size, size, img.shape[2]))
+    for i in range(size):
+        for j in range(size):
+            cov = 1.0
+            for k, s0, extent in ((j, sx, width), (i, sy, height)):
+                d0, d1 = -s0 / scale, (extent - s0) / scale
+                cov *= min(max(min(k + 1, d1) - max(k, d0), 0.0), 1.0)
+            if cov == 0:
+                continue
+            x = min(max(sx + (j + 0.5) * scale - 0.5, 0.0), width - 1)
+            y = min(max(sy + (i + 0.5) * scale - 0.5, 0.0), height - 1)
+            x0, y0 = int(x), int(y)
+            x1, y1 = min(x0 + 1, width - 1), min(y0 + 1, height - 1)
+            fx, fy = x - x0, y - y0
+            top = (1 - fx) * img[y0, x0] + fx * img[y0, x1]
+            bottom = (1 - fx) * img[y1, x0] + fx * img[y1, x1]
+            out[i, j] = cov * ((1 - fy) * top + fy * bottom)
+    return np.rint(out).astype(np.uint8)
@@ -1,3 +1,7 @@
+import hashlib
+import json
+from typing import Callable
+
 import torch
 from fastai.data.all import (
     CategoryBlock,
@@ -11,6 +15,28 @@ from fastai.vision.all import (
     Rotate,
 )
 
+from .sampler import HardExampleDL
+
+
+def InfoHashSplitter(
+    get_info: Callable[[int], tuple], valid_pct: float = 0.2, seed: int = 42
+) -> Callable:
+    """
+    Split items by a hash of their `get_info` (source, image, marker), so a
+    crop keeps its split whichever subset of the sources is loaded, e.g. in
+    incremental training. RandomSplitter reassigns all items when they change.
+    """
+
+    def _inner(items):
+        threshold = valid_pct * 2**64
+        train, valid = [], []
+        for i, item in enumerate(items):
+            key = hashlib.sha256(json.dumps([seed, *get_info(item)]).encode()).digest()
+            (valid if int.from_bytes(key[:8], "big") < threshold else train).append(i)
+        return train, valid
+
+    return _inner
+
 
 class B49DataLoaders(ImageDataLoaders):
     @classmethod
@@ -22,11 +48,28 @@ class B49DataLoaders(ImageDataLoaders):
         crop_size: int = 64,
         vocab: list[str] | None = None,
         data_augmentation: bool = True,
+        hard_examples: bool = False,
+        epoch_pct: float = 1.0,
+        items: list[int] | None = None,
         **kwargs,
     ) -> ImageDataLoaders:
-        """Create B49DataLoaders from a torch.Dataset."""
+        """
+        Create B49DataLoaders from a torch.Dataset.
+
+        With `hard_examples` the training loader is a `HardExampleDL` that
+        draws `epoch_pct` of the training split per epoch, weighted by the
+        per-sample loss tracked by `HardExampleCallback`.
+
+        `items` restricts the loaders to a subset of dataset indices
+        (e.g. after deduplication); indices are preserved for `get_info`.
+        Datasets with `get_info` are split by `InfoHashSplitter`.
+        """
 
-        items = list(range(len(dataset)))
+        items = items if items is not None else list(range(len(dataset)))
+        if hasattr(dataset, "get_info"):
+            splitter = InfoHashSplitter(dataset.get_info, valid_pct=valid_pct, seed=seed)
+        else:
+            splitter = RandomSplitter(valid_pct=valid_pct, seed=seed)
 
         def get_x(idx: int):
             return dataset[idx][0]
@@ -36,7 +79,7 @@ class B49DataLoaders(ImageDataLoaders):
 
         dblock = DataBlock(
             blocks=(ImageBlock, CategoryBlock(vocab=vocab, sort=False)),
-            splitter=RandomSplitter(valid_pct=valid_pct, seed=seed),
+            splitter=splitter,
             get_items=lambda _source: items,
             get_x=get_x,
             get_y=get_y,
@@ -44,4 +87,7 @@ class B49DataLoaders(ImageDataLoaders):
             # NOTE: r49_file.py handles image scaling to correct dpt resolution
             batch_tfms=[Rotate(max_deg=180, p=0.5)] if data_augmentation else [],
         )
+        if hard_examples:
+            kwargs["dl_type"] = HardExampleDL
+            kwargs["dl_kwargs"] = [{"epoch_pct": epoch_pct}, {}]
         return cls.from_dblock(dblock, source=dataset, **kwargs)
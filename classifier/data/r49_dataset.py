@@ -6,6 +6,7 @@ import torch
 from cv2.typing import MatLike
 from PIL import Image
 
+from .b49_db import B49Db
 from .manifest import Manifest
 from .r49_file import B49File
 
@@ -19,20 +20,25 @@ class B49Dataset(torch.utils.data.ConcatDataset[tuple[Image.Image, str]]):
         size: int,
         labels: list[str] | None = None,
         image_transform: Callable[[MatLike, Manifest, int], tuple[MatLike, MatLike]],
+        db: B49Db | None = None,
     ):
         labels = labels if labels is not None else ["track", "train", "other"]
-        super().__init__(
-            [
-                B49File(
-                    r49_file,
-                    image_transform=image_transform,
-                    dpt=dpt,
-                    size=size,
-                    labels=labels,
-                )
-                for r49_file in r49_files
-            ]
-        )
+        datasets: list[B49File] = [
+            B49File(
+                r49_file,
+                image_transform=image_transform,
+                dpt=dpt,
+                size=size,
+                labels=labels,
+            )
+            for r49_file in r49_files
+        ]
+        # V3 layouts from the server database
+        if db is not None:
+            datasets += db.datasets(
+                dpt=dpt, size=size, labels=labels, image_transform=image_transform
+            )
+        super().__init__(datasets)
 
     def get_info(self, idx: int) -> tuple[str, int, str]:
         if idx < 0:
@@ -1,7 +1,7 @@
 import json
 import zipfile
 from pathlib import Path
-from typing import Callable, override
+from typing import Callable, Iterator, override
 
 import cv2
 import numpy as np
@@ -35,6 +35,7 @@ class B49File(torch.utils.data.Dataset[tuple[Image.Image, str]]):
         self._x: list[MatLike] = []
         self._y: list[str] = []
         self._source_info: list[tuple[str, int, str]] = []
+        self._centers: list[tuple[int, int]] = []
 
         self._read_r49()
         self._create_xy()
@@ -43,6 +44,20 @@ class B49File(torch.utils.data.Dataset[tuple[Image.Image, str]]):
         """Return (r49_filename, image_index, label_id) for the given index."""
         return self._source_info[idx]
 
+    def get_center(self, idx: int) -> tuple[int, int]:
+        """Crop center (x, y) in the transformed image of the given index."""
+        return self._centers[idx]
+
+    def load_image(self, image_index: int, transform: bool = True) -> MatLike:
+        """
+        Decode image `image_index` of the archive (BGR), by default with the
+        image transform applied, i.e. the frame the crops are cut from.
+        """
+        image = self._read_image(image_index)
+        if transform:
+            image, _ = self._image_transform(image, self._manifest, self._dpt)
+        return image
+
     @property
     def manifest(self):
         return self._manifest
@@ -75,6 +90,35 @@ class B49File(torch.utils.data.Dataset[tuple[Image.Image, str]]):
                     f"Got manifest unsupported version {self._manifest.version}. Expected version 2."
                 )
 
+    def _read_image(self, image_index: int) -> MatLike:
+        filename = self._manifest.get_image(image_index).filename
+        with zipfile.ZipFile(self._r49file, "r") as zf:
+            return self._decode_image(zf, filename)
+
+    def _images(self) -> Iterator[tuple[int, MatLike]]:
+        """Decoded images (BGR) with their index, in manifest order."""
+        with zipfile.ZipFile(self._r49file, "r") as zf:
+            for i in range(self._manifest.number_of_images):
+                filename = self._manifest.get_image(i).filename
+                yield i, self._decode_image(zf, filename)
+
+    def _decode_image(self, zf: zipfile.ZipFile, filename: str) -> MatLike:
+        # Read image bytes from zip
+        try:
+            with zf.open(filename) as img_file:
+                image_bytes = img_file.read()
+        except KeyError:
+            # Try finding the file if exact match fails (e.g. ./ prefix issues)
+            # or just raise
+            raise ValueError(f"Image file {filename} not found in {self._r49file}")
+
+        # Convert bytes to numpy array and decode with OpenCV
+        nparr = np.frombuffer(image_bytes, np.uint8)
+        image_cv2 = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        if image_cv2 is None:
+            raise ValueError(f"Failed to decode image {filename} from {self._r49file}")
+        return image_cv2
+
     def _create_xy(self):
         size = self._size
 
@@ -87,91 +131,72 @@ class B49File(torch.utils.data.Dataset[tuple[Image.Image, str]]):
             # challenging, shows too much track
             # label_map["train-end"] = "train"
 
-        with zipfile.ZipFile(self._r49file, "r") as zf:
-            for i in range(self._manifest.number_of_images):
-                image_meta = self._manifest.get_image(i)
-                filename = image_meta.filename
-
-                # Read image bytes from zip
-                try:
-                    with zf.open(filename) as img_file:
-                        image_bytes = img_file.read()
-                except KeyError:
-                    # Try finding the file if exact match fails (e.g. ./ prefix issues)
-                    # or just raise
-                    raise ValueError(
-                        f"Image file {filename} not found in {self._r49file}"
+        for i, image in self._images():
+            image_meta = self._manifest.get_image(i)
+            filename = image_meta.filename
+
+            # Apply perspective transform to entire image
+            transformed_image, transform_matrix = self._image_transform(
+                image,
+                self._manifest,
+                self._dpt,
+            )
+
+            for label_id, marker in image_meta.labels.items():
+                # Use marker type as label
+                label_name = label_map.get(marker.type, marker.type)
+                if label_name not in self._labels:
+                    continue
+
+                if transform_matrix is not None:
+                    marker_point = np.array(
+                        [[[marker.x, marker.y]]], dtype=np.float32
                     )
+                    cx_cy = cv2.perspectiveTransform(marker_point, transform_matrix)
+                    if cx_cy is None:
+                        raise ValueError(f"Failed to transform marker {label_id}")
+                    cx, cy = cx_cy[0, 0]
+                else:
+                    cx, cy = marker.x, marker.y
 
-                # Convert bytes to numpy array and decode with OpenCV
-                nparr = np.frombuffer(image_bytes, np.uint8)
-                image_cv2 = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-                if image_cv2 is None:
-                    raise ValueError(
-                        f"Failed to decode image {filename} from {self._r49file}"
-                    )
+                cx_float = float(cx)  # pyright: ignore[reportAny]
+                cy_float = float(cy)  # pyright: ignore[reportAny]
 
-                # Apply perspective transform to entire image
-                transformed_image, transform_matrix = self._image_transform(
-                    image_cv2,
-                    self._manifest,
-                    self._dpt,
-                )
-
-                for label_id, marker in image_meta.labels.items():
-                    # Use marker type as label
-                    label_name = label_map.get(marker.type, marker.type)
-                    if label_name not in self._labels:
-                        continue
+                cx = int(cx_float)
+                cy = int(cy_float)
 
-                    if transform_matrix is not None:
-                        marker_point = np.array(
-                            [[[marker.x, marker.y]]], dtype=np.float32
-                        )
-                        cx_cy = cv2.perspectiveTransform(marker_point, transform_matrix)
-                        if cx_cy is None:
-                            raise ValueError(f"Failed to transform marker {label_id}")
-                        cx, cy = cx_cy[0, 0]
-                    else:
-                        cx, cy = marker.x, marker.y
-
-                    cx_float = float(cx)  # pyright: ignore[reportAny]
-                    cy_float = float(cy)  # pyright: ignore[reportAny]
-
-                    cx = int(cx_float)
-                    cy = int(cy_float)
-
-                    try:
-                        # Check bounds
-                        crop_radius = size // 2
-                        if (
-                            cy - crop_radius < 0
-                            or cy + crop_radius > transformed_image.shape[0]  # pyright: ignore[reportAny]
-                            or cx - crop_radius < 0
-                            or cx + crop_radius > transformed_image.shape[1]
-                        ):  # pyright: ignore[reportAny]
-                            if self._verbose:
-                                print(
-                                    f"Skipping {label_id} in {filename}: out of bounds."
-                                )
-                            continue
-
-                        cropped_image = transformed_image[
-                            cy - crop_radius : cy + crop_radius,
-                            cx - crop_radius : cx + crop_radius,
-                        ]
-
-                        self._x.append(cropped_image)
-                        self._y.append(label_name)
-                        # Store auxilliary info to identify misclassifications
-                        self._source_info.append((self._r49file.name, i, label_id))
-
-                    except Exception:
+                try:
+                    # Check bounds
+                    crop_radius = size // 2
+                    if (
+                        cy - crop_radius < 0
+                        or cy + crop_radius > transformed_image.shape[0]  # pyright: ignore[reportAny]
+                        or cx - crop_radius < 0
+                        or cx + crop_radius > transformed_image.shape[1]
+                    ):  # pyright: ignore[reportAny]
                         if self._verbose:
                             print(
-                                f"Skipping {label_id} in {filename}: error during crop."
+                                f"Skipping {label_id} in {filename}: out of bounds."
                             )
-                        pass
+                        continue
+
+                    cropped_image = transformed_image[
+                        cy - crop_radius : cy + crop_radius,
+                        cx - crop_radius : cx + crop_radius,
+                    ]
+
+                    self._x.append(cropped_image)
+                    self._y.append(label_name)
+                    self._centers.append((cx, cy))
+                    # Store auxilliary info to identify misclassifications
+                    self._source_info.append((self._r49file.name, i, label_id))
+
+                except Exception:
+                    if self._verbose:
+                        print(
+                            f"Skipping {label_id} in {filename}: error during crop."
+                        )
+                    pass
 
     @override
     def __str__(self):
@@ -0,0 +1,40 @@
+import numpy as np
+from fastai.data.core import TfmdDL
+
+
+class HardExampleDL(TfmdDL):
+    """
+    Training DataLoader that draws samples with probability `wgts`.
+
+    `wgts` is updated between epochs by `HardExampleCallback` from the running
+    per-sample loss. Until then (and for non-shuffled loaders, e.g. validation)
+    it behaves like a regular TfmdDL.
+
+    `epoch_pct` < 1 shortens each epoch to that fraction of the training set,
+    so easy samples are subsampled rather than just reweighted.
+    """
+
+    def __init__(self, dataset=None, bs=None, epoch_pct: float = 1.0, **kwargs):
+        super().__init__(dataset=dataset, bs=bs, **kwargs)
+        self.wgts: np.ndarray | None = None
+        self._epoch_idxs: list[int] = []
+        if self.shuffle and self.n:
+            self.n = max(1, int(round(epoch_pct * self.n)))
+
+    def get_idxs(self):
+        if self.n == 0:
+            return []
+        if not self.shuffle:
+            return super().get_idxs()
+        n_items = len(self.dataset)
+        if self.wgts is None:
+            idxs = list(np.random.permutation(n_items)[: self.n])
+        else:
+            idxs = list(np.random.choice(n_items, self.n, p=self.wgts))
+        # Remember the draw so batches can be mapped back to samples
+        self._epoch_idxs = idxs
+        return idxs
+
+    def batch_positions(self, b: int) -> list[int]:
+        """Positions within this split of training batch `b` of the current epoch."""
+        return self._epoch_idxs[b * self.bs : (b + 1) * self.bs]
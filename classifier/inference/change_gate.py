@@ -0,0 +1,84 @@
+import cv2
+import numpy as np
+
+
+class ChangeGate:
+    """
+    Skips inference for markers whose patch has not changed.
+
+    Each patch is reduced to a `signature_size` x `signature_size` grayscale
+    thumbnail. A marker is sent to the model only if the mean absolute
+    difference to the thumbnail of its last *classified* patch exceeds
+    `threshold` (0-255 levels), so slow drift still triggers eventually.
+    Otherwise its previous label is reused. Every marker is also refreshed at
+    least every `refresh_every` frames, staggered so that refreshes are
+    spread evenly over the frames.
+
+    Markers are identified by their position in the patch array, which must
+    stay the same from frame to frame. Typical use:
+
+        sigs = gate.signatures(patches)
+        mask = gate.changed(sigs)
+        labels = gate.update(mask, sigs, predictor.predict(patches[mask]))
+
+    `changed()` and `update()` are separate so that a frame dropped between
+    them (e.g. under backpressure) leaves the gate untouched.
+    """
+
+    def __init__(
+        self, threshold: float = 4.0, refresh_every: int = 30, signature_size: int = 8
+    ):
+        self.threshold = threshold
+        self.refresh_every = max(1, refresh_every)
+        self.signature_size = signature_size
+        self._frame = 0
+        self._signatures: np.ndarray | None = None
+        self._labels: list[str | None] = []
+        self.inferred = 0
+        self.total = 0
+
+    def signatures(self, patches: np.ndarray) -> np.ndarray:
+        """Float32 (N, s, s) grayscale thumbnails of uint8 (N, H, W, 3) patches."""
+        s = self.signature_size
+        gray = patches.astype(np.float32).mean(axis=3)
+        n, h, w = gray.shape
+        if h % s == 0 and w % s == 0:
+            # Block mean, same as INTER_AREA for integer factors
+            return gray.reshape(n, s, h // s, s, w // s).mean(axis=(2, 4))
+        return np.stack(
+            [cv2.resize(g, (s, s), interpolation=cv2.INTER_AREA) for g in gray]
+        )
+
+    def changed(self, signatures: np.ndarray) -> np.ndarray:
+        """Boolean mask of the markers that need inference in this frame."""
+        n = len(signatures)
+        if self._signatures is None or len(self._signatures) != n:
+            self._signatures = None
+            self._labels = [None] * n
+            mask = np.ones(n, dtype=bool)
+        else:
+            diff = np.abs(signatures - self._signatures).mean(axis=(1, 2))
+            mask = diff > self.threshold
+            mask |= np.array([label is None for label in self._labels])
+            mask[self._frame % self.refresh_every :: self.refresh_every] = True
+        self._frame += 1
+        return mask
+
+    def update(
+        self, mask: np.ndarray, signatures: np.ndarray, labels: list[str]
+    ) -> list[str]:
+        """Store the new labels of the `mask` markers and return all labels."""
+        if self._signatures is None:
+            self._signatures = signatures.copy()
+        else:
+            self._signatures[mask] = signatures[mask]
+        for i, label in zip(np.flatnonzero(mask), labels):
+            self._labels[i] = label
+        self.inferred += int(mask.sum())
+        self.total += len(mask)
+        return list(self._labels)
+
+    @property
+    def inferred_pct(self) -> float:
+        """Share of marker patches sent to the model so far."""
+        return self.inferred / self.total if self.total else 0.0
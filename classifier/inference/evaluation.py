@@ -0,0 +1,206 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from ..data.image_transform import apply_scaling_transform
+from ..data.r49_file import B49File
+from .predictor import Predictor
+
+"""
+Evaluation of exported models on held-out .r49 archives: crops are cut once
+per distinct (dpt, size, labels) and shared by all models with those
+settings, every (model, precision) is evaluated concurrently with ORT, and
+latency is measured afterwards, one model at a time with its own session
+options. Results are per archive (layout) error, confusion matrices and
+latency, see `evaluate`.
+"""
+
+# Evaluation batch size
+EVAL_BS = 256
+
+
+class HeldOutCrops:
+    """
+    Center crops (uint8 NHWC RGB), labels and source archive of held-out
+    markers. `r49_files` maps the name of each source to its archive.
+    """
+
+    def __init__(self, r49_files: dict[str, Path], dpt: int, size: int, labels: list[str]):
+        def load(source: str, f: Path):
+            ds = B49File(
+                f, dpt=dpt, size=size, labels=labels, image_transform=apply_scaling_transform
+            )
+            samples = [ds[i] for i in range(len(ds))]
+            crops = [np.asarray(img) for img, _ in samples]
+            return crops, [label for _, label in samples], [source] * len(ds)
+
+        # Decoding and warping release the GIL
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as pool:
+            loaded = list(pool.map(load, r49_files.keys(), r49_files.values()))
+        crops = [c for cs, _, _ in loaded for c in cs]
+        self.crops = (
+            np.stack(crops) if crops else np.empty((0, size, size, 3), dtype=np.uint8)
+        )
+        self.labels = np.array([y for _, ys, _ in loaded for y in ys])
+        self.sources = np.array([s for _, _, ss in loaded for s in ss])
+
+
+def find_precisions(model_dir: Path) -> list[str]:
+    """Precisions exported to `model_dir` (model_<precision>.ort)."""
+    return sorted(
+        f.stem.removeprefix("model_") for f in Path(model_dir).glob("model_*.ort")
+    )
+
+
+def _confusion(targets: np.ndarray, preds: np.ndarray, n: int) -> list[list[int]]:
+    cm = np.zeros((n, n), dtype=np.int64)
+    np.add.at(cm, (targets, preds), 1)
+    return cm.tolist()
+
+
+def _score(predictor: Predictor, data: HeldOutCrops) -> dict:
+    labels = predictor.labels
+    logits = predictor.predict_logits(data.crops)
+    preds = logits.argmax(axis=1)
+    targets = np.array([labels.index(y) for y in data.labels], dtype=np.int64)
+    wrong = preds != targets
+    layouts = {}
+    for source in sorted(set(data.sources)):
+        mask = data.sources == source
+        layouts[source] = {
+            "samples": int(mask.sum()),
+            "errors": int(wrong[mask].sum()),
+            "error": float(wrong[mask].mean()),
+            "confusion": _confusion(targets[mask], preds[mask], len(labels)),
+        }
+    return {
+        "samples": len(targets),
+        "errors": int(wrong.sum()),
+        "error": float(wrong.mean()) if len(targets) else 0.0,
+        "labels": labels,
+        "confusion": _confusion(targets, preds, len(labels)),
+        "layouts": layouts,
+    }
+
+
+def _latency(model_dir: Path, precision: str, crops: np.ndarray, runs: int, batch: int) -> dict:
+    """bs=1 p50/p95 over `runs` crops and throughput at `batch`, model.config session options."""
+    predictor = Predictor(model_dir, precision=precision, max_batch=1)
+    predictor.predict_logits(crops[:1])  # warmup
+    predictor.reset_stats()
+    for i in range(min(runs, len(crops))):
+        predictor.predict_logits(crops[i : i + 1])
+    single = predictor.stats().get(1, {})
+    predictor.max_batch = batch
+    predictor.predict_logits(crops[: batch * max(1, min(len(crops) // batch, 4))])
+    batched = predictor.stats().get(batch, {})
+    return {
+        "session_ms": predictor.session_ms,
+        "p50_ms": single.get("p50_ms"),
+        "p95_ms": single.get("p95_ms"),
+        "batch": batch,
+        "images_per_sec": batched.get("images_per_sec"),
+    }
+
+
+def evaluate(
+    model_dirs: list[Path],
+    r49_files: dict[str, Path],
+    precisions: list[str] | None = None,
+    latency_runs: int = 100,
+    batch: int = 64,
+) -> dict[str, dict]:
+    """
+    Evaluate the exported models in `model_dirs` (each precision, or only
+    `precisions`) on the markers of `r49_files` (source name -> archive).
+    Returns per "<model>/<precision>": error, confusion matrix (rows true,
+    columns predicted, in "labels" order), the same per layout (source name)
+    under "layouts", and "latency".
+    """
+    predictors = {}
+    for model_dir in model_dirs:
+        model_dir = Path(model_dir)
+        for precision in precisions or find_precisions(model_dir):
+            if (model_dir / f"model_{precision}.ort").exists():
+                predictors[(model_dir, precision)] = None
+    if not predictors:
+        return {}
+
+    cpus = os.cpu_count() or 1
+    workers = min(len(predictors), cpus)
+    threads = max(1, cpus // workers)
+    for key in predictors:
+        predictors[key] = Predictor(
+            key[0], precision=key[1], max_batch=EVAL_BS, intra_op_threads=threads
+        )
+
+    # Crops once per distinct crop settings
+    crops: dict[tuple, HeldOutCrops] = {}
+    for predictor in predictors.values():
+        crop_key = (predictor.dpt, predictor.size, tuple(predictor.labels))
+        if crop_key not in crops:
+            print(f"Cutting crops at dpt {crop_key[0]}, size {crop_key[1]}...")
+            crops[crop_key] = HeldOutCrops(r49_files, *crop_key[:2], list(crop_key[2]))
+            print(f"  {len(crops[crop_key].labels)} crops")
+
+    def data_of(predictor: Predictor) -> HeldOutCrops:
+        return crops[(predictor.dpt, predictor.size, tuple(predictor.labels))]
+
+    print(f"Evaluating {len(predictors)} models with {workers} workers...")
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            key: pool.submit(_score, predictor, data_of(predictor))
+            for key, predictor in predictors.items()
+        }
+    results = {}
+    for (model_dir, precision), future in futures.items():
+        result = future.result()
+        # Alone on the machine, so the latencies are comparable
+        result["latency"] = _latency(
+            model_dir,
+            precision,
+            data_of(predictors[(model_dir, precision)]).crops,
+            latency_runs,
+            batch,
+        )
+        results[f"{model_dir.name}/{precision}"] = result
+    return results
+
+
+def format_evaluation(results: dict[str, dict]) -> list[str]:
+    """Markdown lines: summary, error per layout and confusion matrices."""
+    if not results:
+        return []
+    lines = [
+        "| Model | Samples | Error | bs=1 p50/p95 (ms) | img/s |",
+        "| --- | --- | --- | --- | --- |",
+    ]
+    for name, r in results.items():
+        lat = r["latency"]
+        p50 = "n/a" if lat["p50_ms"] is None else f"{lat['p50_ms']:.2f} / {lat['p95_ms']:.2f}"
+        ips = "n/a" if lat["images_per_sec"] is None else f"{lat['images_per_sec']:.0f}"
+        lines.append(f"| {name} | {r['samples']} | {r['error']:.2%} | {p50} | {ips} |")
+
+    layouts = sorted({layout for r in results.values() for layout in r["layouts"]})
+    lines += ["", "| Layout | " + " | ".join(results) + " |", "| --- " * (1 + len(results)) + "|"]
+    for layout in layouts:
+        cells = [
+            f"{r['layouts'][layout]['error']:.2%}" if layout in r["layouts"] else "n/a"
+            for r in results.values()
+        ]
+        lines.append(f"| {layout} | " + " | ".join(cells) + " |")
+
+    for name, r in results.items():
+        labels = r["labels"]
+        lines += [
+            "",
+            f"{name} (rows true, columns predicted):",
+            "",
+            "| | " + " | ".join(labels) + " |",
+            "| --- " * (1 + len(labels)) + "|",
+        ]
+        for label, row in zip(labels, r["confusion"]):
+            lines.append(f"| {label} | " + " | ".join(str(v) for v in row) + " |")
+    return lines
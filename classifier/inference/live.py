@@ -0,0 +1,315 @@
+import asyncio
+import json
+import time
+import zipfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable
+
+import cv2
+import numpy as np
+
+from ..data.manifest import Manifest
+from .change_gate import ChangeGate
+from .predictor import Predictor
+
+"""
+Headless live classification: frames from a camera-like source are cut into
+marker patches, classified in one batch per frame and published.
+
+    capture -> preprocess (-> change gate) -> inference -> publish
+
+Stages run concurrently and are connected by bounded queues. A stage that
+falls behind never blocks the ones before it: when a queue is full the
+oldest item is dropped, so the pipeline always works on the latest frame.
+"""
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".bmp"}
+
+
+@dataclass
+class LiveLayout:
+    """Marker positions (pixels of a `width` x `height` reference image) and dpt."""
+
+    id: str
+    markers: dict[str, tuple[float, float]]
+    dots_per_track: float
+    width: int
+    height: int
+
+    @classmethod
+    def from_file(cls, path: Path, image_index: int = 0) -> "LiveLayout":
+        """
+        Load a layout from a .r49 archive (markers of image `image_index`) or a
+        JSON file {"id", "dots_per_track", "width", "height", "markers": {id: {"x", "y"}}}.
+        """
+        path = Path(path)
+        if path.suffix == ".r49":
+            with zipfile.ZipFile(path, "r") as zf:
+                with zf.open("manifest.json") as f:
+                    manifest = Manifest(**json.load(f))
+            labels = manifest.get_image(image_index).labels
+            layout = cls(
+                id=manifest.layout.name or path.stem,
+                markers={mid: (m.x, m.y) for mid, m in labels.items()},
+                dots_per_track=manifest.dots_per_track,
+                width=manifest.camera.resolution.width,
+                height=manifest.camera.resolution.height,
+            )
+        else:
+            data = json.loads(path.read_text())
+            layout = cls(
+                id=data["id"],
+                markers={mid: (m["x"], m["y"]) for mid, m in data["markers"].items()},
+                dots_per_track=data["dots_per_track"],
+                width=data["width"],
+                height=data["height"],
+            )
+        # Uncalibrated layouts have dpt -1, their patches would be garbage
+        if layout.dots_per_track <= 0:
+            raise ValueError(f"Layout {path} is not calibrated")
+        return layout
+
+
+def extract_patches(
+    frame: np.ndarray, centers: np.ndarray, scale: float, size: int
+) -> np.ndarray:
+    """
+    Square `size` patches around `centers` (frame pixels) of the frame scaled
+    by `scale`, like the B49File crops of a frame at the model dpt. Parts
+    outside the frame are black. Returns uint8 (N, size, size, C).
+    """
+    h, w = frame.shape[:2]
+    interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_CUBIC
+    scaled = cv2.resize(
+        frame, (round(w * scale), round(h * scale)), interpolation=interpolation
+    )
+    r = size // 2
+    padded = cv2.copyMakeBorder(scaled, r, r, r, r, cv2.BORDER_CONSTANT, value=0)
+    patches = np.empty((len(centers), size, size, frame.shape[2]), dtype=np.uint8)
+    for i, (cx, cy) in enumerate(centers):
+        # scaled[cy - r : cy + r] is padded[cy : cy + 2r]; markers further
+        # outside the frame are clamped to its edge
+        x = min(max(int(cx * scale), 0), padded.shape[1] - size)
+        y = min(max(int(cy * scale), 0), padded.shape[0] - size)
+        patches[i] = padded[y : y + size, x : x + size]
+    return patches
+
+
+class FrameSource:
+    """
+    Frames (BGR) from a directory of images, a video file, a stream URL or a
+    camera index. Directories and video files are paced to `fps` and can loop.
+    """
+
+    def __init__(self, source: str, fps: float | None = None, loop: bool = False):
+        self.source = source
+        self.fps = fps
+        self.loop = loop
+        self._files: list[Path] = []
+        self._cap = None
+        self._pos = 0
+        self._last = 0.0
+
+        path = Path(source)
+        if path.is_dir():
+            self._files = sorted(
+                p for p in path.iterdir() if p.suffix.lower() in IMAGE_SUFFIXES
+            )
+            if not self._files:
+                raise ValueError(f"No images found in {source}")
+        else:
+            self._cap = cv2.VideoCapture(int(source) if source.isdigit() else source)
+            if not self._cap.isOpened():
+                raise ValueError(f"Failed to open video source {source}")
+            if self.fps is None and path.is_file():
+                self.fps = self._cap.get(cv2.CAP_PROP_FPS) or None
+
+    def read(self) -> np.ndarray | None:
+        """Next frame (blocking), or None at the end of the source."""
+        if self.fps:
+            wait = self._last + 1 / self.fps - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+        self._last = time.perf_counter()
+
+        if self._files:
+            if self._pos >= len(self._files):
+                if not self.loop:
+                    return None
+                self._pos = 0
+            frame = cv2.imread(str(self._files[self._pos]), cv2.IMREAD_COLOR)
+            self._pos += 1
+            return frame
+
+        ok, frame = self._cap.read()
+        if not ok and self.loop and Path(self.source).is_file():
+            self._cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, frame = self._cap.read()
+        return frame if ok else None
+
+    def close(self):
+        if self._cap is not None:
+            self._cap.release()
+
+
+@dataclass
+class LiveStats:
+    captured: int = 0
+    dropped: dict[str, int] = field(default_factory=dict)
+    published: int = 0
+    inferred_pct: float = 1.0
+    stage_ms: dict[str, float] = field(default_factory=dict)
+
+    def drop(self, stage: str):
+        self.dropped[stage] = self.dropped.get(stage, 0) + 1
+
+    def time(self, stage: str, seconds: float, alpha: float = 0.1):
+        """Exponential moving average of the time spent per frame in `stage`."""
+        ms = 1000 * seconds
+        prev = self.stage_ms.get(stage)
+        self.stage_ms[stage] = ms if prev is None else alpha * ms + (1 - alpha) * prev
+
+    def __str__(self):
+        stages = ", ".join(f"{k} {v:.1f} ms" for k, v in self.stage_ms.items())
+        dropped = sum(self.dropped.values())
+        return (
+            f"captured {self.captured}, published {self.published}, "
+            f"dropped {dropped} {self.dropped or ''}, "
+            f"inferred {self.inferred_pct:.0%} of markers | {stages}"
+        )
+
+
+def put_latest(queue: asyncio.Queue, item, stats: LiveStats, stage: str):
+    """Put without blocking, dropping the oldest item if the queue is full."""
+    if queue.full():
+        queue.get_nowait()
+        stats.drop(stage)
+    queue.put_nowait(item)
+
+
+class LivePipeline:
+    """
+    Asyncio pipeline classifying the layout markers in every frame of `source`
+    and passing the `rails49/live/predictions` payloads to `publish`.
+    With a `gate` only markers whose patch changed are sent to the model.
+    """
+
+    def __init__(
+        self,
+        source: FrameSource,
+        layout: LiveLayout,
+        predictor: Predictor,
+        publish: Callable[[dict], None],
+        queue_size: int = 2,
+        gate: ChangeGate | None = None,
+    ):
+        self.source = source
+        self.layout = layout
+        self.predictor = predictor
+        self.publish = publish
+        self.queue_size = queue_size
+        self.gate = gate
+        self.stats = LiveStats()
+        self._ids = list(layout.markers)
+        self._centers = np.array([layout.markers[i] for i in self._ids], dtype=np.float32)
+        self._last_published: float | None = None
+
+    async def run(self, report_every: float = 5.0):
+        """Run until the source is exhausted."""
+        q_frames: asyncio.Queue = asyncio.Queue(self.queue_size)
+        q_patches: asyncio.Queue = asyncio.Queue(self.queue_size)
+        q_results: asyncio.Queue = asyncio.Queue(self.queue_size)
+        stages = [
+            asyncio.create_task(self._capture(q_frames)),
+            asyncio.create_task(self._preprocess(q_frames, q_patches)),
+            asyncio.create_task(self._infer(q_patches, q_results)),
+            asyncio.create_task(self._publish(q_results)),
+        ]
+        reporter = asyncio.create_task(self._report(report_every))
+        try:
+            await asyncio.gather(*stages)
+        finally:
+            reporter.cancel()
+            for task in stages:
+                task.cancel()
+            self.source.close()
+
+    async def _capture(self, out: asyncio.Queue):
+        while True:
+            frame = await asyncio.to_thread(self.source.read)
+            if frame is None:
+                await out.put(None)
+                return
+            self.stats.captured += 1
+            put_latest(out, (time.perf_counter(), frame), self.stats, "capture")
+
+    async def _preprocess(self, inp: asyncio.Queue, out: asyncio.Queue):
+        while (item := await inp.get()) is not None:
+            t_frame, frame = item
+            t0 = time.perf_counter()
+            patches = await asyncio.to_thread(self._patches, frame)
+            if self.gate is not None:
+                sigs = self.gate.signatures(patches)
+                mask = self.gate.changed(sigs)
+            else:
+                sigs, mask = None, np.ones(len(patches), dtype=bool)
+            self.stats.time("preprocess", time.perf_counter() - t0)
+            put_latest(out, (t_frame, patches, sigs, mask), self.stats, "preprocess")
+        await out.put(None)
+
+    def _patches(self, frame: np.ndarray) -> np.ndarray:
+        # Markers are in reference image pixels, the frame may be resized
+        frame_scale = frame.shape[1] / self.layout.width
+        img_dpt = self.layout.dots_per_track * frame_scale
+        # The B49File crop semantics the model was trained on; data/patches.py
+        # (browser semantics) replaces this once bin/patch_parity.py --chrome passes
+        patches = extract_patches(
+            frame,
+            self._centers * frame_scale,
+            self.predictor.dpt / img_dpt,
+            self.predictor.size,
+        )
+        return patches[..., ::-1]  # BGR -> RGB
+
+    async def _infer(self, inp: asyncio.Queue, out: asyncio.Queue):
+        while (item := await inp.get()) is not None:
+            t_frame, patches, sigs, mask = item
+            t0 = time.perf_counter()
+            labels = await asyncio.to_thread(self.predictor.predict, patches[mask])
+            t_infer = time.perf_counter() - t0
+            if self.gate is not None:
+                labels = self.gate.update(mask, sigs, labels)
+            self.stats.time("inference", t_infer)
+            put_latest(out, (t_frame, labels, t_infer), self.stats, "inference")
+        await out.put(None)
+
+    async def _publish(self, inp: asyncio.Queue):
+        while (item := await inp.get()) is not None:
+            t_frame, labels, t_infer = item
+            now = time.perf_counter()
+            # Time between published frames, like the browser live view
+            t_tot = now - (self._last_published or t_frame)
+            self._last_published = now
+            self.stats.time("latency", now - t_frame)
+            payload = {
+                "timestamp": int(time.time() * 1000),
+                "layoutId": self.layout.id,
+                "markers": [
+                    {"id": mid, "prediction": label}
+                    for mid, label in zip(self._ids, labels)
+                ],
+                "metrics": {
+                    "inferenceTimeMs": round(1000 * t_infer, 2),
+                    "tTotMs": round(1000 * t_tot, 2),
+                },
+            }
+            await asyncio.to_thread(self.publish, payload)
+            self.stats.published += 1
+            if self.gate is not None:
+                self.stats.inferred_pct = self.gate.inferred_pct
+
+    async def _report(self, every: float):
+        while True:
+            await asyncio.sleep(every)
+            print(f"[live] {self.stats}")
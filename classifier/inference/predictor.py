@@ -0,0 +1,355 @@
+import asyncio
+import hashlib
+import json
+import os
+import platform
+import time
+from collections import defaultdict, deque
+from pathlib import Path
+
+import numpy as np
+import onnxruntime as ort
+
+# Used when model.config has no "normalization" (fastai's imagenet_stats)
+IMAGENET_MEAN = [0.485, 0.456, 0.406]
+IMAGENET_STD = [0.229, 0.224, 0.225]
+
+# Latency samples kept per batch size
+STATS_WINDOW = 1000
+
+# Machine-specific optimized models, see cached_session()
+CACHE_DIR = Path(os.environ.get("BLOCKS49_ORT_CACHE", Path.home() / ".cache/blocks49/ort"))
+
+OPTIMIZATION_LEVELS = {
+    "disable_all": ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    "basic": ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    "extended": ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    "all": ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+
+# SessionOptions profile used when model.config has no "session_options"
+DEFAULT_SESSION_OPTIONS = {
+    "graph_optimization_level": "all",
+    "intra_op_num_threads": 0,
+    "inter_op_num_threads": 1,
+    "execution_mode": "sequential",
+    "enable_cpu_mem_arena": True,
+    "enable_mem_pattern": True,
+}
+
+
+def make_session_options(profile: dict | None = None, **overrides) -> ort.SessionOptions:
+    """SessionOptions from a model.config "session_options" profile."""
+    profile = {**DEFAULT_SESSION_OPTIONS, **(profile or {}), **overrides}
+    options = ort.SessionOptions()
+    options.graph_optimization_level = OPTIMIZATION_LEVELS[
+        profile["graph_optimization_level"]
+    ]
+    options.intra_op_num_threads = profile["intra_op_num_threads"]
+    options.inter_op_num_threads = profile["inter_op_num_threads"]
+    options.execution_mode = (
+        ort.ExecutionMode.ORT_PARALLEL
+        if profile["execution_mode"] == "parallel"
+        else ort.ExecutionMode.ORT_SEQUENTIAL
+    )
+    options.enable_cpu_mem_arena = profile["enable_cpu_mem_arena"]
+    options.enable_mem_pattern = profile["enable_mem_pattern"]
+    return options
+
+
+def machine_key() -> str:
+    """Identifies ORT version and CPU, which fully optimized models depend on."""
+    flags = ""
+    try:
+        with open("/proc/cpuinfo") as f:
+            flags = next((line for line in f if line.startswith("flags")), "")
+    except OSError:
+        pass
+    return f"{ort.__version__}:{platform.machine()}:{platform.processor()}:{flags}"
+
+
+def cached_session(
+    model_path: Path, profile: dict | None = None, cache_dir: Path | None = None
+) -> ort.InferenceSession:
+    """
+    Session with warm start: the first session on a machine is fully
+    optimized (ORT_ENABLE_ALL, incl. CPU-specific layouts) and the optimized
+    model is saved to `cache_dir`; later sessions load it with graph
+    optimizations disabled. Cache entries are keyed by the model file, the
+    ORT version and the CPU (the file is identified by path, size and mtime;
+    hashing its contents would cost as much as the optimization saves).
+    """
+    model_path = Path(model_path).resolve()
+    cache_dir = Path(cache_dir or CACHE_DIR)
+    st = model_path.stat()
+    h = hashlib.sha256(f"{model_path}:{st.st_size}:{st.st_mtime_ns}".encode())
+    h.update(machine_key().encode())
+    cached = cache_dir / f"{model_path.stem}.{h.hexdigest()[:16]}.onnx"
+    if cached.exists():
+        options = make_session_options(profile, graph_optimization_level="disable_all")
+        return ort.InferenceSession(
+            str(cached), sess_options=options, providers=["CPUExecutionProvider"]
+        )
+
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    options = make_session_options(profile, graph_optimization_level="all")
+    tmp_path = cached.with_suffix(f".{os.getpid()}.tmp")
+    options.optimized_model_filepath = str(tmp_path)
+    options.log_severity_level = 3  # "hardware specific optimizations" is intended
+    session = ort.InferenceSession(
+        str(model_path), sess_options=options, providers=["CPUExecutionProvider"]
+    )
+    tmp_path.replace(cached)
+    return session
+
+
+class Predictor:
+    """
+    Batched marker classification with an exported ORT model.
+
+    Loads `model_<precision>.ort` and `model.config` from an export directory
+    (e.g. ui/public/models/resnet18). Patches are uint8 RGB arrays of shape
+    (size, size, 3), cut at the model dpt like the B49File crops; they are
+    normalized here unless the model was exported with fused preprocessing.
+
+    Sessions use the model.config "session_options" profile. With
+    `warm_start` the machine-specific optimized model is cached (see
+    `cached_session`), so restarts skip graph optimization.
+
+    Every `session.run` is timed, see `stats()`.
+    """
+
+    def __init__(
+        self,
+        model_dir: Path,
+        precision: str | None = None,
+        max_batch: int = 64,
+        intra_op_threads: int | None = None,
+        warm_start: bool = True,
+        cache_dir: Path | None = None,
+    ):
+        self.model_dir = Path(model_dir)
+        with open(self.model_dir / "model.config") as f:
+            self.config = json.load(f)
+        self.precision = precision or self.config.get("recommended_precision", "fp32")
+        self.labels: list[str] = self.config.get("labels", ["track", "train", "other"])
+        self.size: int = self.config.get("size", 96)
+        self.dpt: int = self.config.get("dpt", 30)
+        self.max_batch = max_batch
+
+        normalization = self.config.get("normalization", {})
+        mean = np.array(normalization.get("mean", IMAGENET_MEAN), dtype=np.float32)
+        std = np.array(normalization.get("std", IMAGENET_STD), dtype=np.float32)
+        # (x / 255 - mean) / std == x * scale + bias, per channel (NCHW)
+        self._scale = (1.0 / (255.0 * std)).reshape(1, 3, 1, 1)
+        self._bias = (-mean / std).reshape(1, 3, 1, 1)
+
+        model_path = self.model_dir / f"model_{self.precision}.ort"
+        if not model_path.exists():
+            raise FileNotFoundError(f"Model file not found at {model_path}")
+        profile = dict(self.config.get("session_options", {}))
+        if intra_op_threads is not None:
+            profile["intra_op_num_threads"] = intra_op_threads
+        t0 = time.perf_counter()
+        if warm_start:
+            self.session = cached_session(model_path, profile, cache_dir)
+        else:
+            self.session = ort.InferenceSession(
+                str(model_path),
+                sess_options=make_session_options(profile),
+                providers=["CPUExecutionProvider"],
+            )
+        self.session_ms = 1000 * (time.perf_counter() - t0)
+        input_info = self.session.get_inputs()[0]
+        self._input_name = input_info.name
+        if "uint8" in input_info.type:
+            self._input_dtype = np.uint8
+        elif "float16" in input_info.type:
+            self._input_dtype = np.float16
+        else:
+            self._input_dtype = np.float32
+
+        self._times: dict[int, deque] = defaultdict(lambda: deque(maxlen=STATS_WINDOW))
+
+    def preprocess(self, patches: np.ndarray) -> np.ndarray:
+        """Model input for uint8 NHWC RGB patches."""
+        if self._input_dtype == np.uint8:
+            return np.ascontiguousarray(patches)
+        x = patches.transpose(0, 3, 1, 2).astype(np.float32)
+        return (x * self._scale + self._bias).astype(self._input_dtype)
+
+    def predict_logits(self, patches) -> np.ndarray:
+        """Logits (float32, [N, n_classes]) in batches of at most `max_batch`."""
+        patches = np.asarray(patches, dtype=np.uint8)
+        if len(patches) == 0:
+            return np.empty((0, len(self.labels)), dtype=np.float32)
+        if patches.shape[1:] != (self.size, self.size, 3):
+            raise ValueError(
+                f"Expected patches of shape (N, {self.size}, {self.size}, 3), "
+                f"got {patches.shape}"
+            )
+        outs = []
+        for start in range(0, len(patches), self.max_batch):
+            x = self.preprocess(patches[start : start + self.max_batch])
+            t0 = time.perf_counter()
+            (out,) = self.session.run(None, {self._input_name: x})
+            self._times[len(x)].append(time.perf_counter() - t0)
+            outs.append(out.astype(np.float32))
+        return np.concatenate(outs)
+
+    def predict(self, patches) -> list[str]:
+        """Label of each patch."""
+        return [self.labels[i] for i in self.predict_logits(patches).argmax(axis=1)]
+
+    def stats(self) -> dict[int, dict]:
+        """Per batch size: number of runs, p50/p95 latency and throughput."""
+        stats = {}
+        for bs in sorted(self._times):
+            times = np.array(self._times[bs])
+            p50, p95 = 1000 * np.percentile(times, [50, 95])
+            stats[bs] = {
+                "runs": len(times),
+                "p50_ms": float(p50),
+                "p95_ms": float(p95),
+                "images_per_sec": float(bs / np.median(times)),
+            }
+        return stats
+
+    def reset_stats(self):
+        self._times.clear()
+
+
+class MicroBatcher:
+    """
+    Asyncio front end of a `Predictor`.
+
+    Concurrent `classify()` calls are queued and run together: a batch is
+    closed when it reaches `max_batch` patches or `max_delay_ms` after its
+    first request, whichever comes first. Inference runs in a worker thread
+    so the event loop stays responsive.
+
+        async with MicroBatcher(predictor, max_delay_ms=5) as batcher:
+            labels = await asyncio.gather(*(batcher.classify(p) for p in patches))
+
+    Request latency (queueing + inference) is recorded per batch size, see
+    `stats()`.
+    """
+
+    def __init__(
+        self,
+        predictor: Predictor,
+        max_batch: int | None = None,
+        max_delay_ms: float = 5.0,
+    ):
+        self.predictor = predictor
+        self.max_batch = max_batch or predictor.max_batch
+        self.max_delay = max_delay_ms / 1000
+        self._queue: asyncio.Queue | None = None
+        self._worker: asyncio.Task | None = None
+        self._latencies: dict[int, deque] = defaultdict(
+            lambda: deque(maxlen=STATS_WINDOW)
+        )
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    def start(self):
+        if self._worker is None:
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Finish queued requests, then stop the worker."""
+        if self._worker is None:
+            return
+        await self._queue.put(None)
+        await self._worker
+        self._worker = None
+
+    async def classify(self, patch: np.ndarray) -> str:
+        """Label of a single uint8 RGB patch."""
+        if self._worker is None:
+            raise RuntimeError("MicroBatcher is not running, use start() or async with")
+        # Checked here, a bad patch would otherwise fail its whole batch
+        size = self.predictor.size
+        if np.shape(patch) != (size, size, 3):
+            raise ValueError(
+                f"Expected a patch of shape ({size}, {size}, 3), got {np.shape(patch)}"
+            )
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((patch, future, time.perf_counter()))
+        return await future
+
+    async def classify_many(self, patches) -> list[str]:
+        """Labels of several patches, batched together with other callers."""
+        return list(await asyncio.gather(*(self.classify(p) for p in patches)))
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            try:
+                patches = np.stack([patch for patch, _, _ in batch])
+                labels = await loop.run_in_executor(
+                    None, self.predictor.predict, patches
+                )
+            except Exception as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            done = time.perf_counter()
+            latencies = self._latencies[len(batch)]
+            for (_, future, t0), label in zip(batch, labels):
+                latencies.append(done - t0)
+                if not future.done():
+                    future.set_result(label)
+
+    def stats(self) -> dict[int, dict]:
+        """Per batch size: number of requests and p50/p95 request latency."""
+        stats = {}
+        for bs in sorted(self._latencies):
+            lat = np.array(self._latencies[bs])
+            p50, p95 = 1000 * np.percentile(lat, [50, 95])
+            stats[bs] = {"requests": len(lat), "p50_ms": float(p50), "p95_ms": float(p95)}
+        return stats
+
+
+def format_stats(predictor_stats: dict, batcher_stats: dict | None = None) -> list[str]:
+    """Table lines of inference (and request) latency per batch size."""
+    lines = ["  bs   runs  p50 (ms)  p95 (ms)    img/s"]
+    for bs, s in predictor_stats.items():
+        lines.append(
+            f"{bs:>4} {s['runs']:>6} {s['p50_ms']:>9.2f} {s['p95_ms']:>9.2f} "
+            f"{s['images_per_sec']:>8.0f}"
+        )
+    if batcher_stats:
+        lines.append("  bs  requests  request p50 (ms)  request p95 (ms)")
+        for bs, s in batcher_stats.items():
+            lines.append(
+                f"{bs:>4} {s['requests']:>9} {s['p50_ms']:>17.2f} {s['p95_ms']:>17.2f}"
+            )
+    return lines
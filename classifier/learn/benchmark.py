@@ -0,0 +1,183 @@
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import onnxruntime as ort
+
+from ..inference.predictor import cached_session, make_session_options
+
+
+def _input_array(session: ort.InferenceSession, batch_size: int, size: int):
+    """Random input matching the session's first input type."""
+    input_info = session.get_inputs()[0]
+    if "uint8" in input_info.type:
+        # Fused preprocessing: raw NHWC pixels
+        return np.random.randint(0, 256, (batch_size, size, size, 3), dtype=np.uint8)
+    dtype = np.float16 if "float16" in input_info.type else np.float32
+    return np.random.rand(batch_size, 3, size, size).astype(dtype)
+
+
+def benchmark_model(
+    model_path: Path,
+    size: int,
+    batch_sizes: list[int],
+    warmup: int = 5,
+    runs: int = 50,
+    max_seconds: float = 1.0,
+    sess_options: ort.SessionOptions | None = None,
+) -> dict:
+    """
+    Measure session creation time, first-run (warmup) latency and steady-state
+    latency percentiles and throughput of an ONNX/ORT model on the CPU.
+    Each batch size runs `runs` times or until `max_seconds` have passed
+    (at least 10 runs).
+
+    Returns e.g.
+    {"session_ms": 41.2, "first_run_ms": 12.0,
+     "batches": {"1": {"p50_ms": 2.1, "p95_ms": 2.4, "p99_ms": 3.0, "images_per_sec": 470.0}, ...}}
+    """
+    t0 = time.perf_counter()
+    session = ort.InferenceSession(
+        str(model_path), sess_options=sess_options, providers=["CPUExecutionProvider"]
+    )
+    session_ms = 1000 * (time.perf_counter() - t0)
+    input_name = session.get_inputs()[0].name
+
+    x = _input_array(session, 1, size)
+    t0 = time.perf_counter()
+    session.run(None, {input_name: x})
+    first_run_ms = 1000 * (time.perf_counter() - t0)
+
+    batches = {}
+    for bs in batch_sizes:
+        x = _input_array(session, bs, size)
+        for _ in range(warmup):
+            session.run(None, {input_name: x})
+        times = []
+        start = time.perf_counter()
+        while len(times) < runs:
+            t0 = time.perf_counter()
+            session.run(None, {input_name: x})
+            times.append(time.perf_counter() - t0)
+            if len(times) >= 10 and t0 - start > max_seconds:
+                break
+        p50, p95, p99 = 1000 * np.percentile(times, [50, 95, 99])
+        batches[str(bs)] = {
+            "p50_ms": float(p50),
+            "p95_ms": float(p95),
+            "p99_ms": float(p99),
+            "images_per_sec": float(bs / np.median(times)),
+        }
+
+    return {
+        "session_ms": session_ms,
+        "first_run_ms": first_run_ms,
+        "batches": batches,
+    }
+
+
+def startup_benchmark(
+    model_path: Path,
+    size: int,
+    profile: dict | None = None,
+    optimized_path: Path | None = None,
+    repeats: int = 3,
+) -> dict:
+    """
+    Session creation plus first run [ms] (median of `repeats`) of a model:
+    "cold" loads the shipped model with the `profile` SessionOptions, "warm"
+    the machine-specific optimized copy made by `cached_session`, and
+    "optimized" the pre-optimized model shipped next to it, if any, with
+    graph optimizations disabled.
+    """
+
+    def startup(create) -> float:
+        times = []
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            session = create()
+            session.run(None, {session.get_inputs()[0].name: _input_array(session, 1, size)})
+            times.append(time.perf_counter() - t0)
+        return 1000 * float(np.median(times))
+
+    def load(path: Path, **overrides):
+        return lambda: ort.InferenceSession(
+            str(path),
+            sess_options=make_session_options(profile, **overrides),
+            providers=["CPUExecutionProvider"],
+        )
+
+    result = {"cold_ms": startup(load(model_path))}
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cached_session(model_path, profile, cache_dir)  # fill the cache
+        result["warm_ms"] = startup(lambda: cached_session(model_path, profile, cache_dir))
+    if optimized_path is not None and optimized_path.exists():
+        # Already optimized offline, graph optimizations are skipped
+        result["optimized_ms"] = startup(
+            load(optimized_path, graph_optimization_level="disable_all")
+        )
+    return result
+
+
+def format_benchmarks(benchmarks: dict[str, dict]) -> list[str]:
+    """Markdown table lines of p50/p99 latency and throughput per batch size."""
+    if not benchmarks:
+        return []
+    batch_sizes = list(next(iter(benchmarks.values()))["batches"])
+    header = "| Model | Session (ms) | " + " | ".join(
+        f"bs={bs} p50/p99 (ms) | bs={bs} img/s" for bs in batch_sizes
+    )
+    lines = [header + " |", "| --- " * (2 + 2 * len(batch_sizes)) + "|"]
+    for model in sorted(benchmarks):
+        bench = benchmarks[model]
+        cells = [model, f"{bench['session_ms']:.1f}"]
+        for bs in batch_sizes:
+            b = bench["batches"][bs]
+            cells.append(f"{b['p50_ms']:.2f} / {b['p99_ms']:.2f}")
+            cells.append(f"{b['images_per_sec']:.0f}")
+        lines.append("| " + " | ".join(cells) + " |")
+    return lines
+
+
+def format_startup(startup: dict[str, dict]) -> list[str]:
+    """Markdown table lines of cold vs warm session startup per model."""
+    if not startup:
+        return []
+    lines = [
+        "| Model | Cold start (ms) | Warm start (ms) | Pre-optimized (ms) |",
+        "| --- | --- | --- | --- |",
+    ]
+    for model in sorted(startup):
+        s = startup[model]
+        optimized = f"{s['optimized_ms']:.1f}" if "optimized_ms" in s else "n/a"
+        lines.append(
+            f"| {model} | {s['cold_ms']:.1f} | {s['warm_ms']:.1f} | {optimized} |"
+        )
+    return lines
+
+
+def format_pruning(rows: list[dict], batch_size: int) -> list[str]:
+    """
+    Markdown table lines of complexity, validation error, size and p50
+    latency (bs=1 and `batch_size`) of FP32 / Int8 per pruning ratio, rows
+    as written by `Exporter.summary`.
+    """
+
+    def pair(row: dict, key: str, fmt: str) -> str:
+        values = [row.get(p, {}).get(key) for p in ("fp32", "int8")]
+        return " / ".join("n/a" if v is None else format(v, fmt) for v in values)
+
+    lines = [
+        "| Model | Pruned | MMACs | Params (M) | Valid error FP32 / Int8 | "
+        f"Size FP32 / Int8 (MB) | bs=1 p50 (ms) | bs={batch_size} p50 (ms) |",
+        "| --- " * 8 + "|",
+    ]
+    for row in sorted(rows, key=lambda r: r["ratio"]):
+        lines.append(
+            f"| {row['model']} | {row['ratio']:.0%} | {row['macs'] / 1e6:.1f} | "
+            f"{row['params'] / 1e6:.2f} | {pair(row, 'valid_err', '.2%')} | "
+            f"{pair(row, 'size_mb', '.2f')} | {pair(row, 'p50_ms', '.2f')} | "
+            f"{pair(row, 'p50_ms_layout', '.2f')} |"
+        )
+    return lines
@@ -10,6 +10,9 @@ DATA_DIR = Path(
     os.getenv("BLOCKS49DATA", str(B49DIR / "local/datasets/train-track/r49"))
 )
 
+# Manifest-only marker index of the data directory (bin/marker_index.py)
+MARKER_INDEX = Path(os.getenv("BLOCKS49INDEX", str(DATA_DIR / "marker_index.npz")))
+
 VALID_PCT = 0.25
 
 
@@ -57,14 +60,165 @@ class LearnerConfig:
     def arch_name(self):
         return self._config.get("model", self._model_name)
 
+    @property
+    def hard_examples(self):
+        """Hard-example sampling settings, e.g. {"floor": 0.2, "epoch_pct": 0.5}."""
+        return self._config.get("hard_examples")
+
+    @property
+    def incremental(self):
+        """Incremental fine-tuning settings, e.g. {"epochs": 3, "replay": 2.0}."""
+        return {
+            "epochs": 3,  # fine-tuning epochs
+            "replay": 2.0,  # trained sources replayed per new source
+            "lr": 1e-4,  # max learning rate (one cycle)
+            "tolerance": 0.0,  # accepted increase of the validation error
+            **self._config.get("incremental", {}),
+        }
+
+    @property
+    def qat(self):
+        """Quantization-aware training settings, e.g. {"epochs": 3, "lr": 1e-4}."""
+        return {
+            "epochs": 3,  # last epochs trained with fake quantization
+            "lr": 1e-4,  # max learning rate (one cycle) of those epochs
+            "freeze_epochs": 1,  # final epochs with frozen ranges and bn statistics
+            **self._config.get("qat", {}),
+        }
+
+    @property
+    def distill(self):
+        """Distillation settings of a student model, e.g. {"teacher": "resnet18"}."""
+        return {
+            "teacher": "resnet18",
+            "temperature": 4.0,  # softening of the logits
+            "alpha": 0.7,  # weight of the teacher loss, 1 - alpha for the labels
+            "lr": 3e-3,  # max learning rate (one cycle) of students trained from scratch
+            **self._config.get("distill", {}),
+        }
+
+    @property
+    def pruning(self):
+        """Structured pruning settings, e.g. {"ratios": [0.25, 0.5], "importance": "taylor"}."""
+        return {
+            "ratios": [0.25, 0.5, 0.75],  # fraction of channels removed per layer
+            "importance": "magnitude",  # channel ranking: magnitude, taylor or bn
+            "steps": 1,  # prune/fine-tune rounds to reach the ratio
+            "epochs": 3,  # fine-tuning epochs per round
+            "lr": 1e-3,  # max learning rate (one cycle)
+            "round_to": 8,  # keep channel counts multiples of this
+            "taylor_batches": 8,  # gradient batches for "taylor"
+            **self._config.get("pruning", {}),
+        }
+
+    @property
+    def error_analysis(self):
+        """Error report settings, e.g. {"top_k": 24, "thumbnail": 128}."""
+        return {
+            "top_k": 12,  # highest-loss samples kept per class and per source
+            "thumbnail": 96,  # thumbnail size in the report (px)
+            **self._config.get("error_analysis", {}),
+        }
+
+    @property
+    def dedup(self):
+        """Near-duplicate removal settings, e.g. {"max_distance": 4}."""
+        return self._config.get("dedup")
+
+    @property
+    def quantization(self):
+        """Static int8 settings, e.g. {"static": true, "calibrate_method": "entropy"}."""
+        return self._config.get("quantization", {})
+
+    @property
+    def fused_preprocessing(self):
+        """Export models that take raw uint8 NHWC patches."""
+        return self._config.get("fused_preprocessing", False)
+
+    @property
+    def frame_model(self):
+        """Also export the whole-frame model (frame_fp32) with in-graph patch extraction."""
+        return self._config.get("frame_model", False)
+
+    @property
+    def optimized_model(self):
+        """Also ship offline-optimized ONNX models (model_<precision>.optimized.onnx)."""
+        return self._config.get("optimized_model", False)
+
+    @property
+    def session_options(self):
+        """ORT SessionOptions overrides for model.config, e.g. {"intra_op_num_threads": 2}."""
+        return self._config.get("session_options", {})
+
+    @property
+    def markers_per_layout(self):
+        """Number of markers on a typical layout, i.e. the live-view batch size."""
+        return self._config.get("markers_per_layout", 24)
+
+    @property
+    def benchmark_batch_sizes(self):
+        return sorted({1, 8, 32, self.markers_per_layout})
+
     @property
     def data_dir(self):
         return DATA_DIR
 
+    @property
+    def data_filter(self):
+        """
+        pandas query on the marker index selecting the training archives, e.g.
+        "scale == 'HO' and dpt > 0". Archives with a matching marker are used.
+        """
+        return self._config.get("data_filter")
+
+    @property
+    def r49_files(self) -> list[Path]:
+        """The .r49 archives of the data directory, restricted by `data_filter`."""
+        files = list(self.data_dir.rglob("**/*.r49"))
+        if self.data_filter is None:
+            return files
+        from ..data.marker_index import MarkerIndex
+
+        index = MarkerIndex.update(self.data_dir, MARKER_INDEX)
+        selected = set(index.select(self.data_filter))
+        return [f for f in files if f.relative_to(self.data_dir).as_posix() in selected]
+
+    @property
+    def db(self):
+        """
+        Server database and image store with V3 layouts, e.g. {"path":
+        "local/server/data.db", "blobs": "local/server/data/images"} (relative
+        to BLOCKS49DIR). None to train on the .r49 archives only.
+        """
+        db = self._config.get("db")
+        if db is None:
+            return None
+        from ..data.b49_db import B49Db
+
+        return B49Db(B49DIR / db["path"], B49DIR / db["blobs"])
+
     @property
     def valid_pct(self):
         return VALID_PCT
 
+    def dedup_items(self, dataset) -> list[int] | None:
+        """
+        Indices of `dataset` kept by near-duplicate removal (settings from
+        config.json "dedup"), None to keep all. Learner and Exporter split the
+        same items, so they agree on the validation set.
+        """
+        settings = self.dedup
+        if settings is None:
+            return None
+        from ..data.dedup import deduplicate
+
+        items, _ = deduplicate(
+            dataset,
+            max_distance=settings.get("max_distance", 4),
+            max_per_group=settings.get("max_per_group"),
+        )
+        return items
+
     def get_architecture(self, model_name: str | None = None):
         """
         Resolves the model architecture.
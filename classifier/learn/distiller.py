@@ -0,0 +1,278 @@
+import hashlib
+import json
+
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+from fastai.callback.core import Callback
+from fastai.learner import Learner as FastaiLearner
+from fastai.vision.all import (
+    CrossEntropyLossFlat,
+    CSVLogger,
+    Normalize,
+    error_rate,
+    imagenet_stats,
+    vision_learner,
+)
+
+from ..data.image_transform import apply_scaling_transform
+from ..data.r49_dataloaders import B49DataLoaders
+from ..data.r49_dataset import B49Dataset
+from .config import VALID_PCT, LearnerConfig
+from .exporter import Exporter
+
+# Teacher logits of the crops, in the student's model directory
+TEACHER_CACHE = "teacher_logits.npz"
+TEACHER_BS = 256
+
+
+class TinyCNN(nn.Sequential):
+    """
+    Small student network ("model": "tiny_cnn"): four conv-bn-relu stages,
+    each but the first halving the resolution, global average pooling and a
+    linear classifier. `width` channels in the first stage, doubling after.
+    """
+
+    def __init__(self, n_out: int, width: int = 16):
+        layers: list[nn.Module] = []
+        c_in = 3
+        for i in range(4):
+            c_out = width * 2**i
+            layers += [
+                nn.Conv2d(c_in, c_out, 3, stride=1 if i == 0 else 2, padding=1, bias=False),
+                nn.BatchNorm2d(c_out),
+                nn.ReLU(inplace=True),
+            ]
+            c_in = c_out
+        layers += [nn.AdaptiveAvgPool2d(1), nn.Flatten(), nn.Linear(c_in, n_out)]
+        super().__init__(*layers)
+
+
+class DistillationCallback(Callback):
+    """
+    Replace the training loss by the distillation loss
+
+        alpha * T^2 * KL(teacher_T || student_T) + (1 - alpha) * CE(student, label)
+
+    with logits softened by temperature T. Teacher logits are looked up per
+    sample through `HardExampleDL.batch_positions`; samples without teacher
+    logits (`has_teacher` False) use the label loss only.
+    """
+
+    order = 50  # before HardExampleCallback reads the loss
+
+    def __init__(
+        self,
+        teacher_logits: torch.Tensor,
+        has_teacher: torch.Tensor,
+        temperature: float = 4.0,
+        alpha: float = 0.7,
+    ):
+        self.teacher_logits = teacher_logits
+        self.has_teacher = has_teacher
+        self.temperature, self.alpha = temperature, alpha
+
+    def before_fit(self):
+        self._items = np.asarray(self.dls.train.items)
+
+    def after_loss(self):
+        if not self.training:
+            return
+        positions = self.dls.train.batch_positions(self.iter)
+        if len(positions) != len(self.pred):
+            return
+        idxs = torch.from_numpy(self._items[positions])
+        teacher = self.teacher_logits[idxs].to(self.pred.device)
+        mask = self.has_teacher[idxs].to(self.pred.device)
+
+        T = self.temperature
+        soft = F.kl_div(
+            F.log_softmax(self.pred / T, dim=1),
+            F.log_softmax(teacher / T, dim=1),
+            log_target=True,
+            reduction="none",
+        ).sum(dim=1) * (T * T)
+        hard = F.cross_entropy(self.pred, self.yb[0], reduction="none")
+        loss = torch.where(mask, self.alpha * soft + (1 - self.alpha) * hard, hard).mean()
+        self.learn.loss_grad = loss
+        self.learn.loss = loss.detach().clone()
+
+
+class Distiller(LearnerConfig):
+    """
+    Train the model `model_name` (the student) on the soft targets of a
+    trained teacher model, settings from config.json "distill". The student
+    has its own `size` and architecture ("model", e.g. "mobilenet_v3_small"
+    or "tiny_cnn") and is saved to model.pth like a Learner model, so
+    Exporter handles it unchanged.
+    """
+
+    def __init__(self, model_name: str, teacher: str | None = None):
+        super().__init__(model_name)
+        settings = self.distill
+        # Only loads the teacher's model.pth
+        self._teacher = Exporter(teacher or settings["teacher"])
+        if self._teacher.labels != self.labels:
+            raise ValueError(
+                f"Teacher labels {self._teacher.labels} != student labels {self.labels}"
+            )
+
+        r49_files, db = self.r49_files, self.db
+        ds = B49Dataset(
+            r49_files,
+            dpt=self.dpt,
+            size=int(1.5 * self.size),
+            labels=self.labels,
+            image_transform=apply_scaling_transform,
+            db=db,
+        )
+        self._dataset = ds
+
+        # HardExampleDL (uniform until weighted) maps batches back to samples
+        self._dls = B49DataLoaders.from_dataset(
+            ds,
+            valid_pct=VALID_PCT,
+            crop_size=self.size,
+            bs=self.batch_size,
+            vocab=self.labels,
+            hard_examples=True,
+        )
+
+        # Teacher logits aligned with the student's samples
+        cached = self.teacher_logits(r49_files, db)
+        n_out = len(self.labels)
+        logits = np.zeros((len(ds), n_out), dtype=np.float32)
+        has_teacher = np.zeros(len(ds), dtype=bool)
+        for i in range(len(ds)):
+            row = cached.get(ds.get_info(i))
+            if row is not None:
+                logits[i], has_teacher[i] = row, True
+        print(f"Teacher logits for {has_teacher.sum()} of {len(ds)} crops")
+        self._teacher_logits = torch.from_numpy(logits)
+        self._has_teacher = torch.from_numpy(has_teacher)
+
+        if self.arch_name == "tiny_cnn":
+            model = TinyCNN(n_out, width=settings.get("width", 16))
+            norm = self.config.get("normalization")
+            stats = (norm["mean"], norm["std"]) if norm else imagenet_stats
+            self._dls.add_tfms([Normalize.from_stats(*stats)], "after_batch")
+            self._learn_obj = FastaiLearner(
+                self._dls, model, loss_func=CrossEntropyLossFlat(), metrics=error_rate
+            )
+        else:
+            self._learn_obj = vision_learner(
+                self._dls,
+                self.get_architecture(self.arch_name),
+                metrics=error_rate,
+                loss_func=CrossEntropyLossFlat(),
+            )
+
+    def _teacher_key(self, r49_files, db) -> str:
+        """Hash of the teacher model, its crop settings and the data files."""
+        h = hashlib.sha256()
+        teacher_pth = self._teacher.model_dir / "model.pth"
+        for f in [teacher_pth, *sorted(r49_files)] + ([db.path] if db is not None else []):
+            st = f.stat()
+            h.update(f"{f}:{st.st_size}:{st.st_mtime_ns}".encode())
+        t = self._teacher
+        h.update(json.dumps([t.dpt, t.size, t.labels, t.config.get("normalization")]).encode())
+        return h.hexdigest()
+
+    def teacher_logits(self, r49_files, db) -> dict[tuple[str, int, str], np.ndarray]:
+        """
+        Teacher logits of its own clean (center, un-augmented) crops by
+        (source, image index, marker id). Computed once and cached in
+        TEACHER_CACHE until the teacher model or the data change.
+        """
+        cache_path = self.model_dir / TEACHER_CACHE
+        key = self._teacher_key(r49_files, db)
+        if cache_path.exists():
+            with np.load(cache_path) as cache:
+                if str(cache["key"]) == key:
+                    print(f"Using cached teacher logits from {cache_path.name}")
+                    return {
+                        (str(s), int(i), str(m)): row
+                        for s, i, m, row in zip(
+                            cache["sources"], cache["images"], cache["markers"], cache["logits"]
+                        )
+                    }
+
+        t = self._teacher
+        print(f"Computing teacher logits ({t.arch_name}, size {t.size}, dpt {t.dpt})...")
+        model = t.model.eval()
+        norm = t.config.get("normalization")
+        mean, std = (norm["mean"], norm["std"]) if norm else imagenet_stats
+        mean = np.array(mean, dtype=np.float32).reshape(1, 3, 1, 1)
+        std = np.array(std, dtype=np.float32).reshape(1, 3, 1, 1)
+        ds = B49Dataset(
+            r49_files,
+            dpt=t.dpt,
+            size=int(1.5 * t.size),
+            labels=t.labels,
+            image_transform=apply_scaling_transform,
+            db=db,
+        )
+        infos = [ds.get_info(i) for i in range(len(ds))]
+        logits = []
+        with torch.inference_mode():
+            for start in range(0, len(ds), TEACHER_BS):
+                crops = np.stack(
+                    [np.asarray(ds[i][0]) for i in range(start, min(start + TEACHER_BS, len(ds)))]
+                )
+                # Center crop like CropPad on the validation split
+                o = (crops.shape[1] - t.size) // 2
+                crops = crops[:, o : o + t.size, o : o + t.size].transpose(0, 3, 1, 2)
+                x = torch.from_numpy((crops.astype(np.float32) / 255.0 - mean) / std)
+                logits.append(model(x).float().numpy())
+        logits = (
+            np.concatenate(logits) if logits else np.empty((0, len(t.labels)), np.float32)
+        )
+
+        tmp_path = cache_path.with_suffix(".tmp.npz")
+        np.savez(
+            tmp_path,
+            key=np.array(key),
+            sources=np.array([s for s, _, _ in infos], dtype=np.str_),
+            images=np.array([i for _, i, _ in infos], dtype=np.int32),
+            markers=np.array([m for _, _, m in infos], dtype=np.str_),
+            logits=logits,
+        )
+        tmp_path.replace(cache_path)
+        return dict(zip(infos, logits))
+
+    def learn(self, epochs: int = 20):
+        settings = self.distill
+        csv_logger = CSVLogger(fname=str(self.model_dir / "stats.csv"), append=True)
+        cbs = [
+            csv_logger,
+            DistillationCallback(
+                self._teacher_logits,
+                self._has_teacher,
+                temperature=settings["temperature"],
+                alpha=settings["alpha"],
+            ),
+        ]
+        try:
+            if self.arch_name == "tiny_cnn":
+                # Trained from scratch
+                self._learn_obj.fit_one_cycle(epochs, lr_max=settings["lr"], cbs=cbs)
+            else:
+                self._learn_obj.fine_tune(epochs, cbs=cbs)
+        except KeyboardInterrupt:
+            print("\nTraining interrupted by user. Saving current state...")
+        finally:
+            model_path = self.model_dir / "model.pth"
+            print(f"Saving model to {model_path}")
+            torch.save(self._learn_obj.model, model_path)
+
+    def compare(self) -> tuple[float, float]:
+        """Validation error of the teacher (on its crops of the same markers) and the student."""
+        valid = np.asarray(self._dls.valid.items)
+        valid = valid[self._has_teacher.numpy()[valid]]
+        vocab = list(self._dls.vocab)
+        targets = np.array([vocab.index(self._dataset[i][1]) for i in valid])
+        teacher = self._teacher_logits.numpy()[valid].argmax(axis=1)
+        teacher_error = float(np.mean(teacher != targets)) if len(valid) else 0.0
+        student_error = float(self._learn_obj.validate()[1])
+        return teacher_error, student_error
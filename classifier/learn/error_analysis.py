@@ -0,0 +1,185 @@
+import base64
+import heapq
+import html
+import io
+import itertools
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+"""
+Streaming error analysis: batches of predictions are folded into bounded
+top-k heaps of the highest losses per true class and per source (archive or
+database layout) and into confusion matrices per source, so memory does not
+grow with the split. `write_html` renders a static report with the crops of
+the worst samples embedded as thumbnails.
+"""
+
+
+class ErrorAnalysis:
+    """
+    Accumulates per-sample losses and predictions. `add` takes a batch of
+    uint8 NCHW crops, label indices, logits-derived losses and predictions,
+    and the (source, image index, marker id) of each sample.
+    """
+
+    def __init__(self, labels: list[str], top_k: int = 12):
+        self.labels = labels
+        self.top_k = top_k
+        n = len(labels)
+        self.confusion = np.zeros((n, n), dtype=np.int64)
+        self.source_confusion: dict[str, np.ndarray] = {}
+        # Min-heaps of (loss, seq, sample): the root is the first to drop
+        self.by_class: dict[int, list] = {}
+        self.by_source: dict[str, list] = {}
+        self._seq = itertools.count()
+
+    def _qualifies(self, heap: list, loss: float) -> bool:
+        return len(heap) < self.top_k or loss > heap[0][0]
+
+    def _push(self, heap: list, item: tuple):
+        if len(heap) < self.top_k:
+            heapq.heappush(heap, item)
+        elif item[0] > heap[0][0]:
+            heapq.heapreplace(heap, item)
+
+    def add(
+        self,
+        crops: np.ndarray,
+        targets: np.ndarray,
+        preds: np.ndarray,
+        losses: np.ndarray,
+        infos: list[tuple[str, int, str]],
+    ):
+        n = len(self.labels)
+        np.add.at(self.confusion, (targets, preds), 1)
+        for i, (source, img_idx, marker) in enumerate(infos):
+            source = str(source)
+            if source not in self.source_confusion:
+                self.source_confusion[source] = np.zeros((n, n), dtype=np.int64)
+            self.source_confusion[source][targets[i], preds[i]] += 1
+
+            loss = float(losses[i])
+            by_class = self.by_class.setdefault(int(targets[i]), [])
+            by_source = self.by_source.setdefault(source, [])
+            # Crops are only copied for samples that make it into a heap
+            if self._qualifies(by_class, loss) or self._qualifies(by_source, loss):
+                sample = {
+                    "source": source,
+                    "image": int(img_idx),
+                    "marker": str(marker),
+                    "target": int(targets[i]),
+                    "pred": int(preds[i]),
+                    "loss": loss,
+                    "crop": crops[i].copy(),
+                }
+                seq = next(self._seq)
+                self._push(by_class, (loss, seq, sample))
+                self._push(by_source, (loss, seq, sample))
+
+    @staticmethod
+    def worst(heap: list) -> list[dict]:
+        """Samples of a heap, highest loss first."""
+        return [sample for _, _, sample in sorted(heap, reverse=True)]
+
+    @property
+    def n_samples(self) -> int:
+        return int(self.confusion.sum())
+
+    @property
+    def n_errors(self) -> int:
+        return self.n_samples - int(np.trace(self.confusion))
+
+    def _thumbnail(self, crop: np.ndarray, size: int) -> str:
+        img = Image.fromarray(crop.transpose(1, 2, 0)).resize((size, size), Image.NEAREST)
+        buf = io.BytesIO()
+        img.save(buf, format="PNG")
+        return "data:image/png;base64," + base64.b64encode(buf.getvalue()).decode()
+
+    def _confusion_html(self, confusion: np.ndarray) -> str:
+        # Only the classes that occur, as true label or prediction
+        used = np.flatnonzero(confusion.sum(axis=0) + confusion.sum(axis=1))
+        head = "".join(f"<th>{html.escape(self.labels[j])}</th>" for j in used)
+        rows = []
+        for i in used:
+            cells = "".join(
+                f'<td class="{"ok" if i == j else "err" if confusion[i, j] else ""}">'
+                f"{confusion[i, j] or ''}</td>"
+                for j in used
+            )
+            rows.append(f"<tr><th>{html.escape(self.labels[i])}</th>{cells}</tr>")
+        return (
+            '<table class="cm"><tr><th>true \\ pred</th>'
+            f"{head}</tr>{''.join(rows)}</table>"
+        )
+
+    def _samples_html(self, samples: list[dict], thumbnail: int) -> str:
+        cards = []
+        for s in samples:
+            wrong = s["pred"] != s["target"]
+            cards.append(
+                f'<figure class="{"err" if wrong else "ok"}">'
+                f'<img src="{self._thumbnail(s["crop"], thumbnail)}">'
+                f"<figcaption>{html.escape(Path(s['source']).name)} #{s['image']}<br>"
+                f"{html.escape(s['marker'])}<br>"
+                f"{html.escape(self.labels[s['target']])} &rarr; "
+                f"{html.escape(self.labels[s['pred']])}<br>"
+                f"loss {s['loss']:.2f}</figcaption></figure>"
+            )
+        return f'<div class="grid">{"".join(cards)}</div>'
+
+    def write_html(self, path: Path, title: str, thumbnail: int = 96):
+        """Write the report, a single HTML file with the thumbnails embedded."""
+        n, errors = self.n_samples, self.n_errors
+        parts = [
+            f"<h1>{html.escape(title)}</h1>",
+            f"<p>{n} samples, {errors} errors ({errors / max(n, 1):.2%})</p>",
+            "<h2>Confusion matrix</h2>",
+            self._confusion_html(self.confusion),
+            "<h2>Sources</h2>",
+            "<table><tr><th>Source</th><th>Samples</th><th>Errors</th><th>Error rate</th></tr>",
+        ]
+        sources = sorted(
+            self.source_confusion.items(),
+            key=lambda kv: np.trace(kv[1]) / max(kv[1].sum(), 1),
+        )
+        for source, cm in sources:
+            total = int(cm.sum())
+            wrong = total - int(np.trace(cm))
+            parts.append(
+                f'<tr><td><a href="#{html.escape(source)}">{html.escape(source)}</a></td>'
+                f"<td>{total}</td><td>{wrong}</td><td>{wrong / max(total, 1):.2%}</td></tr>"
+            )
+        parts.append("</table>")
+
+        parts.append("<h2>Highest losses per class</h2>")
+        for target in sorted(self.by_class):
+            parts.append(f"<h3>{html.escape(self.labels[target])}</h3>")
+            parts.append(self._samples_html(self.worst(self.by_class[target]), thumbnail))
+
+        parts.append("<h2>Highest losses per source</h2>")
+        for source, cm in sources:
+            parts.append(f'<h3 id="{html.escape(source)}">{html.escape(source)}</h3>')
+            parts.append(self._confusion_html(cm))
+            parts.append(self._samples_html(self.worst(self.by_source[source]), thumbnail))
+
+        path.write_text(
+            "<!DOCTYPE html><html><head><meta charset=\"utf-8\">"
+            f"<title>{html.escape(title)}</title><style>{_STYLE}</style></head>"
+            f"<body>{''.join(parts)}</body></html>"
+        )
+
+
+_STYLE = """
+body { font-family: sans-serif; margin: 2em; }
+table { border-collapse: collapse; margin-bottom: 1em; }
+td, th { border: 1px solid #ccc; padding: 2px 6px; text-align: right; }
+.cm td.ok { background: #dfd; }
+.cm td.err { background: #fdd; }
+.grid { display: flex; flex-wrap: wrap; gap: 8px; }
+figure { margin: 0; padding: 4px; font-size: 11px; border: 2px solid; }
+figure.ok { border-color: #4a4; }
+figure.err { border-color: #c33; }
+img { display: block; image-rendering: pixelated; }
+"""
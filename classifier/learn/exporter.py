@@ -1,27 +1,61 @@
+import contextlib
+import hashlib
+import io
 import json
+import logging
+import os
 import shutil
 import subprocess
-import sys
+import threading
 import warnings
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import numpy as np
 import torch
 from fastai.vision.all import *  # noqa: F403
-from fastai.vision.all import CrossEntropyLossFlat, error_rate, vision_learner
+from fastai.vision.all import create_timm_model, create_vision_model, imagenet_stats
 
-from .. import B49DataLoaders, B49Dataset
 from ..data.image_transform import apply_scaling_transform
+from ..data.r49_dataloaders import B49DataLoaders
+from ..data.r49_dataset import B49Dataset
+from ..inference.predictor import (
+    DEFAULT_SESSION_OPTIONS,
+    machine_key,
+    make_session_options,
+)
+from .benchmark import (
+    benchmark_model,
+    format_benchmarks,
+    format_pruning,
+    format_startup,
+    startup_benchmark,
+)
 from .config import LearnerConfig
+from .preprocess import FrameClassifier, FusedPreprocessing
+from .qat import export_copy, finish_qdq, is_qat
 
 try:
     import onnx
     import onnxruntime as ort
     from onnxconverter_common.float16 import convert_float_to_float16
-    from onnxruntime.quantization import QuantType, quant_pre_process, quantize_dynamic
+    from onnxruntime.quantization import (
+        CalibrationDataReader,
+        CalibrationMethod,
+        QuantFormat,
+        QuantType,
+        quant_pre_process,
+        quantize_dynamic,
+        quantize_static,
+    )
+    from onnxruntime.tools.convert_onnx_models_to_ort import (
+        OptimizationStyle,
+        convert_onnx_models_to_ort,
+    )
 except ImportError as e:
-    print(f"Warning: ONNX/ORT libraries not installed. Error: {e}")
-    sys.exit(1)
+    raise ImportError(
+        f"Exporter requires onnx, onnxruntime and onnxconverter-common: {e}"
+    ) from e
 
 # Suppress truncation warnings from onnxconverter_common
 warnings.filterwarnings(
@@ -30,55 +64,243 @@ warnings.filterwarnings(
 
 KEEP_ONNX = False
 
+# Content keys of the exported files and cached benchmark/validation results,
+# in the export directory. Bump EXPORT_VERSION when the export steps change.
+EXPORT_MANIFEST = "export_manifest.json"
+EXPORT_VERSION = 1
+
+# Batch size for validation inference
+EVAL_BS = 256
+
+# Preprocessed validation crops, reused across exports while the data is unchanged
+EVAL_CACHE = "eval_cache.npz"
+
+# Pruning sweep of a model (bin/prune.py), reported in its export README
+PRUNING_FILE = "pruning.json"
+
+CALIBRATION_METHODS = {
+    "minmax": CalibrationMethod.MinMax,
+    "entropy": CalibrationMethod.Entropy,
+    "percentile": CalibrationMethod.Percentile,
+}
+
+
+class B49CalibrationReader(CalibrationDataReader):
+    """Feeds batches of normalized crops to onnxruntime calibration."""
+
+    def __init__(self, inputs: np.ndarray, input_name: str, bs: int, max_batches: int):
+        self._inputs = inputs
+        self._input_name = input_name
+        self._bs = bs
+        self._n_batches = min(max_batches, -(-len(inputs) // bs))
+        self.rewind()
+
+    def get_next(self):
+        if self._batch >= self._n_batches:
+            return None
+        start = self._batch * self._bs
+        self._batch += 1
+        return {self._input_name: self._inputs[start : start + self._bs]}
+
+    def rewind(self):
+        self._batch = 0
+
 
 class Exporter(LearnerConfig):
     def __init__(self, model_name: str):
         super().__init__(model_name)
 
-        # Load DataLoaders (needed for validation and sample input)
-        ds = B49Dataset(
-            self.data_dir.rglob("**/*.r49"),
-            dpt=self.dpt,
-            size=int(1.5 * self.size),
-            labels=self.labels,
-            image_transform=apply_scaling_transform,
-        )
-        self._dls = B49DataLoaders.from_dataset(
-            ds,
-            valid_pct=self.valid_pct,
-            crop_size=self.size,
-            bs=self.batch_size,
-            vocab=self.labels,
+        # Export only needs the model: the dataset and fastai learner are
+        # built lazily, and only if validation is requested.
+        self._device = torch.device("cpu")
+        self._dls = None
+        self._eval_data: dict[int, tuple[np.ndarray, np.ndarray]] = {}
+        self._eval_inputs: dict[tuple[int, type], np.ndarray] = {}
+        self._eval_lock = threading.Lock()
+        self._model = self._load_model()
+
+        # Quantization-aware trained: the float copy gives the FP32/FP16
+        # variants, the fake-quantized one the Int8 (QDQ) variant
+        self._qat_model = None
+        if is_qat(self._model):
+            self._qat_model = export_copy(self._model, fake_quant=True)
+            self._model = export_copy(self._model, fake_quant=False)
+
+    def _load_model(self) -> torch.nn.Module:
+        """Load model.pth, rebuilding the architecture from config.json if needed."""
+        model_path = self.model_dir / "model.pth"
+        if not model_path.exists():
+            raise FileNotFoundError(f"Model file not found at {model_path}")
+
+        print(f"Loading weights from {model_path.name}")
+        saved_model = torch.load(
+            model_path, map_location=self._device, weights_only=False
         )
+        if isinstance(saved_model, torch.nn.Module):
+            return saved_model
 
-        # Load Model
+        # State dict: recreate the same body + head vision_learner builds
         arch = self.get_architecture(self.arch_name)
-        self._learn_obj = vision_learner(
-            self._dls, arch, metrics=error_rate, loss_func=CrossEntropyLossFlat()
+        n_out = len(self.labels)
+        if isinstance(arch, str):
+            model, _ = create_timm_model(arch, n_out, pretrained=False)
+        else:
+            model = create_vision_model(arch, n_out, pretrained=False)
+        model.load_state_dict(saved_model)
+        return model
+
+    @property
+    def model(self) -> torch.nn.Module:
+        """The model loaded from model.pth."""
+        return self._model
+
+    @property
+    def dls(self):
+        """DataLoaders for validation, ingesting the dataset on first use."""
+        if self._dls is None:
+            ds = B49Dataset(
+                self.r49_files,
+                dpt=self.dpt,
+                size=int(1.5 * self.size),
+                labels=self.labels,
+                image_transform=apply_scaling_transform,
+                db=self.db,
+            )
+            # The same items as Learner, or the validation split differs
+            self._dls = B49DataLoaders.from_dataset(
+                ds,
+                valid_pct=self.valid_pct,
+                crop_size=self.size,
+                bs=self.batch_size,
+                vocab=self.labels,
+                items=self.dedup_items(ds),
+            )
+        return self._dls
+
+    def _data_key(self) -> str:
+        """Hash identifying the data files and the settings that shape the crops."""
+        h = hashlib.sha256()
+        for f in sorted(self.r49_files):
+            st = f.stat()
+            h.update(f"{f.relative_to(self.data_dir)}:{st.st_size}:{st.st_mtime_ns}".encode())
+        db = self.db
+        if db is not None:
+            for f in (db.path, db.path.with_name(db.path.name + "-wal")):
+                if f.exists():
+                    st = f.stat()
+                    h.update(f"{f}:{st.st_size}:{st.st_mtime_ns}".encode())
+        h.update(
+            json.dumps(
+                [self.dpt, self.size, self.labels, self.valid_pct, self.dedup, "info-hash split"]
+            ).encode()
         )
+        return h.hexdigest()
 
-        model_path = self.model_dir / "model.pth"
-        if model_path.exists():
-            print(f"Loading weights from {model_path.name}")
-            saved_model = torch.load(
-                model_path, map_location=self._dls.device, weights_only=False
+    def eval_data(self, ds_idx: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Clean crops (uint8 NCHW, no augmentation) and label indices of the
+        train (0) or valid (1) split. Computed once and cached in EVAL_CACHE.
+        """
+        if ds_idx in self._eval_data:
+            return self._eval_data[ds_idx]
+
+        cache_path = self.model_dir / EVAL_CACHE
+        key = self._data_key()
+        if cache_path.exists():
+            with np.load(cache_path) as cache:
+                if str(cache["key"]) == key:
+                    print(f"Using cached validation crops from {cache_path.name}")
+                    for i in (0, 1):
+                        self._eval_data[i] = (cache[f"x{i}"], cache[f"y{i}"])
+                    return self._eval_data[ds_idx]
+
+        print("Preprocessing validation crops...")
+        arrays = {"key": np.array(key)}
+        for i in (0, 1):
+            # after_batch=None removes Rotate (batch_tfms) while item_tfms (CropPad) stay.
+            dl = self.dls[i].new(
+                shuffled=False, drop_last=False, after_batch=None, bs=EVAL_BS
             )
-            if isinstance(saved_model, torch.nn.Module):
-                self._learn_obj.model = saved_model
-            else:
-                self._learn_obj.model.load_state_dict(saved_model)
-        else:
-            raise FileNotFoundError(f"Model file not found at {model_path}")
+            xs, ys = [], []
+            for imgs, labels in dl:
+                xs.append(imgs.cpu().numpy().astype(np.uint8))
+                ys.append(labels.cpu().numpy())
+            x = (
+                np.concatenate(xs)
+                if xs
+                else np.empty((0, 3, self.size, self.size), dtype=np.uint8)
+            )
+            y = np.concatenate(ys) if ys else np.empty(0, dtype=np.int64)
+            self._eval_data[i] = (x, y)
+            arrays[f"x{i}"], arrays[f"y{i}"] = x, y
+
+        tmp_path = cache_path.with_suffix(".tmp.npz")
+        np.savez(tmp_path, **arrays)
+        tmp_path.replace(cache_path)
+        return self._eval_data[ds_idx]
 
-    def export(self, output_dir: Path = None):
+    def eval_inputs(self, ds_idx: int, dtype: type = np.float32) -> np.ndarray:
+        """
+        Model inputs of a split, computed once per dtype: normalized NCHW
+        floats, or raw NHWC pixels for uint8 (fused preprocessing) models.
+        """
+        with self._eval_lock:
+            if (ds_idx, dtype) not in self._eval_inputs:
+                x, _ = self.eval_data(ds_idx)
+                if dtype == np.uint8:
+                    x = x.transpose(0, 2, 3, 1)
+                else:
+                    x = self._normalize(x).astype(dtype)
+                self._eval_inputs[(ds_idx, dtype)] = np.ascontiguousarray(x)
+            return self._eval_inputs[(ds_idx, dtype)]
+
+    def export(
+        self,
+        output_dir: Path = None,
+        validate: bool = True,
+        static_int8: bool | None = None,
+        fused_preprocessing: bool | None = None,
+        frame_model: bool | None = None,
+        optimized_model: bool | None = None,
+    ):
         """
         Exports the model to ONNX (FP32, FP16, Int8) and ORT formats.
+        With `validate=False` the dataset is never loaded.
+
+        With `static_int8` (default: config.json "quantization": {"static": true})
+        an additional statically quantized QDQ model (model_int8_static) is
+        calibrated on the validation split. This requires the dataset.
+
+        With `fused_preprocessing` (default: config.json "fused_preprocessing")
+        all variants take raw uint8 NHWC RGB patches and do the scaling,
+        normalization and transpose in the graph.
+
+        With `frame_model` (default: config.json "frame_model") a whole-frame
+        variant (frame_fp32) is exported that crops and classifies all markers
+        of a frame in one run, see `FrameClassifier`.
+
+        With `optimized_model` (default: config.json "optimized_model") each
+        variant is also shipped as model_<precision>.optimized.onnx, graph
+        optimized offline (portable ORT_ENABLE_EXTENDED level) so sessions
+        start without optimizing. model.config always gets a recommended
+        "session_options" profile and cold vs warm startup times.
+
+        Exports are incremental: export_manifest.json records a content key
+        per model (see `_artifact_keys`) and the benchmark and validation
+        results. Models whose key is unchanged are reused, the others are
+        converted to ORT format in parallel, and results are only measured
+        again for changed models, data or machine.
         """
+        quant_config = self.quantization
+        if static_int8 is None:
+            static_int8 = quant_config.get("static", False)
+        if fused_preprocessing is None:
+            fused_preprocessing = self.fused_preprocessing
+        if frame_model is None:
+            frame_model = self.frame_model
+        if optimized_model is None:
+            optimized_model = self.optimized_model
         print(f"Exporting model '{self._model_name}'...")
-        self._learn_obj.model.eval()
-
-        # Dummy input for export
-        dummy_input = torch.randn(1, 3, self.size, self.size, device=self._dls.device)
 
         # Paths
         if output_dir:
@@ -86,96 +308,258 @@ class Exporter(LearnerConfig):
         else:
             export_dir = self.model_dir / "export"
 
-        if export_dir.exists():
-            shutil.rmtree(export_dir)
-        export_dir.mkdir(parents=True, exist_ok=True)
-
         # Export both ONNX and ORT formats.
         # ONNX is the standard interchange format.
         # ORT format is optimized for ONNX Runtime (mobile/web) and is smaller/faster to load.
         onnx_path_fp32 = export_dir / "model_fp32.onnx"
         onnx_path_fp16 = export_dir / "model_fp16.onnx"
         onnx_path_int8 = export_dir / "model_int8.onnx"
+        onnx_path_int8_static = export_dir / "model_int8_static.onnx"
+        onnx_path_frame = export_dir / "frame_fp32.onnx"
 
-        # 1. Export FP32 ONNX
-        print(f"Exporting FP32 ONNX to {onnx_path_fp32.name}...")
-        torch.onnx.export(
-            self._learn_obj.model,
-            dummy_input,
-            onnx_path_fp32,
-            export_params=True,
-            opset_version=14,  # Reverting to 14 as 17 might be too high for some backends, and legacy exporter works well with 11-14
-            do_constant_folding=True,
-            input_names=["input"],
-            output_names=["output"],
-            dynamic_axes={"input": {0: "batch_size"}, "output": {0: "batch_size"}},
-            dynamo=False,
+        # Artifacts whose content key is unchanged are reused, stale ones removed
+        manifest = self._load_manifest(export_dir)
+        if manifest is None and export_dir.exists():
+            shutil.rmtree(export_dir)  # exported without a manifest
+        export_dir.mkdir(parents=True, exist_ok=True)
+        keys = self._artifact_keys(
+            static_int8, fused_preprocessing, frame_model, optimized_model
         )
+        artifacts = {
+            stem: {"key": key, "files": self._artifact_files(stem, optimized_model)}
+            for stem, key in keys.items()
+        }
+        previous = manifest["artifacts"] if manifest else {}
+        reused = {
+            stem
+            for stem, artifact in artifacts.items()
+            if previous.get(stem, {}).get("key") == artifact["key"]
+            and all((export_dir / f).exists() for f in artifact["files"])
+        }
+        keep = {f for stem in reused for f in artifacts[stem]["files"]}
+        for artifact in previous.values():
+            for f in artifact["files"]:
+                if f not in keep:
+                    (export_dir / f).unlink(missing_ok=True)
+        todo = [stem for stem in artifacts if stem not in reused]
+        if reused:
+            print(f"Unchanged, reusing: {', '.join(sorted(reused))}")
+
+        # 1. Export FP32 ONNX, the source of the FP16 and (dynamic, static) Int8 models
+        dynamic_int8 = "model_int8" in todo and self._qat_model is None
+        if dynamic_int8 or {"model_fp32", "model_fp16", "model_int8_static"} & set(todo):
+            model = self._model.to(self._device).eval()
+
+            # Dummy input for export
+            if fused_preprocessing:
+                mean, std = self._norm_stats()
+                model = FusedPreprocessing(model, mean, std).eval()
+                dummy_input = torch.randint(
+                    0, 256, (1, self.size, self.size, 3), dtype=torch.uint8
+                )
+            else:
+                dummy_input = torch.randn(
+                    1, 3, self.size, self.size, device=self._device
+                )
+
+            print(f"Exporting FP32 ONNX to {onnx_path_fp32.name}...")
+            torch.onnx.export(
+                model,
+                dummy_input,
+                onnx_path_fp32,
+                export_params=True,
+                opset_version=14,  # Reverting to 14 as 17 might be too high for some backends, and legacy exporter works well with 11-14
+                do_constant_folding=True,
+                input_names=["input"],
+                output_names=["output"],
+                dynamic_axes={"input": {0: "batch_size"}, "output": {0: "batch_size"}},
+                dynamo=False,
+            )
+
+        # 1b. Whole-frame model
+        if "frame_fp32" in todo:
+            self._export_frame_model(onnx_path_frame)
 
         # Convert to FP16
-        print(f"Converting to FP16 ONNX at {onnx_path_fp16.name}...")
-        model_fp32 = onnx.load(str(onnx_path_fp32))
-        model_fp16 = convert_float_to_float16(model_fp32)
-        onnx.save(model_fp16, str(onnx_path_fp16))
+        if "model_fp16" in todo:
+            print(f"Converting to FP16 ONNX at {onnx_path_fp16.name}...")
+            model_fp32 = onnx.load(str(onnx_path_fp32))
+            # Keep the uint8 -> float Cast of fused preprocessing in float32,
+            # the converter would otherwise retarget its output type only.
+            float_casts = [
+                node.name
+                for node in model_fp32.graph.node
+                if node.op_type == "Cast"
+                and any(
+                    a.name == "to" and a.i == onnx.TensorProto.FLOAT
+                    for a in node.attribute
+                )
+            ]
+            model_fp16 = convert_float_to_float16(model_fp32, node_block_list=float_casts)
+            onnx.save(model_fp16, str(onnx_path_fp16))
 
         # 3. Quantize to Int8
-        print(f"Quantizing to Int8 ONNX at {onnx_path_int8.name}...")
-        # Note: Dynamic quantization usually keeps first/last layers as float if they are sensitive operations
-        # but pure fully connected or conv layers might be quantized.
-        # For vision models, static quantization is often better but requires calibration data.
-        # Here we use dynamic for simplicity as requested.
-        # Run pre-processing before quantization for better results
-        onnx_path_pre = export_dir / "model_pre.onnx"
-        quant_pre_process(str(onnx_path_fp32), str(onnx_path_pre))
-
-        quantize_dynamic(
-            model_input=onnx_path_pre,
-            model_output=onnx_path_int8,
-            weight_type=QuantType.QUInt8,
-        )
-
-        # Cleanup intermediate pre-processed file
-        if onnx_path_pre.exists():
-            onnx_path_pre.unlink()
+        if self._qat_model is not None and "model_int8" in todo:
+            self._export_qat(onnx_path_int8, fused_preprocessing)
+        if dynamic_int8 or "model_int8_static" in todo:
+            # Run pre-processing before quantization for better results
+            onnx_path_pre = export_dir / "model_pre.onnx"
+            quant_pre_process(str(onnx_path_fp32), str(onnx_path_pre))
+
+            if dynamic_int8:
+                print(f"Quantizing to Int8 ONNX at {onnx_path_int8.name}...")
+                # Note: Dynamic quantization usually keeps first/last layers as float if they are sensitive operations
+                # but pure fully connected or conv layers might be quantized.
+                # For vision models, static quantization is often better but requires calibration data,
+                # see the optional static QDQ variant below.
+                quantize_dynamic(
+                    model_input=onnx_path_pre,
+                    model_output=onnx_path_int8,
+                    weight_type=QuantType.QUInt8,
+                )
+
+            # 3b. Static QDQ quantization calibrated on real crops
+            if "model_int8_static" in todo:
+                self._quantize_static(onnx_path_pre, onnx_path_int8_static, quant_config)
+
+            # Cleanup intermediate pre-processed file
+            if onnx_path_pre.exists():
+                onnx_path_pre.unlink()
+
+        # 3c. Offline graph optimization, before the ONNX files are converted
+        onnx_todo = [export_dir / f"{stem}.onnx" for stem in todo]
+        if optimized_model:
+            print("Optimizing ONNX models offline...")
+            for onnx_file in onnx_todo:
+                if onnx_file != onnx_path_frame:
+                    self._optimize_offline(onnx_file)
 
         # 4. Convert to ORT format
-        print("Converting ONNX models to ORT format...")
-        for onnx_file in [onnx_path_fp32, onnx_path_fp16, onnx_path_int8]:
-            if onnx_file.exists():
-                self._convert_to_ort(onnx_file)
+        if onnx_todo:
+            print("Converting ONNX models to ORT format...")
+            self._convert_all_to_ort(onnx_todo)
+        if not KEEP_ONNX and "model_fp32" not in todo:
+            # Only exported to derive the other variants
+            onnx_path_fp32.unlink(missing_ok=True)
 
         # 5. Validation
-        print("\n=== Validation Results ===")
+        results = {}  # benchmark and validation results by key, for the manifest
+        cached = manifest["results"] if manifest else {}
+
+        def result_key(parts: list) -> str:
+            return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+        def result(parts: list, compute):
+            """Result cached by a previous export, or computed."""
+            key = result_key(parts)
+            value = cached.get(key)
+            if value is None:
+                value = compute()
+            if value is not None:
+                results[key] = value
+            return value
+
         metrics = {
-            "train_samples": len(self._dls.train_ds),
-            "valid_samples": len(self._dls.valid_ds),
             "results": {},
             "error_rates": {},
-            "sizes_mb": {},
+            "sizes_mb": {
+                "PyTorch (FP32)": (self.model_dir / "model.pth").stat().st_size
+                / (1024 * 1024)
+            },
         }
-
-        pytorch_res = self.validate(self._learn_obj.model, "PyTorch (FP32)")
-        metrics["results"]["PyTorch (FP32)"] = pytorch_res
-        metrics["error_rates"]["PyTorch (FP32)"] = pytorch_res["valid_err"]
-        metrics["sizes_mb"]["PyTorch (FP32)"] = (
-            self.model_dir / "model.pth"
-        ).stat().st_size / (1024 * 1024)
-
-        ort_path_fp32 = onnx_path_fp32.with_suffix(".ort")
-        ort_path_fp16 = onnx_path_fp16.with_suffix(".ort")
-        ort_path_int8 = onnx_path_int8.with_suffix(".ort")
-
-        for ort_path, variant in [
-            (ort_path_fp32, "ORT (FP32)"),
-            (ort_path_fp16, "ORT (FP16)"),
-            (ort_path_int8, "ORT (Int8)"),
+        ort_variants = [
+            (onnx_path_fp32.with_suffix(".ort"), "ORT (FP32)"),
+            (onnx_path_fp16.with_suffix(".ort"), "ORT (FP16)"),
+            (onnx_path_int8.with_suffix(".ort"), "ORT (Int8)"),
+            (onnx_path_int8_static.with_suffix(".ort"), "ORT (Int8 static)"),
+        ]
+        for ort_path, variant in ort_variants + [
+            (onnx_path_frame.with_suffix(".ort"), "ORT frame (FP32)")
         ]:
-            res = self.validate_onnx(ort_path, variant)
-            if res:
-                metrics["results"][variant] = res
-                metrics["error_rates"][variant] = res["valid_err"]
+            if ort_path.exists():
                 metrics["sizes_mb"][variant] = ort_path.stat().st_size / (1024 * 1024)
 
+        # Latency and throughput (synthetic input, no dataset needed)
+        print("\n=== Benchmarks ===")
+        machine = machine_key()
+        profile = result(
+            ["session_profile", keys["model_fp32"], self.session_options, self.markers_per_layout, machine],
+            lambda: self.session_profile(onnx_path_fp32.with_suffix(".ort")),
+        )
+        metrics["session_options"] = profile
+        print(f"Session options: {profile}")
+        metrics["benchmarks"] = {}
+        metrics["startup"] = {}
+        for ort_path, variant in ort_variants:
+            if ort_path.exists():
+                key = keys[ort_path.stem]
+                bench = result(
+                    ["benchmark", key, self.benchmark_batch_sizes, profile, machine],
+                    lambda: benchmark_model(
+                        ort_path,
+                        self.size,
+                        self.benchmark_batch_sizes,
+                        sess_options=make_session_options(profile),
+                    ),
+                )
+                metrics["benchmarks"][variant] = bench
+                startup = result(
+                    ["startup", key, profile, machine],
+                    lambda: startup_benchmark(
+                        ort_path,
+                        self.size,
+                        profile,
+                        optimized_path=ort_path.with_suffix(".optimized.onnx"),
+                    ),
+                )
+                metrics["startup"][variant] = startup
+                b1 = bench["batches"]["1"]
+                print(
+                    f"[{variant}] session {bench['session_ms']:.1f} ms, "
+                    f"bs=1 p50/p99 {b1['p50_ms']:.2f}/{b1['p99_ms']:.2f} ms, "
+                    f"startup cold/warm {startup['cold_ms']:.1f}/{startup['warm_ms']:.1f} ms"
+                )
+
+        if validate:
+            print("\n=== Validation Results ===")
+            data_key = self._data_key()
+            samples = result(
+                ["samples", data_key],
+                lambda: [len(self.eval_data(0)[1]), len(self.eval_data(1)[1])],
+            )
+            metrics["train_samples"], metrics["valid_samples"] = samples
+
+            pytorch_res = result(
+                ["validation", keys["model_fp32"], "pytorch", data_key],
+                lambda: self.validate(self._model, "PyTorch (FP32)"),
+            )
+            if result_key(["validation", keys["model_fp32"], "pytorch", data_key]) in cached:
+                print(f"[PyTorch (FP32)] Valid Error: {pytorch_res['valid_err']:.4f} (unchanged)")
+            metrics["results"]["PyTorch (FP32)"] = pytorch_res
+            metrics["error_rates"]["PyTorch (FP32)"] = pytorch_res["valid_err"]
+
+            # Variants not validated before run concurrently
+            validation_keys = {
+                variant: ["validation", keys[path.stem], data_key]
+                for path, variant in ort_variants
+                if path.exists()
+            }
+            validated = self.validate_onnx_all(
+                [
+                    (path, variant)
+                    for path, variant in ort_variants
+                    if variant in validation_keys
+                    and result_key(validation_keys[variant]) not in cached
+                ]
+            )
+            for variant, parts in validation_keys.items():
+                res = result(parts, lambda: validated.get(variant))
+                if res:
+                    if variant not in validated:
+                        print(f"[{variant}] Valid Error: {res['valid_err']:.4f} (unchanged)")
+                    metrics["results"][variant] = res
+                    metrics["error_rates"][variant] = res["valid_err"]
+
         # 6. Copy config.json to export directory and update with results
         config_src = self.model_dir / "config.json"
         config_dst = export_dir / "model.config"
@@ -185,11 +569,32 @@ class Exporter(LearnerConfig):
                 config_data = json.load(f)
 
             # Update with error rates
-            config_data["metrics"] = {
-                "train_samples": metrics["train_samples"],
-                "valid_samples": metrics["valid_samples"],
-                "error_rates": metrics["results"],
+            if validate:
+                config_data["metrics"] = {
+                    "train_samples": metrics["train_samples"],
+                    "valid_samples": metrics["valid_samples"],
+                    "error_rates": metrics["results"],
+                }
+                precision = self.recommend_precision(metrics)
+                if precision:
+                    config_data["recommended_precision"] = precision
+            config_data["benchmarks"] = metrics["benchmarks"]
+            config_data["session_options"] = metrics["session_options"]
+            config_data["startup"] = metrics["startup"]
+            optimized = {
+                f.name.split(".")[0].removeprefix("model_"): f.name
+                for f in sorted(export_dir.glob("model_*.optimized.onnx"))
             }
+            if optimized:
+                config_data["optimized_models"] = optimized
+            config_data["input_format"] = (
+                "uint8_nhwc" if fused_preprocessing else "float_nchw"
+            )
+            config_data["int8_quantization"] = (
+                "qat" if self._qat_model is not None else "dynamic"
+            )
+            if onnx_path_frame.with_suffix(".ort").exists():
+                config_data["frame_model"] = onnx_path_frame.with_suffix(".ort").name
 
             with open(config_dst, "w") as f:
                 json.dump(config_data, f, indent=2)
@@ -200,186 +605,487 @@ class Exporter(LearnerConfig):
         print(f"Writing {readme_path.name}")
         readme_path.write_text(notes_str)
 
+        with open(export_dir / EXPORT_MANIFEST, "w") as f:
+            json.dump({"artifacts": artifacts, "results": results}, f, indent=2)
+
         return metrics
 
-    def _convert_to_ort(self, onnx_path: Path):
+    def _load_manifest(self, export_dir: Path) -> dict | None:
+        manifest_path = export_dir / EXPORT_MANIFEST
+        if not manifest_path.exists():
+            return None
+        try:
+            with open(manifest_path) as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def _artifact_keys(
+        self,
+        static_int8: bool,
+        fused_preprocessing: bool,
+        frame_model: bool,
+        optimized_model: bool,
+    ) -> dict[str, str]:
         """
-        Converts an ONNX file to ORT format with runtime optimizations.
-        Renames the output to replace the original extension with .ort and .config,
-        keeping the optimized versions and removing intermediates.
+        Content key of each exported model (by file stem): a hash of the
+        weights, the config that shapes its graph and the exporter settings.
+        Changing e.g. the benchmark settings or the README leaves all keys
+        unchanged, changing the quantization settings only the static one.
         """
-        # We expect the tool to generate:
-        # [stem].with_runtime_opt.ort
-        # [stem].required_operators.with_runtime_opt.config
+        h = hashlib.sha256()
+        with open(self.model_dir / "model.pth", "rb") as f:
+            h.update(hashlib.file_digest(f, "sha256").digest())
+        mean, std = self._norm_stats()
+        h.update(
+            json.dumps(
+                [
+                    EXPORT_VERSION,
+                    torch.__version__,
+                    onnx.__version__,
+                    ort.__version__,
+                    KEEP_ONNX,
+                    self.size,
+                    self.labels,
+                    list(mean),
+                    list(std),
+                ]
+            ).encode()
+        )
+        weights = h.hexdigest()
 
-        # We want to rename them to:
-        # [stem].ort
-        # [stem]_operators.config
+        def key(*parts) -> str:
+            return hashlib.sha256(json.dumps([weights, *parts]).encode()).hexdigest()
 
-        # Use subprocess to call the tool
-        cmd = [
-            sys.executable,
-            "-m",
-            "onnxruntime.tools.convert_onnx_models_to_ort",
-            str(onnx_path),
-        ]
+        graph = [fused_preprocessing, optimized_model]
+        keys = {
+            "model_fp32": key("fp32", *graph),
+            "model_fp16": key("fp16", *graph),
+            "model_int8": key("int8", *graph),
+        }
+        if static_int8:
+            # Calibrated on the validation crops
+            keys["model_int8_static"] = key(
+                "int8_static", *graph, self.quantization, self._data_key()
+            )
+        if frame_model:
+            keys["frame_fp32"] = key("frame", self.dpt)
+        return keys
+
+    def _artifact_files(self, stem: str, optimized_model: bool) -> list[str]:
+        """Files the export of the model `stem` leaves in the export directory."""
+        files = [f"{stem}.ort", f"{stem}_operators.config"]
+        if optimized_model and stem.startswith("model_"):
+            files.append(f"{stem}.optimized.onnx")
+        if KEEP_ONNX:
+            files.append(f"{stem}.onnx")
+        return files
 
+    def _optimize_offline(self, onnx_path: Path):
+        """
+        Save the graph-optimized model as <stem>.optimized.onnx. ORT_ENABLE_EXTENDED
+        is the highest level that is not specific to the CPU it runs on, so
+        the model can be loaded with optimizations disabled anywhere.
+        """
+        optimized_path = onnx_path.with_suffix(".optimized.onnx")
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED
+        options.optimized_model_filepath = str(optimized_path)
+        ort.InferenceSession(
+            str(onnx_path), sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        print(f"  Saved {optimized_path.name}")
+
+    def session_profile(self, model_path: Path) -> dict:
+        """
+        Recommended SessionOptions profile for Python inference: the defaults,
+        with the intra-op thread count that is fastest (within 5%, fewest
+        threads) at one layout's worth of markers, and config.json
+        "session_options" on top.
+        """
+        profile = {**DEFAULT_SESSION_OPTIONS, **self.session_options}
+        if "intra_op_num_threads" in self.session_options or not model_path.exists():
+            return profile
+
+        bs = self.markers_per_layout
+        cpus = os.cpu_count() or 1
+        latencies = {}
+        for n in sorted({1, 2, 4, cpus} & set(range(1, cpus + 1))):
+            bench = benchmark_model(
+                model_path,
+                self.size,
+                [bs],
+                warmup=3,
+                runs=20,
+                max_seconds=0.3,
+                sess_options=make_session_options(profile, intra_op_num_threads=n),
+            )
+            latencies[n] = bench["batches"][str(bs)]["p50_ms"]
+        fastest = min(latencies.values())
+        profile["intra_op_num_threads"] = min(
+            n for n, ms in latencies.items() if ms <= 1.05 * fastest
+        )
+        return profile
+
+    def frame_classifier(self) -> FrameClassifier:
+        """The loaded model wrapped to classify all markers of a frame at once."""
+        mean, std = self._norm_stats()
+        model = self._model.to(self._device).eval()
+        return FrameClassifier(model, self.size, self.dpt, mean, std).eval()
+
+    def _export_frame_model(self, onnx_path: Path):
+        """
+        Export the whole-frame model: uint8 NHWC frame [1, H, W, 3], marker
+        centers [N, 2] and the frame's dots per track [1] -> logits [N, C].
+        """
+        print(f"Exporting whole-frame ONNX to {onnx_path.name}...")
+        model = self.frame_classifier()
+        h, w = 4 * self.size, 6 * self.size
+        dummy_inputs = (
+            torch.randint(0, 256, (1, h, w, 3), dtype=torch.uint8),
+            torch.tensor([[w / 4, h / 2], [w / 2, h / 2]], dtype=torch.float32),
+            torch.tensor([float(self.dpt)]),
+        )
+        torch.onnx.export(
+            model,
+            dummy_inputs,
+            onnx_path,
+            export_params=True,
+            opset_version=16,  # RoiAlign with half_pixel coordinates
+            do_constant_folding=True,
+            input_names=["frame", "centers", "img_dpt"],
+            output_names=["output"],
+            dynamic_axes={
+                "frame": {1: "height", 2: "width"},
+                "centers": {0: "n_markers"},
+                "output": {0: "n_markers"},
+            },
+            dynamo=False,
+        )
+
+    def _export_qat(self, onnx_path: Path, fused_preprocessing: bool):
+        """
+        Export the quantization-aware trained model as Int8: its fake
+        quantization becomes QuantizeLinear/DequantizeLinear pairs with the
+        trained ranges, fused into int8 kernels (QLinearConv, ...).
+        """
+        print(f"Exporting QAT Int8 QDQ ONNX to {onnx_path.name}...")
+        model = self._qat_model.to(self._device).eval()
+        if fused_preprocessing:
+            mean, std = self._norm_stats()
+            model = FusedPreprocessing(model, mean, std).eval()
+            dummy_input = torch.randint(
+                0, 256, (1, self.size, self.size, 3), dtype=torch.uint8
+            )
+        else:
+            dummy_input = torch.randn(1, 3, self.size, self.size, device=self._device)
+        torch.onnx.export(
+            model,
+            dummy_input,
+            onnx_path,
+            export_params=True,
+            opset_version=14,  # per-channel QuantizeLinear needs 13
+            do_constant_folding=True,
+            input_names=["input"],
+            output_names=["output"],
+            dynamic_axes={"input": {0: "batch_size"}, "output": {0: "batch_size"}},
+            dynamo=False,
+        )
+        model_qdq = onnx.load(str(onnx_path))
+        finish_qdq(model_qdq)
+        onnx.save(model_qdq, str(onnx_path))
+        # Fuse the QDQ pairs into QLinearConv etc. now: the runtime
+        # optimizations saved with the ORT format fail to replay for QDQ
+        # graphs, unfused the model runs in float with extra (de)quantization
+        self._optimize_offline(onnx_path)
+        onnx_path.with_suffix(".optimized.onnx").replace(onnx_path)
+
+    def _quantize_static(self, model_input: Path, model_output: Path, options: dict):
+        """
+        Static int8 quantization in QDQ format.
+        Weights (optionally per channel) and activations are quantized ahead of
+        time using ranges calibrated on batches of the validation split.
+        """
+        method = options.get("calibrate_method", "minmax").lower()
+        per_channel = options.get("per_channel", True)
+        max_batches = options.get("calibration_batches", 16)
+        print(
+            f"Quantizing to static Int8 QDQ at {model_output.name} "
+            f"(calibration: {method}, per_channel: {per_channel})..."
+        )
+
+        # Clean validation crops, without augmentation
+        input_type = onnx.load(str(model_input)).graph.input[0].type.tensor_type
+        dtype = np.uint8 if input_type.elem_type == onnx.TensorProto.UINT8 else np.float32
+        reader = B49CalibrationReader(
+            self.eval_inputs(1, dtype), "input", self.batch_size, max_batches
+        )
+
+        quantize_static(
+            model_input=model_input,
+            model_output=model_output,
+            calibration_data_reader=reader,
+            quant_format=QuantFormat.QDQ,
+            per_channel=per_channel,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            calibrate_method=CALIBRATION_METHODS[method],
+        )
+
+    def _norm_stats(self) -> tuple[list[float], list[float]]:
+        """Normalization mean and std; vision_learner trains with imagenet stats by default."""
+        norm = self.config.get("normalization")
+        return (norm["mean"], norm["std"]) if norm else imagenet_stats
+
+    def _normalize(self, imgs_np: np.ndarray) -> np.ndarray:
+        """Scale a NCHW batch to float32 [0, 1] and apply config normalization."""
+        # Ensure float32 and scale if uint8
+        if imgs_np.dtype == np.uint8:
+            imgs_np = imgs_np.astype(np.float32) / 255.0
+        elif imgs_np.dtype != np.float32:
+            imgs_np = imgs_np.astype(np.float32)
+
+        # Apply normalization
+        mean, std = self._norm_stats()
+        mean = np.array(mean, dtype=np.float32).reshape(1, 3, 1, 1)
+        std = np.array(std, dtype=np.float32).reshape(1, 3, 1, 1)
+        return (imgs_np - mean) / std
+
+    def _convert_to_ort(self, onnx_path: Path) -> str | None:
+        """
+        Converts an ONNX file to ORT format with runtime optimizations, as
+        <stem>.ort and the operators it needs as <stem>_operators.config.
+        Runs in-process; returns the error if the conversion failed.
+        """
         try:
-            # excessive output can be annoying, capturing it
-            _ = subprocess.run(cmd, check=True, capture_output=True)
-        except subprocess.CalledProcessError as e:
-            print(f"Failed to convert {onnx_path} to ORT: {e}")
-            if e.stderr:
-                print(f"Error output: {e.stderr.decode()}")
-            return
+            convert_onnx_models_to_ort(
+                onnx_path, optimization_styles=[OptimizationStyle.Runtime]
+            )
+        except Exception as e:
+            return f"Failed to convert {onnx_path} to ORT: {e}"
 
-        # Define expected generated filenames
+        # The tool writes [stem].with_runtime_opt.ort and
+        # [stem].required_operators.with_runtime_opt.config
         generated_ort = onnx_path.with_name(f"{onnx_path.stem}.with_runtime_opt.ort")
         generated_config = onnx_path.with_name(
             f"{onnx_path.stem}.required_operators.with_runtime_opt.config"
         )
-
-        # Define target filenames
         target_ort = onnx_path.with_suffix(".ort")
         target_config = onnx_path.with_name(f"{onnx_path.stem}_operators.config")
-
-        # Move/Rename optimized ORT file
-        if generated_ort.exists():
-            shutil.move(str(generated_ort), str(target_ort))
-        else:
-            print(f"Warning: Expected optimized file {generated_ort} not found.")
-
-        # Move/Rename config file
+        if not generated_ort.exists():
+            return f"Expected optimized file {generated_ort} not found."
+        shutil.move(str(generated_ort), str(target_ort))
         if generated_config.exists():
             shutil.move(str(generated_config), str(target_config))
-        else:
-            print(f"Warning: Expected config file {generated_config} not found.")
-
-        # Cleanup: Remove the unoptimized .ort file if it exists (generated by the tool by default)
-        # Note: shutil.move overwrites, so unopt_ort (same path as target_ort) is effectively replaced.
-
-        # Let's clean up the unoptimized config
-        unopt_config = onnx_path.with_name(
-            f"{onnx_path.stem}.required_operators.config"
-        )
-        if unopt_config.exists():
-            unopt_config.unlink()
 
-        # Finally, remove the .onnx file after conversion as requested
+        # Finally, remove the .onnx file after conversion
         if not KEEP_ONNX and onnx_path.exists():
-            print(f"  Removing {onnx_path.name}")
             onnx_path.unlink()
+        return None
 
-        print(f"  Finished ORT conversion for {onnx_path.stem}")
+    def _convert_all_to_ort(self, onnx_paths: list[Path]):
+        """
+        Convert ONNX files to ORT format concurrently; onnxruntime optimizes
+        and serializes without holding the GIL. The converter's chatty output
+        is dropped, errors are reported.
+        """
+        logging.getLogger("ort_format_model.utils").setLevel(logging.WARNING)
+        with (
+            contextlib.redirect_stdout(io.StringIO()),
+            ThreadPoolExecutor(max_workers=len(onnx_paths)) as pool,
+        ):
+            errors = list(pool.map(self._convert_to_ort, onnx_paths))
+        for onnx_path, error in zip(onnx_paths, errors):
+            if error:
+                print(error)
+            else:
+                print(f"  Finished ORT conversion for {onnx_path.stem}")
 
     def validate(self, model, name: str):
-        # Validate PyTorch model
-        # Using fastai's validate is easiest for PyTorch
+        # Validate PyTorch model on the same cached crops as the ORT variants
         print(f"Validating {name}...")
-        # Validation set (ds_idx=1)
-        res_valid = self._learn_obj.validate(ds_idx=1)
-        # Training set (ds_idx=0)
-        res_train = self._learn_obj.validate(ds_idx=0)
-
-        valid_loss, valid_err = res_valid[:2]
-        train_loss, train_err = res_train[:2]
-
-        print(f"[{name}] Train Error: {train_err:.4f}, Valid Error: {valid_err:.4f}")
-        return {
-            "train_err": float(train_err),
-            "valid_err": float(valid_err),
-            "train_loss": float(train_loss),
-            "valid_loss": float(valid_loss),
-        }
+        model = model.to(self._device).eval()
+        results = {}
+        for ds_idx, ds_name in [(0, "train"), (1, "valid")]:
+            x = self.eval_inputs(ds_idx)
+            _, y = self.eval_data(ds_idx)
+            loss, errors = 0.0, 0
+            with torch.no_grad():
+                for start in range(0, len(y), EVAL_BS):
+                    xb = torch.from_numpy(x[start : start + EVAL_BS]).to(self._device)
+                    yb = torch.from_numpy(y[start : start + EVAL_BS]).to(self._device)
+                    logits = model(xb)
+                    loss += torch.nn.functional.cross_entropy(
+                        logits, yb, reduction="sum"
+                    ).item()
+                    errors += (logits.argmax(dim=1) != yb).sum().item()
+            n = max(len(y), 1)
+            results[f"{ds_name}_err"] = errors / n
+            results[f"{ds_name}_loss"] = loss / n
+
+        print(
+            f"[{name}] Train Error: {results['train_err']:.4f}, "
+            f"Valid Error: {results['valid_err']:.4f}"
+        )
+        return results
 
-    def validate_onnx(self, model_path: Path, name: str):
+    def validate_onnx_all(self, variants: list[tuple[Path, str]]) -> dict[str, dict]:
+        """
+        Validate several ORT models concurrently, splitting the CPU cores
+        between them.
+        """
+        variants = [(path, name) for path, name in variants if path.exists()]
+        if not variants:
+            return {}
+        # Preprocess once, before the threads start
+        for ds_idx in (0, 1):
+            self.eval_inputs(ds_idx)
+        cpus = os.cpu_count() or 1
+        workers = min(len(variants), cpus)
+        threads = max(1, cpus // workers)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                name: pool.submit(self.validate_onnx, path, name, threads)
+                for path, name in variants
+            }
+        return {name: future.result() for name, future in futures.items()}
+
+    def validate_onnx(self, model_path: Path, name: str, intra_op_threads: int = 0):
         if not model_path.exists():
             print(f"[{name}] Skipped (file not found)")
             return None
 
         print(f"Validating {name}...")
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads
         session = ort.InferenceSession(
-            str(model_path), providers=["CPUExecutionProvider"]
+            str(model_path), sess_options=options, providers=["CPUExecutionProvider"]
         )
         input_info = session.get_inputs()[0]
-        input_name = input_info.name
-        input_type = input_info.type
+        output_info = session.get_outputs()[0]
 
         # Check if model expects float16
-        is_fp16 = "float16" in input_type
-
-        # Get normalization parameters from config
-        norm = self.config.get("normalization")
-        if norm:
-            mean = np.array(norm["mean"], dtype=np.float32).reshape(1, 3, 1, 1)
-            std = np.array(norm["std"], dtype=np.float32).reshape(1, 3, 1, 1)
+        if "uint8" in input_info.type:
+            input_dtype = np.uint8
+        elif "float16" in input_info.type:
+            input_dtype = np.float16
         else:
-            mean, std = None, None
-
-        results = {}
-        for ds_idx in [0, 1]:
-            ds_name = "train" if ds_idx == 0 else "valid"
-            # Get clean loader without augmentation
-            # after_batch=None removes Rotate (batch_tfms) while item_tfms (CropPad) stay.
-            dl = self._dls[ds_idx].new(
-                shuffled=False, drop_last=False, after_batch=None
-            )
+            input_dtype = np.float32
+        output_dtype = np.float16 if "float16" in output_info.type else np.float32
 
-            correct = 0
-            total = 0
-            for batch in dl:
-                imgs, labels = batch
-                imgs_np = imgs.cpu().numpy()
-
-                # Ensure float32 and scale if uint8
-                if imgs_np.dtype == np.uint8:
-                    imgs_np = imgs_np.astype(np.float32) / 255.0
-                elif imgs_np.dtype != np.float32:
-                    imgs_np = imgs_np.astype(np.float32)
-
-                # Apply normalization if available
-                if mean is not None:
-                    imgs_np = (imgs_np - mean) / std
-
-                # Run inference
-                try:
-                    if is_fp16:
-                        imgs_np = imgs_np.astype(np.float16)
-
-                    outputs = session.run(None, {input_name: imgs_np})
-                    preds = outputs[0]
-                    # cast predictions to float32 for argmax if needed
-                    pred_idxs = np.argmax(preds.astype(np.float32), axis=1)
-
-                    correct += (pred_idxs == labels.cpu().numpy()).sum()
-                    total += len(labels)
-                except Exception as e:
-                    print(f"Error during inference: {e}")
-                    break
-
-            err = 1.0 - (correct / total if total > 0 else 0)
-            results[f"{ds_name}_err"] = float(err)
-            print(f"[{name}] {ds_name.capitalize()} Error Rate: {err:.4f}")
+        # Bind inputs and a reused output buffer directly, avoiding per-run copies
+        binding = session.io_binding()
+        out = np.empty((EVAL_BS, len(self.labels)), dtype=output_dtype)
 
+        results = {}
+        for ds_idx, ds_name in [(0, "train"), (1, "valid")]:
+            x = self.eval_inputs(ds_idx, input_dtype)
+            _, y = self.eval_data(ds_idx)
+            pred_idxs = np.empty(len(y), dtype=np.int64)
+            for start in range(0, len(y), EVAL_BS):
+                xb = x[start : start + EVAL_BS]
+                ob = out[: len(xb)]
+                binding.bind_cpu_input(input_info.name, xb)
+                binding.bind_output(
+                    output_info.name, "cpu", 0, output_dtype, ob.shape, ob.ctypes.data
+                )
+                session.run_with_iobinding(binding)
+                pred_idxs[start : start + len(xb)] = ob.argmax(axis=1)
+
+            err = float((pred_idxs != y).mean()) if len(y) else 0.0
+            results[f"{ds_name}_err"] = err
+
+        # Single print per variant, validations run in parallel
+        print(
+            f"[{name}] Train Error Rate: {results['train_err']:.4f}, "
+            f"Valid Error Rate: {results['valid_err']:.4f}"
+        )
         return results
 
+    def recommend_precision(self, metrics: dict, tolerance: float = 0.005) -> str | None:
+        """
+        Fastest precision (at one layout's worth of markers) whose validation
+        error is within `tolerance` of the FP32 model.
+        """
+        baseline = metrics["error_rates"].get("ORT (FP32)")
+        if baseline is None:
+            return None
+        bs = str(self.markers_per_layout)
+        best, best_ms = None, float("inf")
+        for variant, precision in [
+            ("ORT (FP32)", "fp32"),
+            ("ORT (FP16)", "fp16"),
+            ("ORT (Int8)", "int8"),
+        ]:
+            err = metrics["error_rates"].get(variant)
+            bench = metrics["benchmarks"].get(variant)
+            if err is None or bench is None or err > baseline + tolerance:
+                continue
+            ms = bench["batches"][bs]["p50_ms"]
+            if ms < best_ms:
+                best, best_ms = precision, ms
+        return best
+
+    def summary(self, metrics: dict) -> dict:
+        """Validation error, size and p50 latency (bs=1, one layout) of FP32 and Int8."""
+        bs = str(self.markers_per_layout)
+        summary = {}
+        for variant, precision in [("ORT (FP32)", "fp32"), ("ORT (Int8)", "int8")]:
+            bench = metrics["benchmarks"].get(variant)
+            if bench is None:
+                continue
+            summary[precision] = {
+                "valid_err": metrics["error_rates"].get(variant),
+                "size_mb": metrics["sizes_mb"][variant],
+                "p50_ms": bench["batches"]["1"]["p50_ms"],
+                "p50_ms_layout": bench["batches"][bs]["p50_ms"],
+            }
+        return summary
+
     def get_notes(self, metrics: dict) -> str:
         """
         Generates markdown notes for the exported model based on provided metrics.
         """
         notes = [f"# {self._model_name} Exported Model\n"]
-        notes.append("| Model | Error Rate | Size (MB) |")
-        notes.append("| --- | --- | --- |")
+        notes.append("| Model | Error Rate | Size (MB) | Latency bs=1 p50 (ms) |")
+        notes.append("| --- | --- | --- | --- |")
 
         # Sort model names for consistent output
-        for model in sorted(metrics["error_rates"].keys()):
-            err = metrics["error_rates"][model]
-            size = metrics["sizes_mb"].get(model, 0)
-            notes.append(f"| {model} | {err:.2%} | {size:.2f} |")
+        for model in sorted(metrics["sizes_mb"].keys()):
+            err = metrics["error_rates"].get(model)
+            err_str = f"{err:.2%}" if err is not None else "n/a"
+            size = metrics["sizes_mb"][model]
+            bench = metrics.get("benchmarks", {}).get(model)
+            latency_str = f"{bench['batches']['1']['p50_ms']:.2f}" if bench else "n/a"
+            notes.append(f"| {model} | {err_str} | {size:.2f} | {latency_str} |")
+
+        if metrics.get("benchmarks"):
+            notes.append("\n**Benchmarks (CPU, steady state):**\n")
+            notes.extend(format_benchmarks(metrics["benchmarks"]))
+
+        if metrics.get("startup"):
+            notes.append("\n**Session startup (creation + first run):**\n")
+            notes.extend(format_startup(metrics["startup"]))
+
+        pruning_path = self.model_dir / PRUNING_FILE
+        if pruning_path.exists() and metrics.get("benchmarks"):
+            with open(pruning_path, "r") as f:
+                pruning = json.load(f)
+            base = {"model": self._model_name, "ratio": 0.0, **pruning["source"]}
+            notes.append("\n**Structured pruning (bin/prune.py):**\n")
+            notes.extend(
+                format_pruning(
+                    [base | self.summary(metrics), *pruning["pruned"]],
+                    self.markers_per_layout,
+                )
+            )
 
         notes.append("\n**Dataset Info:**")
-        notes.append(f"- Training Samples: {metrics['train_samples']}")
-        notes.append(f"- Validation Samples: {metrics['valid_samples']}")
+        if "train_samples" in metrics:
+            notes.append(f"- Training Samples: {metrics['train_samples']}")
+            notes.append(f"- Validation Samples: {metrics['valid_samples']}")
+        else:
+            notes.append("- Not validated")
         notes.append(f"- Labels: {', '.join(self.labels)}")
 
         return "\n".join(notes)
@@ -395,6 +1101,8 @@ class Exporter(LearnerConfig):
 
         if KEEP_ONNX:
             files_to_upload += list(export_dir.glob("*.onnx"))
+        else:
+            files_to_upload += list(export_dir.glob("*.optimized.onnx"))
 
         # Include model.config if it exists in export dir
         model_config_path = export_dir / "model.config"
@@ -0,0 +1,82 @@
+import numpy as np
+import torch.nn.functional as F
+from fastai.callback.core import Callback
+
+from ..data.sampler import HardExampleDL
+
+
+class HardExampleCallback(Callback):
+    """
+    Track a running per-sample loss on the training split and resample.
+
+    After every epoch the sampling weights of `HardExampleDL` are set
+    proportional to the exponential moving average of each sample's loss,
+    boosted for samples misclassified the last time they were seen.
+    `floor` is the share of probability mass spread uniformly over all
+    samples so that easy crops stay in rotation (floor=1 is uniform), and
+    `max_ratio` caps any sample at that multiple of the mean loss so a few
+    mislabeled crops cannot take over the epoch.
+    """
+
+    order = 60  # after Recorder has seen the loss
+
+    def __init__(
+        self,
+        floor: float = 0.2,
+        boost: float = 2.0,
+        alpha: float = 0.5,
+        max_ratio: float = 10.0,
+    ):
+        self.floor, self.boost, self.alpha = floor, boost, alpha
+        self.max_ratio = max_ratio
+        self.loss_ema: np.ndarray | None = None
+        self.misclassified: np.ndarray | None = None
+
+    def before_fit(self):
+        if not isinstance(self.dls.train, HardExampleDL):
+            raise ValueError(
+                "HardExampleCallback requires B49DataLoaders(hard_examples=True)"
+            )
+        n = len(self.dls.train.dataset)
+        self._items = self.dls.train.items
+        if self.loss_ema is None or len(self.loss_ema) != n:
+            self.loss_ema = np.full(n, np.nan, dtype=np.float32)
+            self.misclassified = np.zeros(n, dtype=bool)
+
+    def after_loss(self):
+        if not self.training:
+            return
+        positions = self.dls.train.batch_positions(self.iter)
+        if len(positions) != len(self.pred):
+            return
+        targ = self.yb[0]
+        losses = F.cross_entropy(self.pred.detach(), targ, reduction="none")
+        losses = losses.float().cpu().numpy()
+        wrong = (self.pred.detach().argmax(dim=1) != targ).cpu().numpy()
+        prev = self.loss_ema[positions]
+        self.loss_ema[positions] = np.where(
+            np.isnan(prev), losses, self.alpha * losses + (1 - self.alpha) * prev
+        )
+        self.misclassified[positions] = wrong
+
+    def after_epoch(self):
+        self.dls.train.wgts = self.weights()
+
+    def weights(self) -> np.ndarray:
+        """Sampling probabilities for the next epoch."""
+        n = len(self.loss_ema)
+        seen = ~np.isnan(self.loss_ema)
+        if not seen.any():
+            return np.full(n, 1.0 / n)
+        # Samples not drawn yet are treated as average difficulty
+        loss = np.where(seen, self.loss_ema, self.loss_ema[seen].mean())
+        w = loss * np.where(self.misclassified, self.boost, 1.0)
+        w = np.minimum(w, self.max_ratio * w.mean())
+        total = w.sum()
+        w = w / total if total > 0 else np.full(n, 1.0 / n)
+        return self.floor / n + (1 - self.floor) * w
+
+    def hardest(self, n: int = 10) -> list[tuple[int, float]]:
+        """(dataset index, running loss) of the `n` hardest training samples."""
+        loss = np.nan_to_num(self.loss_ema, nan=-1.0)
+        return [(self._items[p], float(loss[p])) for p in np.argsort(-loss)[:n]]
@@ -1,7 +1,11 @@
+import json
 import math
+import random
+from pathlib import Path
 
 import matplotlib.patches as patches
 import matplotlib.pyplot as plt
+import numpy as np
 import torch
 from fastai.vision.all import *  # noqa: F403  # pyright: ignore[reportAssignmentType]
 from fastai.vision.all import (
@@ -9,36 +13,83 @@ from fastai.vision.all import (
     CrossEntropyLossFlat,
     CSVLogger,
     DataLoaders,
+    IntToFloatTensor,
+    Normalize,
     error_rate,
     vision_learner,
 )
 
-from .. import B49DataLoaders, B49Dataset
 from ..data.image_transform import apply_scaling_transform
+from ..data.r49_dataloaders import B49DataLoaders
+from ..data.r49_dataset import B49Dataset
 from .config import LearnerConfig
+from .error_analysis import ErrorAnalysis
+from .hard_examples import HardExampleCallback
+from .qat import QATCallback, is_qat, prepare_qat
+from .telemetry import TelemetryCallback
 
 VALID_PCT = 0.25
 
+# Data sources (archives, database layouts) the saved model was trained on
+SOURCES_FILE = "trained_sources.json"
+
 
 class Learner(LearnerConfig):
-    def __init__(self, model_name: str, dls: DataLoaders | None = None):
+    def __init__(
+        self,
+        model_name: str,
+        dls: DataLoaders | None = None,
+        hard_examples: bool = False,
+        incremental: bool = False,
+        qat: bool = False,
+    ):
+        """
+        With `incremental` only the archives and database layouts that are new
+        or changed since model.pth was trained are ingested, mixed with a
+        random replay sample of the others, see `learn_incremental`.
+
+        With `qat` (or "qat" in config.json) the last epochs of `learn` train
+        with fake quantization, for an accurate Int8 export.
+        """
         super().__init__(model_name)
+        self._qat = qat or "qat" in self.config
+
+        # Loss-driven sampling, settings from config.json "hard_examples"
+        he_config = self.hard_examples
+        if hard_examples and he_config is None:
+            he_config = {}
+        self._hard_examples = he_config
+
+        # Data sources and their fingerprints
+        r49_files, db = self.r49_files, self.db
+        self._sources = self._fingerprints(r49_files, db)
+        self._new_sources: list[str] | None = None
+        if incremental:
+            r49_files, db = self._incremental_sources(r49_files, db)
 
         # Dataset
         ds = B49Dataset(
-            self.data_dir.rglob("**/*.r49"),
+            r49_files,
             dpt=self.dpt,
             size=int(1.5 * self.size),
             labels=self.labels,
             image_transform=apply_scaling_transform,
+            db=db,
         )
         self._dataset = ds  # Save dataset for lookup in show_results
+
+        # Drop near-duplicate crops, settings from config.json "dedup"
+        items = self.dedup_items(ds)
+
         self._dls = B49DataLoaders.from_dataset(
             ds,
             valid_pct=VALID_PCT,
             crop_size=self.size,
             bs=self.batch_size,
             vocab=self.labels,
+            hard_examples=he_config is not None,
+            epoch_pct=(he_config or {}).get("epoch_pct", 1.0),
+            items=items,
         )
 
         # Create learner
@@ -59,20 +110,116 @@ class Learner(LearnerConfig):
                     model_path, map_location=self._dls.device, weights_only=False
                 )
                 if isinstance(saved_model, torch.nn.Module):
-                    self._learn_obj.model = saved_model
+                    self._set_model(saved_model)
                 else:
                     self._learn_obj.model.load_state_dict(saved_model)
             except Exception as e:
                 print(f"Warning: Failed to load saved model parameters: {e}")
 
-    # TODO: catch keyboard interrupt and save model
-    def learn(self, epochs: int = 20):
+    def _set_model(self, model: torch.nn.Module):
+        """Replace the model; the optimizer is rebuilt for its parameters on the next fit."""
+        self._learn_obj.model = model.to(self._dls.device)
+        self._learn_obj.opt = None
+        if is_qat(model):
+            # FX graph modules have no body/head to split
+            self._learn_obj.splitter = lambda m: [list(m.parameters())]
+
+    def _fingerprints(self, r49_files: list[Path], db) -> dict[str, str]:
+        """Source key -> fingerprint: archive path -> size:mtime, db:<layout id> -> hash."""
+        sources = {}
+        for f in r49_files:
+            st = f.stat()
+            sources[f.relative_to(self.data_dir).as_posix()] = (
+                f"{st.st_size}:{st.st_mtime_ns}"
+            )
+        if db is not None:
+            for manifest in db.manifests():
+                sources[f"db:{manifest.layout_id}"] = manifest.fingerprint
+        return sources
+
+    def _trained_sources(self) -> dict[str, str]:
+        path = self.model_dir / SOURCES_FILE
+        if path.exists():
+            with open(path, "r") as f:
+                return json.load(f)
+        # Trained before sources were recorded: archives changed after the model are new
+        mtime_ns = (self.model_dir / "model.pth").stat().st_mtime_ns
+        return {
+            key: fp
+            for key, fp in self._sources.items()
+            if key.startswith("db:") or int(fp.split(":")[1]) <= mtime_ns
+        }
+
+    def _save_sources(self, sources: dict[str, str]):
+        with open(self.model_dir / SOURCES_FILE, "w") as f:
+            json.dump(sources, f, indent=2, sort_keys=True)
+
+    def _incremental_sources(self, r49_files: list[Path], db):
+        """New or changed sources plus a random replay sample of the trained ones."""
+        if not (self.model_dir / "model.pth").exists():
+            raise ValueError(f"Incremental training needs a trained {self.model_dir / 'model.pth'}.")
+        trained = self._trained_sources()
+        new = [key for key, fp in self._sources.items() if trained.get(key) != fp]
+        if not new:
+            raise ValueError("No new or changed data since the last training.")
+        old = [key for key in self._sources if key not in new]
+        n_replay = min(len(old), math.ceil(self.incremental["replay"] * len(new)))
+        replay = random.Random(42).sample(old, n_replay)
+        print(
+            f"Incremental: {len(new)} new or changed sources, "
+            f"replaying {n_replay} of {len(old)}"
+        )
+        self._new_sources = new
+        selected = set(new) | set(replay)
+        r49_files = [
+            f for f in r49_files if f.relative_to(self.data_dir).as_posix() in selected
+        ]
+        if db is not None:
+            db = db.filter(lambda m: f"db:{m.layout_id}" in selected)
+        return r49_files, db
+
+    def _callbacks(
+        self, telemetry: bool, profile_steps: tuple[int, int] | None
+    ) -> tuple[list, HardExampleCallback | None]:
         # Setup CSV Logger
         csv_logger = CSVLogger(fname=str(self.model_dir / "stats.csv"), append=True)
+        cbs = [csv_logger]
+
+        hard_example_cb = None
+        if self._hard_examples is not None:
+            hard_example_cb = HardExampleCallback(
+                floor=self._hard_examples.get("floor", 0.2),
+                boost=self._hard_examples.get("boost", 2.0),
+                max_ratio=self._hard_examples.get("max_ratio", 10.0),
+            )
+            cbs.append(hard_example_cb)
+
+        # Throughput and data-stall telemetry, written next to stats.csv
+        if telemetry or profile_steps:
+            cbs.append(
+                TelemetryCallback(
+                    self.model_dir / "telemetry.csv", profile_steps=profile_steps
+                )
+            )
+        return cbs, hard_example_cb
+
+    # TODO: catch keyboard interrupt and save model
+    def learn(
+        self,
+        epochs: int = 20,
+        telemetry: bool = False,
+        profile_steps: tuple[int, int] | None = None,
+    ):
+        if self._new_sources is not None:
+            raise ValueError("Learner was created with incremental=True, use learn_incremental.")
+        cbs, hard_example_cb = self._callbacks(telemetry, profile_steps)
 
         try:
             # Fine tune
-            self._learn_obj.fine_tune(epochs, cbs=[csv_logger])
+            if self._qat:
+                self._learn_qat(epochs, cbs)
+            else:
+                self._learn_obj.fine_tune(epochs, cbs=cbs)
         except KeyboardInterrupt:
             print("\nTraining interrupted by user. Saving current state...")
         finally:
@@ -80,6 +227,79 @@ class Learner(LearnerConfig):
             model_path = self.model_dir / "model.pth"
             print(f"Saving model to {model_path}")
             torch.save(self._learn_obj.model, model_path)
+            self._save_sources(self._sources)
+
+        self._print_hardest(hard_example_cb)
+
+    def _learn_qat(self, epochs: int, cbs: list):
+        """
+        fine_tune whose last "epochs" (config.json "qat") train with fake
+        quantization inserted; all epochs if model.pth already is a QAT model.
+        """
+        settings = self.qat
+        qat_epochs = epochs
+        if not is_qat(self._learn_obj.model):
+            qat_epochs = min(settings["epochs"], epochs)
+            if epochs > qat_epochs:
+                self._learn_obj.fine_tune(epochs - qat_epochs, cbs=cbs)
+            print(f"Quantization-aware training for {qat_epochs} epochs")
+            example = torch.randn(1, 3, self.size, self.size, device=self._dls.device)
+            self._set_model(prepare_qat(self._learn_obj.model, example))
+        self._learn_obj.unfreeze()
+        self._learn_obj.fit_one_cycle(
+            qat_epochs,
+            lr_max=settings["lr"],
+            cbs=cbs + [QATCallback(settings["freeze_epochs"])],
+        )
+
+    def learn_incremental(
+        self,
+        epochs: int | None = None,
+        telemetry: bool = False,
+        profile_steps: tuple[int, int] | None = None,
+    ) -> bool:
+        """
+        Short fine-tune of the loaded model on the new data and the replay
+        sample (settings from config.json "incremental"). model.pth is only
+        replaced if the validation error on this data does not increase by
+        more than "tolerance"; returns whether it was.
+        """
+        if self._new_sources is None:
+            raise ValueError("Learner was not created with incremental=True.")
+        settings = self.incremental
+        epochs = epochs or settings["epochs"]
+        cbs, hard_example_cb = self._callbacks(telemetry, profile_steps)
+
+        baseline = float(self._learn_obj.validate()[1])
+        state = {k: v.detach().clone() for k, v in self._learn_obj.model.state_dict().items()}
+        print(f"Validation error before: {baseline:.4f}")
+
+        self._learn_obj.unfreeze()
+        self._learn_obj.fit_one_cycle(epochs, lr_max=settings["lr"], cbs=cbs)
+        error = float(self._learn_obj.validate()[1])
+        print(f"Validation error after: {error:.4f}")
+
+        if error > baseline + settings["tolerance"]:
+            print("Validation error regressed, keeping the previous model.")
+            self._learn_obj.model.load_state_dict(state)
+            return False
+
+        trained = self._trained_sources()
+        model_path = self.model_dir / "model.pth"
+        print(f"Saving model to {model_path}")
+        torch.save(self._learn_obj.model, model_path)
+        self._save_sources(
+            trained | {key: self._sources[key] for key in self._new_sources}
+        )
+        self._print_hardest(hard_example_cb)
+        return True
+
+    def _print_hardest(self, hard_example_cb: HardExampleCallback | None):
+        if hard_example_cb is not None and hard_example_cb.loss_ema is not None:
+            print("Hardest training samples:")
+            for idx, loss in hard_example_cb.hardest(10):
+                filename, img_idx, label_id = self._dataset.get_info(idx)
+                print(f"  {loss:6.3f}  {filename} #{img_idx} {label_id}")
 
     def show_results(self, N=12, ds_idx=1):
         """
@@ -159,3 +379,60 @@ class Learner(LearnerConfig):
 
         plt.tight_layout()
         plt.show()
+
+    def analyze_errors(self, ds_idx: int = 1, top_k: int | None = None) -> Path:
+        """
+        Stream the training (ds_idx=0) or validation (ds_idx=1) split through
+        the model in batches, without augmentation, and write the error
+        report (settings from config.json "error_analysis") to
+        errors_<split>.html in the model directory. Only the highest-loss
+        crops per class and per source are kept, see `ErrorAnalysis`.
+        """
+        settings = self.error_analysis
+        labels = list(self._dls.vocab)
+        analysis = ErrorAnalysis(labels, top_k=top_k or settings["top_k"])
+        # Raw uint8 crops, scaled and normalized like the batches but not rotated
+        dl = self._dls[ds_idx].new(shuffle=False, drop_last=False, after_batch=None)
+        tfms = [
+            t
+            for t in self._dls.valid.after_batch.fs
+            if isinstance(t, (IntToFloatTensor, Normalize))
+        ]
+        # Dataset index of each sample, in batch order
+        items = [dl.items[i] for i in dl.get_idxs()]
+        model = self._learn_obj.model.eval()
+        start = 0
+        with torch.inference_mode():
+            for raw, targets in dl:
+                xb, yb = raw, targets
+                for t in tfms:
+                    xb = t(xb)
+                # Plain tensors, fastai's subclasses have no cross_entropy
+                logits = model(xb).as_subclass(torch.Tensor).float()
+                yb = yb.as_subclass(torch.Tensor)
+                losses = torch.nn.functional.cross_entropy(logits, yb, reduction="none")
+                infos = [
+                    self._dataset.get_info(items[i])
+                    for i in range(start, start + len(raw))
+                ]
+                analysis.add(
+                    raw.cpu().numpy().astype(np.uint8),
+                    yb.cpu().numpy(),
+                    logits.argmax(dim=1).cpu().numpy(),
+                    losses.cpu().numpy(),
+                    infos,
+                )
+                start += len(raw)
+
+        split = "valid" if ds_idx == 1 else "train"
+        report_path = self.model_dir / f"errors_{split}.html"
+        print(
+            f"{split}: {analysis.n_samples} samples, {analysis.n_errors} errors, "
+            f"writing {report_path}"
+        )
+        analysis.write_html(
+            report_path,
+            f"{self._model_name}: {split} errors",
+            thumbnail=settings["thumbnail"],
+        )
+        return report_path
@@ -0,0 +1,80 @@
+import torch
+from torch import nn
+from torchvision.ops import roi_align
+
+
+class FusedPreprocessing(nn.Module):
+    """
+    Wraps a model so that it takes raw uint8 NHWC (RGB) pixel buffers.
+
+    The cast, 0-255 -> 0-1 scaling, mean/std normalization and HWC -> CHW
+    transpose happen inside the graph; scaling and normalization are folded
+    into a single multiply-add.
+    """
+
+    def __init__(self, model: nn.Module, mean: list[float], std: list[float]):
+        super().__init__()
+        self.model = model
+        mean_t = torch.tensor(mean, dtype=torch.float32).view(1, 3, 1, 1)
+        std_t = torch.tensor(std, dtype=torch.float32).view(1, 3, 1, 1)
+        # (x / 255 - mean) / std == x * scale + bias
+        self.register_buffer("scale", 1.0 / (255.0 * std_t))
+        self.register_buffer("bias", -mean_t / std_t)
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        x = x.permute(0, 3, 1, 2).float()
+        return self.model(x * self.scale + self.bias)
+
+
+class FrameClassifier(nn.Module):
+    """
+    Classifies all markers of a frame in one run.
+
+    Inputs are a uint8 NHWC (RGB) frame `[1, H, W, 3]`, marker centers
+    `[N, 2]` (x, y) in frame pixels and the frame's dots per track `[1]`.
+    Each patch covers `size * img_dpt / dpt` frame pixels around its center
+    and is resampled to `size` x `size` with RoiAlign, like the browser's
+    `Classifier.patch` draws it onto a canvas. Pixel centers are at +0.5
+    (aligned=True), so at `img_dpt == dpt` an integer center yields exactly
+    the pixels of the `B49File` crop. Samples more than one pixel outside the
+    frame are black; RoiAlign clamps those within one pixel to the edge.
+
+    Returns logits `[N, n_classes]`.
+    """
+
+    def __init__(
+        self, model: nn.Module, size: int, dpt: float, mean: list[float], std: list[float]
+    ):
+        super().__init__()
+        self.model = model
+        self.size = size
+        self.dpt = float(dpt)
+        mean_t = torch.tensor(mean, dtype=torch.float32).view(1, 3, 1, 1)
+        std_t = torch.tensor(std, dtype=torch.float32).view(1, 3, 1, 1)
+        self.register_buffer("scale", 1.0 / (255.0 * std_t))
+        self.register_buffer("bias", -mean_t / std_t)
+
+    def patches(
+        self, frame: torch.Tensor, centers: torch.Tensor, img_dpt: torch.Tensor
+    ) -> torch.Tensor:
+        """Float NCHW patches (0-255, not normalized) at `centers`."""
+        frame = frame.permute(0, 3, 1, 2).float()
+        half = 0.5 * self.size * img_dpt.float().reshape(1, 1) / self.dpt
+        centers = centers.float()
+        boxes = torch.cat(
+            [torch.zeros_like(centers[:, :1]), centers - half, centers + half], dim=1
+        )
+        return roi_align(
+            frame,
+            boxes,
+            output_size=self.size,
+            spatial_scale=1.0,
+            sampling_ratio=0,  # adaptive: averages when downscaling
+            aligned=True,
+        )
+
+    def forward(
+        self, frame: torch.Tensor, centers: torch.Tensor, img_dpt: torch.Tensor
+    ) -> torch.Tensor:
+        x = self.patches(frame, centers, img_dpt)
+        return self.model(x * self.scale + self.bias)
@@ -0,0 +1,129 @@
+import copy
+import json
+import shutil
+
+import torch
+
+from .config import MODELS_DIR
+from .learner import Learner
+
+try:
+    import torch_pruning as tp
+except ImportError as e:
+    raise ImportError(f"Pruning requires torch-pruning: {e}") from e
+
+# Channel ranking criteria, config.json "pruning": {"importance": ...}
+IMPORTANCES = {
+    "magnitude": lambda: tp.importance.GroupMagnitudeImportance(p=2),
+    "taylor": lambda: tp.importance.GroupTaylorImportance(),
+    "bn": lambda: tp.importance.BNScaleImportance(),
+}
+
+
+class Pruner(Learner):
+    """
+    Structured pruning of a trained model (settings from config.json
+    "pruning"): whole conv channels are ranked by importance and removed,
+    shrinking the layers and every layer that depends on them, then the
+    model is fine-tuned briefly to recover accuracy. Each `prune` starts
+    from the trained model.pth, so several ratios can be compared.
+    """
+
+    def __init__(self, model_name: str):
+        super().__init__(model_name)
+        if not (self.model_dir / "model.pth").exists():
+            raise ValueError(f"Pruning needs a trained {self.model_dir / 'model.pth'}.")
+        self._trained = copy.deepcopy(self._learn_obj.model)
+        self._example = torch.randn(1, 3, self.size, self.size, device=self._dls.device)
+
+    def complexity(self, model: torch.nn.Module | None = None) -> dict:
+        """MACs and parameters of one crop."""
+        model = (model or self._learn_obj.model).eval()
+        macs, params = tp.utils.count_ops_and_params(model, self._example)
+        return {"macs": int(macs), "params": int(params)}
+
+    def validate(self) -> float:
+        return float(self._learn_obj.validate()[1])
+
+    def baseline(self) -> dict:
+        """Complexity and validation error of the trained model."""
+        self._learn_obj.model = copy.deepcopy(self._trained)
+        return {**self.complexity(), "valid_err": self.validate()}
+
+    def _taylor_gradients(self, n_batches: int):
+        """Accumulate the loss gradients GroupTaylorImportance ranks by."""
+        model = self._learn_obj.model.train()
+        model.zero_grad()
+        for i, (xb, yb) in enumerate(self._dls.train):
+            if i >= n_batches:
+                break
+            self._learn_obj.loss_func(model(xb), yb).backward()
+
+    def prune(self, ratio: float, epochs: int | None = None) -> dict:
+        """
+        Remove `ratio` of the channels of every prunable layer of the trained
+        model (the classifier output is kept) in "steps" rounds, fine-tuning
+        for `epochs` (default "epochs") after each. Returns the complexity
+        and validation error of the pruned model.
+        """
+        settings = self.pruning
+        epochs = epochs or settings["epochs"]
+        steps = settings["steps"]
+        model = self._learn_obj.model = copy.deepcopy(self._trained)
+
+        output = [m for m in model.modules() if isinstance(m, torch.nn.Linear)][-1]
+        pruner = tp.pruner.MetaPruner(
+            model,
+            self._example,
+            importance=IMPORTANCES[settings["importance"]](),
+            pruning_ratio=ratio,
+            iterative_steps=steps,
+            round_to=settings["round_to"],
+            ignored_layers=[output],
+        )
+        for step in range(steps):
+            if settings["importance"] == "taylor":
+                self._taylor_gradients(settings["taylor_batches"])
+            pruner.step()
+            model.zero_grad()
+            result = self.complexity()
+            print(
+                f"Pruned to {ratio:.0%} ({step + 1}/{steps}): "
+                f"{result['macs'] / 1e6:.1f} MMACs, {result['params'] / 1e6:.2f} M params"
+            )
+            # Parameters were replaced, the optimizer is rebuilt for them
+            self._learn_obj.opt = None
+            self._learn_obj.unfreeze()
+            self._learn_obj.fit_one_cycle(epochs, lr_max=settings["lr"])
+
+        return {"ratio": ratio, **self.complexity(), "valid_err": self.validate()}
+
+    def save(self, model_name: str, result: dict):
+        """
+        Save the pruned model as a new model directory `model_name`: the
+        source config.json with its "model" architecture and a "pruned"
+        entry, and the pruned module as model.pth, which Exporter loads
+        unchanged.
+        """
+        model_dir = MODELS_DIR / model_name
+        model_dir.mkdir(parents=True, exist_ok=True)
+        config = {
+            **self.config,
+            # The source may rely on its directory name for the architecture
+            "model": self.arch_name,
+            "pruned": {
+                "source": self._model_name,
+                "importance": self.pruning["importance"],
+                **result,
+            },
+        }
+        config.pop("pruning", None)
+        with open(model_dir / "config.json", "w") as f:
+            json.dump(config, f, indent=2)
+        # Validation crops are keyed by the data, shared with the source
+        eval_cache = self.model_dir / "eval_cache.npz"
+        if eval_cache.exists():
+            shutil.copy2(eval_cache, model_dir / eval_cache.name)
+        model_path = model_dir / "model.pth"
+        print(f"Saving model to {model_path}")
+        torch.save(self._learn_obj.model, model_path)
@@ -0,0 +1,229 @@
+import copy
+
+import numpy as np
+import onnx
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+from fastai.callback.core import Callback
+from onnx import numpy_helper
+from torch.ao.nn.intrinsic import qat as nniqat
+from torch.ao.quantization import (
+    FakeQuantize,
+    FakeQuantizeBase,
+    FusedMovingAvgObsFakeQuantize,
+    MovingAverageMinMaxObserver,
+    MovingAveragePerChannelMinMaxObserver,
+    QConfig,
+    QConfigMapping,
+    disable_fake_quant,
+    disable_observer,
+    enable_fake_quant,
+    get_default_qat_qconfig_mapping,
+)
+from torch.ao.quantization.quantize_fx import prepare_qat_fx
+from torch.nn.utils.fusion import fuse_conv_bn_weights
+
+"""
+Quantization-aware training: fake quantization is inserted with FX graph
+mode (`prepare_qat`), the model learns weights that survive int8 rounding,
+and `export_copy` turns it into a graph torch.onnx exports as QDQ
+(QuantizeLinear/DequantizeLinear) that onnxruntime runs with int8 kernels.
+
+Ranges match the static QDQ export: activations uint8 per tensor, weights
+int8 symmetric per output channel.
+"""
+
+QAT_QCONFIG = QConfig(
+    activation=FakeQuantize.with_args(
+        observer=MovingAverageMinMaxObserver,
+        quant_min=0,
+        quant_max=255,
+        dtype=torch.quint8,
+    ),
+    weight=FakeQuantize.with_args(
+        observer=MovingAveragePerChannelMinMaxObserver,
+        quant_min=-128,
+        quant_max=127,
+        dtype=torch.qint8,
+        qscheme=torch.per_channel_symmetric,
+    ),
+)
+
+
+def qconfig_mapping() -> QConfigMapping:
+    """
+    The x86 QAT mapping with plain FakeQuantize in place of the fused
+    observer op, which torch.onnx cannot export. Fixed-range ops (sigmoid,
+    hardsigmoid, ...) keep their fixed qparams.
+    """
+    mapping = get_default_qat_qconfig_mapping("x86").set_global(QAT_QCONFIG)
+    for op, qconfig in list(mapping.object_type_qconfigs.items()):
+        if qconfig is not None and isinstance(
+            qconfig.activation(), FusedMovingAvgObsFakeQuantize
+        ):
+            mapping.set_object_type(op, QAT_QCONFIG)
+    return mapping
+
+
+def is_qat(model: nn.Module) -> bool:
+    return any(isinstance(m, FakeQuantizeBase) for m in model.modules())
+
+
+def prepare_qat(model: nn.Module, example: torch.Tensor) -> nn.Module:
+    """Fuse conv-bn(-relu) and insert fake quantization for training."""
+    model = prepare_qat_fx(model.train(), qconfig_mapping(), (example,))
+    # The qconfig factories are local functions and would break torch.save
+    for m in model.modules():
+        if hasattr(m, "qconfig"):
+            del m.qconfig
+    model.meta.clear()
+    return model
+
+
+class QATCallback(Callback):
+    """
+    Freeze the quantization ranges (observers) and the batch norm statistics
+    for the last epochs of QAT, so the final epochs train against the ranges
+    and folded weights that are exported.
+    """
+
+    def __init__(self, freeze_epochs: int = 1):
+        self.freeze_epochs = freeze_epochs
+
+    def before_epoch(self):
+        if self.epoch >= self.n_epoch - self.freeze_epochs:
+            self.model.apply(disable_observer)
+            self.model.apply(nniqat.freeze_bn_stats)
+
+
+class _FakeQuantConv2d(nn.Module):
+    """Conv with folded batch norm, its weight fake quantized (QDQ in ONNX)."""
+
+    def __init__(self, conv: nn.Conv2d, weight_fake_quant: nn.Module, relu: bool):
+        super().__init__()
+        self.conv = conv
+        self.weight_fake_quant = weight_fake_quant
+        self.relu = relu
+
+    def forward(self, x):
+        x = self.conv._conv_forward(x, self.weight_fake_quant(self.conv.weight), self.conv.bias)
+        return F.relu(x) if self.relu else x
+
+
+def _fold_bn(model: nn.Module):
+    """Replace fused QAT conv-bn(-relu) modules by convs with the bn folded in."""
+    for name, m in list(model.named_modules()):
+        if not isinstance(m, (nniqat.ConvBn2d, nniqat.ConvBnReLU2d)):
+            continue
+        weight, bias = fuse_conv_bn_weights(
+            m.weight,
+            m.bias,
+            m.bn.running_mean,
+            m.bn.running_var,
+            m.bn.eps,
+            m.bn.weight,
+            m.bn.bias,
+        )
+        conv = nn.Conv2d(
+            m.in_channels,
+            m.out_channels,
+            m.kernel_size,
+            stride=m.stride,
+            padding=m.padding,
+            dilation=m.dilation,
+            groups=m.groups,
+            padding_mode=m.padding_mode,
+        )
+        conv.weight, conv.bias = weight, bias
+        folded = _FakeQuantConv2d(
+            conv, m.weight_fake_quant, relu=isinstance(m, nniqat.ConvBnReLU2d)
+        )
+        parent, _, attr = name.rpartition(".")
+        setattr(model.get_submodule(parent), attr, folded)
+
+
+def export_copy(model: nn.Module, fake_quant: bool) -> nn.Module:
+    """
+    Inference copy of a QAT model with frozen ranges and folded batch norms:
+    with `fake_quant` it exports as a QDQ int8 graph, without as float.
+    """
+    model = copy.deepcopy(model).eval()
+    model.apply(disable_observer)
+    _fold_bn(model)
+    model.apply(enable_fake_quant if fake_quant else disable_fake_quant)
+    return model
+
+
+def finish_qdq(model: onnx.ModelProto):
+    """
+    Bring the exported QDQ graph into the form onnxruntime's quantization
+    tools produce: per-tensor scales and zero points as scalars (torch.onnx
+    exports shape [1], which blocks the fusion into int8 kernels) and conv
+    biases quantized to int32 at input scale * weight scale (left float,
+    onnxruntime inserts them itself and then fails to save the ORT format).
+    """
+    graph = model.graph
+    initializers = {t.name: t for t in graph.initializer}
+    constants = {
+        n.output[0]: a.t
+        for n in graph.node
+        if n.op_type == "Constant"
+        for a in n.attribute
+        if a.name == "value"
+    }
+
+    def tensor(name: str):
+        return initializers.get(name) or constants.get(name)
+
+    for node in graph.node:
+        if node.op_type not in ("QuantizeLinear", "DequantizeLinear"):
+            continue
+        for name in node.input[1:3]:
+            t = tensor(name)
+            if t is not None and list(t.dims) == [1]:
+                value = numpy_helper.to_array(t).reshape(())
+                t.CopyFrom(numpy_helper.from_array(value, t.name))
+
+    producers = {o: n for n in graph.node for o in n.output}
+    bias_nodes = []
+    for node in graph.node:
+        if node.op_type != "Conv" or len(node.input) < 3:
+            continue
+        x_dq, w_dq = producers.get(node.input[0]), producers.get(node.input[1])
+        bias = initializers.get(node.input[2])
+        if (
+            bias is None
+            or x_dq is None
+            or w_dq is None
+            or x_dq.op_type != "DequantizeLinear"
+            or w_dq.op_type != "DequantizeLinear"
+        ):
+            continue
+        x_scale = numpy_helper.to_array(tensor(x_dq.input[1])).astype(np.float32)
+        w_scale = numpy_helper.to_array(tensor(w_dq.input[1])).astype(np.float32)
+        scale = (x_scale * w_scale).reshape(-1)
+        b = numpy_helper.to_array(bias)
+        q = np.round(b / scale).astype(np.int32)
+        name = node.input[2]
+        graph.initializer.extend(
+            [
+                numpy_helper.from_array(q, f"{name}_quantized"),
+                numpy_helper.from_array(scale, f"{name}_scale"),
+                numpy_helper.from_array(np.zeros_like(q), f"{name}_zero_point"),
+            ]
+        )
+        bias_nodes.append(
+            onnx.helper.make_node(
+                "DequantizeLinear",
+                [f"{name}_quantized", f"{name}_scale", f"{name}_zero_point"],
+                [f"{name}_dequantized"],
+                name=f"{name}_DequantizeLinear",
+                axis=0,
+            )
+        )
+        node.input[2] = f"{name}_dequantized"
+        graph.initializer.remove(bias)
+    # Inputs are initializers only, so they can go first
+    for node in reversed(bias_nodes):
+        graph.node.insert(0, node)
@@ -0,0 +1,161 @@
+import csv
+import resource
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import torch
+from fastai.callback.core import Callback
+from fastai.torch_core import find_bs
+
+TELEMETRY_FIELDS = [
+    "epoch",
+    "images",
+    "images_per_sec",
+    "train_time",
+    "data_time",
+    "compute_time",
+    "data_pct",
+    "valid_time",
+    "batch_p50_ms",
+    "batch_p90_ms",
+    "batch_p99_ms",
+    "peak_rss_mb",
+]
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB."""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+class TelemetryCallback(Callback):
+    """
+    Records training throughput and where the time goes.
+
+    For every training batch the time spent waiting on the DataLoader
+    (decode, CropPad, batch transforms) is separated from the time spent in
+    forward/backward/optimizer. Per-epoch summaries are appended to `fname`.
+
+    Optionally records a torch.profiler trace for training steps
+    `profile_steps = (start, stop)` (global step numbers, stop exclusive).
+    """
+
+    order = -10  # run before_batch before other callbacks touch the batch
+
+    def __init__(
+        self,
+        fname: Path,
+        profile_steps: tuple[int, int] | None = None,
+        trace_path: Path | None = None,
+    ):
+        self.fname = Path(fname)
+        self.profile_steps = profile_steps
+        self.trace_path = trace_path or self.fname.with_name("trace.json")
+        self._profiler = None
+        self._step = 0
+
+    def _now(self) -> float:
+        # Asynchronous CUDA kernels would otherwise be billed to the next data wait
+        if torch.cuda.is_available():
+            torch.cuda.synchronize()
+        return time.perf_counter()
+
+    def before_train(self):
+        self._data_times: list[float] = []
+        self._compute_times: list[float] = []
+        self._images = 0
+        self._train_start = self._last = self._now()
+
+    def before_batch(self):
+        if not self.training:
+            return
+        self._batch_start = self._now()
+        self._data_times.append(self._batch_start - self._last)
+        if self.profile_steps and self._step == self.profile_steps[0]:
+            self._start_profiler()
+
+    def after_batch(self):
+        if not self.training:
+            return
+        self._last = self._now()
+        self._compute_times.append(self._last - self._batch_start)
+        self._images += find_bs(self.yb)
+        self._step += 1
+        if self._profiler is not None:
+            self._profiler.step()
+            if self._step >= self.profile_steps[1]:
+                self._stop_profiler()
+
+    def after_train(self):
+        self._train_time = self._now() - self._train_start
+
+    def before_validate(self):
+        self._valid_start = self._now()
+
+    def after_validate(self):
+        self._valid_time = self._now() - self._valid_start
+
+    def after_epoch(self):
+        data_time = sum(self._data_times)
+        compute_time = sum(self._compute_times)
+        batch_ms = 1000 * (np.array(self._data_times) + np.array(self._compute_times))
+        p50, p90, p99 = (
+            np.percentile(batch_ms, [50, 90, 99]) if len(batch_ms) else (0, 0, 0)
+        )
+        row = {
+            "epoch": self.epoch,
+            "images": self._images,
+            "images_per_sec": self._images / max(self._train_time, 1e-9),
+            "train_time": self._train_time,
+            "data_time": data_time,
+            "compute_time": compute_time,
+            "data_pct": 100 * data_time / max(data_time + compute_time, 1e-9),
+            "valid_time": getattr(self, "_valid_time", 0.0),
+            "batch_p50_ms": p50,
+            "batch_p90_ms": p90,
+            "batch_p99_ms": p99,
+            "peak_rss_mb": peak_rss_mb(),
+        }
+        self._write(row)
+        print(
+            f"[telemetry] epoch {self.epoch}: {row['images_per_sec']:.1f} img/s, "
+            f"data {row['data_pct']:.0f}% of step time, "
+            f"p50/p99 {p50:.1f}/{p99:.1f} ms, peak RSS {row['peak_rss_mb']:.0f} MB"
+        )
+
+    def after_fit(self):
+        self._stop_profiler()
+
+    def _write(self, row: dict):
+        new_file = not self.fname.exists()
+        with open(self.fname, "a", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=TELEMETRY_FIELDS)
+            if new_file:
+                writer.writeheader()
+            writer.writerow(
+                {k: f"{v:.4f}" if isinstance(v, float) else v for k, v in row.items()}
+            )
+
+    def _start_profiler(self):
+        from torch.profiler import ProfilerActivity, profile
+
+        activities = [ProfilerActivity.CPU]
+        if torch.cuda.is_available():
+            activities.append(ProfilerActivity.CUDA)
+        self._profiler = profile(
+            activities=activities, record_shapes=True, profile_memory=True
+        )
+        self._profiler.start()
+        print(f"[telemetry] profiling steps {self.profile_steps[0]}-{self.profile_steps[1]}")
+
+    def _stop_profiler(self):
+        if self._profiler is None:
+            return
+        self._profiler.stop()
+        self._profiler.export_chrome_trace(str(self.trace_path))
+        print(f"[telemetry] wrote profiler trace to {self.trace_path}")
+        self._profiler = None
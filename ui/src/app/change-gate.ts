@@ -0,0 +1,69 @@
+/**
+ * Skips inference for markers whose patch has not changed.
+ * Same semantics as `classifier/inference/change_gate.py`.
+ *
+ * Each patch is reduced to a small grayscale thumbnail (signature). A marker
+ * is reclassified only if the mean absolute difference to the signature of
+ * its last classified patch exceeds `threshold` (0-255 levels); otherwise its
+ * previous label is reused. Every marker is also refreshed at least every
+ * `refreshEvery` frames, staggered across frames.
+ */
+export class ChangeGate {
+  private _signatures = new Map<string, Float32Array>();
+  private _labels = new Map<string, string>();
+  private _frame = -1;
+
+  inferred = 0;
+  total = 0;
+
+  constructor(
+    readonly threshold = 4,
+    readonly refreshEvery = 30,
+    readonly signatureSize = 8
+  ) {}
+
+  /**
+   * Grayscale signature of a thumbnail canvas (e.g. `Classifier.patch(..., signatureSize)`).
+   */
+  static signature(canvas: HTMLCanvasElement | OffscreenCanvas): Float32Array {
+    const ctx = canvas.getContext('2d') as CanvasRenderingContext2D | OffscreenCanvasRenderingContext2D;
+    const { data, width, height } = ctx.getImageData(0, 0, canvas.width, canvas.height);
+    const sig = new Float32Array(width * height);
+    for (let i = 0; i < sig.length; i++) {
+      sig[i] = (data[i * 4] + data[i * 4 + 1] + data[i * 4 + 2]) / 3;
+    }
+    return sig;
+  }
+
+  /** Starts a new frame, call once before `changed()` for its markers. */
+  nextFrame() {
+    this._frame++;
+  }
+
+  /**
+   * Whether marker `id` (at position `index` in the frame's markers) needs inference.
+   */
+  changed(id: string, index: number, signature: Float32Array): boolean {
+    this.total++;
+    const prev = this._signatures.get(id);
+    let changed = !prev || !this._labels.has(id) || index % this.refreshEvery === this._frame % this.refreshEvery;
+    if (!changed) {
+      let diff = 0;
+      for (let i = 0; i < signature.length; i++) diff += Math.abs(signature[i] - prev![i]);
+      changed = diff / signature.length > this.threshold;
+    }
+    if (changed) this.inferred++;
+    return changed;
+  }
+
+  /** Stores the new label and signature of a classified marker. */
+  update(id: string, signature: Float32Array, label: string) {
+    this._signatures.set(id, signature);
+    this._labels.set(id, label);
+  }
+
+  /** Last label of marker `id`. */
+  label(id: string): string | undefined {
+    return this._labels.get(id);
+  }
+}
@@ -13,6 +13,10 @@ interface ClassifierConfig {
   labels: string[];
   dpt: number;
   cropSize: number;
+  /** 'uint8_nhwc': model normalizes in-graph and takes raw RGB pixels. */
+  inputFormat: string;
+  /** Whole-frame model (e.g. 'frame_fp32.ort'), if exported. */
+  frameModel: string | null;
 }
 
 /**
@@ -22,10 +26,14 @@ interface ClassifierConfig {
  * 
  * Public Interface:
  * - classify(): Performs inference on a single marker.
+ * - classifyFrame(): Classifies all markers of a frame in one inference.
  * - patch(): Extracts a patch from the source image.
  */
 export class Classifier {
   private _session: any = null;
+  private _frameSession: any = null;
+  // Session of the last inference, reported by executionProvider
+  private _lastSession: any = null;
   private _config: ClassifierConfig | null = null;
   private _initPromise: Promise<void> | null = null;
   private _queue: Promise<any> = Promise.resolve();
@@ -46,9 +54,10 @@ export class Classifier {
    * Returns the name of the active execution provider (e.g. WebGPU, WebNN, WASM).
    */
   get executionProvider(): string {
-    if (!this._session) return 'None';
+    const session = this._lastSession ?? this._session ?? this._frameSession;
+    if (!session) return 'None';
     
-    const sessionAny = this._session as any;
+    const sessionAny = session as any;
     const handler = sessionAny.handler || sessionAny._handler;
     const handlerName = handler?.constructor?.name || '';
     
@@ -72,7 +81,9 @@ export class Classifier {
   }
 
   /**
-   * Ensures the model configuration and session are loaded.
+   * Ensures the model configuration and session are loaded: the whole-frame
+   * session if classifyFrame() is available, else the per-patch one. The other
+   * session is loaded on first use.
    * Can be called explicitly for pre-loading, but is handled lazily by classify() and patch().
    */
   async initialize(modelData?: Uint8Array): Promise<void> {
@@ -95,7 +106,9 @@ export class Classifier {
         this._config = {
             labels: configData.labels || ["track", "train", "other"],
             dpt: configData.dpt || 28,
-            cropSize: configData.crop_size || configData.size || 96
+            cropSize: configData.crop_size || configData.size || 96,
+            inputFormat: configData.input_format || 'float_nchw',
+            frameModel: configData.frame_model || null
         };
     } catch (e) {
         console.error(`[Classifier] Config Load Failed:`, e);
@@ -104,40 +117,90 @@ export class Classifier {
 
     // 2. Initialize ONNX runtime session
     try {
-        let input: any = modelData;
-        if (!input) {
-            const modelUrl = `${baseUrl}/model_${this.precision}.ort`;
-            const response = await fetch(modelUrl);
-            if (!response.ok) {
-                throw new Error(`Failed to load model binary from ${modelUrl}: ${response.statusText}`);
-            }
-            input = new Uint8Array(await response.arrayBuffer());
+        if (this.hasFrameModel && !modelData) {
+            await this._ensureFrameSession();
+        } else {
+            await this._ensureSession(modelData);
         }
-
-        const options: any = {
-            // Prioritize WASM for stability. Current WebGPU (JSEP) implementation has issues 
-            // with specific quantized operators (like Cast) in this model.
-            executionProviders: ['wasm'],
-            graphOptimizationLevel: 'all'
-        };
-
-        this._session = await ort.InferenceSession.create(input, options);
     } catch (e) {
         console.error(`[Classifier] Session Init Failed:`, e);
         throw e;
     }
   }
 
+  /**
+   * Creates an inference session from `input` (model bytes) or the model file `file`.
+   */
+  private async _createSession(file: string, input?: Uint8Array): Promise<any> {
+    if (!input) {
+        const modelUrl = `/public/models/${this.model}/${file}`;
+        const response = await fetch(modelUrl);
+        if (!response.ok) {
+            throw new Error(`Failed to load model binary from ${modelUrl}: ${response.statusText}`);
+        }
+        input = new Uint8Array(await response.arrayBuffer());
+    }
+
+    const options: any = {
+        // Prioritize WASM for stability. Current WebGPU (JSEP) implementation has issues 
+        // with specific quantized operators (like Cast) in this model.
+        executionProviders: ['wasm'],
+        graphOptimizationLevel: 'all'
+    };
+
+    return await ort.InferenceSession.create(input, options);
+  }
+
+  private async _ensureSession(modelData?: Uint8Array) {
+    if (!this._session) {
+        this._session = await this._createSession(`model_${this.precision}.ort`, modelData);
+    }
+  }
+
+  private async _ensureFrameSession() {
+    if (!this._frameSession) {
+        this._frameSession = await this._createSession(this._config!.frameModel!);
+    }
+  }
+
   /**
    * Internal helper to ensure initialization before any public action.
    */
   private async _ensureInitialized() {
     await this.initialize();
-    if (!this._session || !this._config) {
+    if (!this._config) {
         throw new Error("Classifier failed to initialize");
     }
   }
 
+  /**
+   * Whether classifyFrame() is available: the model was exported with a
+   * whole-frame variant, which only exists in FP32, and FP32 was selected.
+   */
+  get hasFrameModel(): boolean {
+    return !!this._config?.frameModel && this.precision === 'fp32';
+  }
+
+  /**
+   * Classifies all markers of a frame in a single inference using the
+   * whole-frame model, which crops and resizes the patches in-graph.
+   * Frames above the model's dpt are downscaled to it first.
+   * 
+   * @param image Source image
+   * @param centers Coordinates of the markers
+   * @param img_dpt Dots-per-track of the source image
+   */
+  async classifyFrame(image: ImageBitmap, centers: Point[], img_dpt: number): Promise<string[]> {
+    const result = this._queue.then(async () => {
+        await this._ensureInitialized();
+        return await this._doClassifyFrame(image, centers, img_dpt);
+    });
+
+    this._queue = result.catch(() => {});
+
+    return result;
+  }
+
   /**
    * Classifies a marker in the given image.
    * 
@@ -164,13 +227,15 @@ export class Classifier {
    * @param image Source image
    * @param center Center point in source coordinates
    * @param img_dpt Dots-per-track of the source image
+   * @param dstSize Output size (default: the model's crop size), e.g. smaller for thumbnails
    */
-  async patch(image: CanvasImageSource, center: Point, img_dpt: number): Promise<HTMLCanvasElement | OffscreenCanvas | null> {
+  async patch(image: CanvasImageSource, center: Point, img_dpt: number, dstSize?: number): Promise<HTMLCanvasElement | OffscreenCanvas | null> {
     await this._ensureInitialized();
 
     const scaleFactor = this._config!.dpt / img_dpt; 
-    const dstSize = this._config!.cropSize;
-    const srcSize = dstSize / scaleFactor;
+    const cropSize = this._config!.cropSize;
+    const srcSize = cropSize / scaleFactor;
+    dstSize = dstSize ?? cropSize;
     
     const sx = center.x - srcSize / 2;
     const sy = center.y - srcSize / 2;
@@ -229,11 +294,13 @@ export class Classifier {
     const tensor = await this._preprocess(patchCanvas);
 
     // 3. Inference
+    await this._ensureSession();
     const feeds: Record<string, any> = {};
     const inputNames = this._session!.inputNames;
     feeds[inputNames[0]] = tensor;
 
     const results = await this._session!.run(feeds);
+    this._lastSession = this._session;
     const outputNames = this._session!.outputNames;
     const output = results[outputNames[0]];
 
@@ -253,9 +320,62 @@ export class Classifier {
     return this._config!.labels[maxIdx] || 'unknown';
   }
 
+  private async _doClassifyFrame(image: ImageBitmap, centers: Point[], img_dpt: number): Promise<string[]> {
+    if (!this.hasFrameModel) {
+        throw new Error(`Model ${this.model} has no whole-frame variant for ${this.precision}`);
+    }
+    if (centers.length === 0) return [];
+    await this._ensureFrameSession();
+
+    // Downscale to about the model's dpt, the graph only needs that resolution
+    const scale = Math.min(1, this._config!.dpt / img_dpt);
+    const width = Math.max(1, Math.round(image.width * scale));
+    const height = Math.max(1, Math.round(image.height * scale));
+    const sx = width / image.width;
+    const sy = height / image.height;
+    const canvas = new OffscreenCanvas(width, height);
+    const ctx = canvas.getContext('2d') as OffscreenCanvasRenderingContext2D | null;
+    if (!ctx) throw new Error("Failed to get 2D context");
+    ctx.drawImage(image, 0, 0, width, height);
+    const data = ctx.getImageData(0, 0, width, height).data;
+
+    const rgb = new Uint8Array(3 * width * height);
+    for (let i = 0; i < width * height; i++) {
+        rgb[i * 3] = data[i * 4];
+        rgb[i * 3 + 1] = data[i * 4 + 1];
+        rgb[i * 3 + 2] = data[i * 4 + 2];
+    }
+    const xy = new Float32Array(2 * centers.length);
+    centers.forEach((c, i) => {
+        xy[i * 2] = c.x * sx;
+        xy[i * 2 + 1] = c.y * sy;
+    });
+
+    const results = await this._frameSession.run({
+        frame: new ort.Tensor('uint8', rgb, [1, height, width, 3]),
+        centers: new ort.Tensor('float32', xy, [centers.length, 2]),
+        img_dpt: new ort.Tensor('float32', new Float32Array([img_dpt * sx]), [1]),
+    });
+    this._lastSession = this._frameSession;
+    const logits = results[this._frameSession.outputNames[0]].data as Float32Array;
+
+    // Argmax per marker
+    const nClasses = logits.length / centers.length;
+    const labels: string[] = [];
+    for (let m = 0; m < centers.length; m++) {
+        let maxIdx = 0;
+        for (let k = 1; k < nClasses; k++) {
+            if (logits[m * nClasses + k] > logits[m * nClasses + maxIdx]) maxIdx = k;
+        }
+        labels.push(this._config!.labels[maxIdx] || 'unknown');
+    }
+    return labels;
+  }
+
   /**
    * Converts a canvas-based image patch into an ONNX tensor.
-   * Performs ImageNet normalization and channel-first (NCHW) reordering.
+   * Performs ImageNet normalization and channel-first (NCHW) reordering,
+   * unless the model was exported with fused preprocessing.
    * 
    * @param canvas The extracted image patch
    */
@@ -265,6 +385,17 @@ export class Classifier {
       
       const imageData = ctx.getImageData(0, 0, canvas.width, canvas.height);
       const { data, width, height } = imageData;
+
+      // Preprocessing fused into the model: pass RGB pixels (drop alpha)
+      if (this._config!.inputFormat === 'uint8_nhwc') {
+          const rgb = new Uint8Array(3 * width * height);
+          for (let i = 0; i < width * height; i++) {
+              rgb[i * 3] = data[i * 4];
+              rgb[i * 3 + 1] = data[i * 4 + 1];
+              rgb[i * 3 + 2] = data[i * 4 + 2];
+          }
+          return new ort.Tensor('uint8', rgb, [1, height, width, 3]);
+      }
       
       // Standard ImageNet normalization
       const mean = [0.485, 0.456, 0.406];
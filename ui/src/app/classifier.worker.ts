@@ -1,7 +1,10 @@
 
 import { Classifier } from './classifier';
+import { ChangeGate } from './change-gate';
 
 let classifier: Classifier | null = null;
+// Reuses labels of markers whose patch did not change since it was classified
+let gate = new ChangeGate();
 let currentModel = '';
 let currentPrecision = '';
 
@@ -16,6 +19,7 @@ self.onmessage = async (e: MessageEvent) => {
             if (!classifier || currentModel !== model || currentPrecision !== precision) {
                 classifier = new Classifier(model, precision);
                 await classifier.initialize();
+                gate = new ChangeGate();
                 currentModel = model;
                 currentPrecision = precision;
             }
@@ -37,12 +41,29 @@ self.onmessage = async (e: MessageEvent) => {
             // Classifier.classify() puts requests in a Promise queue to avoid concurrency issues with onnxruntime session?
             // Actually `Classifier` has a `_queue`. So we can fire them all.
             
-            const promises = Object.entries(markers).map(async ([id, point]: [string, any]) => {
-                const label = await classifier!.classify(imageBitmap, point, dpt);
-                results[id] = label;
-            });
+            gate.nextFrame();
+            const pending: { id: string, point: any, signature: Float32Array | null }[] = [];
+            await Promise.all(Object.entries(markers).map(async ([id, point]: [string, any], index) => {
+                const thumbnail = await classifier!.patch(imageBitmap, point, dpt, gate.signatureSize);
+                const signature = thumbnail ? ChangeGate.signature(thumbnail) : null;
+                if (signature && !gate.changed(id, index, signature)) {
+                    results[id] = gate.label(id)!;
+                    return;
+                }
+                pending.push({ id, point, signature });
+            }));
 
-            await Promise.all(promises);
+            // Whole-frame model (model.config `frame_model`, FP32 only): one inference for all changed markers
+            let labels: string[];
+            if (classifier.hasFrameModel) {
+                labels = await classifier.classifyFrame(imageBitmap, pending.map(m => m.point), dpt);
+            } else {
+                labels = await Promise.all(pending.map(m => classifier!.classify(imageBitmap, m.point, dpt)));
+            }
+            pending.forEach(({ id, signature }, i) => {
+                if (signature) gate.update(id, signature, labels[i]);
+                results[id] = labels[i];
+            });
             
             const endTime = performance.now();
             const inferenceTimeMs = endTime - startTime;